@@ -0,0 +1,136 @@
+"""Fields of the JSON API resources.
+
+Every field of a resource is a ``Field``: the columns it reads, the
+relations it needs joined or prefetched, and a function returning its JSON
+value for a loaded object. ``Resource.queryset`` loads only what the
+requested fields need, so a sparse ``fields=`` selection is cheaper to query
+as well as to send.
+"""
+from django.db.models import Prefetch
+
+from ingredients.models import Ingredient, RecipeIngredient
+from recipes.models import Category, Recipe
+
+
+class Field:
+    def __init__(self, value, columns=(), select_related=None, prefetch=None):
+        self.value = value
+        self.columns = columns
+        self.select_related = select_related
+        self.prefetch = prefetch
+
+
+def column(name):
+    """Return a field holding the value of a model column"""
+    return Field(lambda obj: getattr(obj, name), (name,))
+
+
+def image(name='image'):
+    """Return a field holding the URL of an image column, or null"""
+    return Field(lambda obj: getattr(obj, name).url if getattr(obj, name) else None, (name,))
+
+
+class Resource:
+    def __init__(self, model, fields, list_fields=None):
+        self.model = model
+        self.fields = fields
+        # Fields returned when a list request has no fields= parameter
+        self.list_fields = list_fields or list(fields)
+
+    def parse_fields(self, value, default):
+        """Return the field names in a comma-separated ``fields=`` value.
+
+        Raises ValueError for unknown names.
+        """
+        if not value:
+            return list(default)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError(
+                f"Unknown field(s): {', '.join(unknown) or '(none)'}. "
+                f"Available: {', '.join(self.fields)}"
+            )
+        return names
+
+    def queryset(self, names):
+        """Return the objects ordered by id, loading only what ``names`` needs"""
+        fields = [self.fields[name] for name in names]
+        columns = [column for field in fields for column in field.columns]
+        queryset = self.model._default_manager.only('pk', *columns).order_by('pk')
+        related = [field.select_related for field in fields if field.select_related]
+        if related:
+            queryset = queryset.select_related(*related)
+        prefetches = [field.prefetch() for field in fields if field.prefetch]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+    def serialize(self, obj, names):
+        """Return the JSON-ready dict of ``names`` for ``obj``"""
+        return {name: self.fields[name].value(obj) for name in names}
+
+
+def _recipe_ingredients():
+    return Prefetch(
+        'recipeingredient_set',
+        queryset=(
+            RecipeIngredient.objects.select_related('ingredient')
+            .only('recipe', 'quantity', 'ingredient__name', 'ingredient__unit_of_measure')
+            .order_by('ingredient__name')
+        ),
+    )
+
+
+def _category(recipe):
+    if recipe.category_id is None:
+        return None
+    return {'id': recipe.category_id, 'name': recipe.category.name}
+
+
+def _ingredients(recipe):
+    return [
+        {
+            'id': ri.ingredient_id,
+            'name': ri.ingredient.name,
+            'unit_of_measure': ri.ingredient.unit_of_measure,
+            'quantity': ri.quantity,
+        }
+        for ri in recipe.recipeingredient_set.all()
+    ]
+
+
+RECIPE_FIELDS = {
+    'id': Field(lambda recipe: recipe.pk),
+    'name': column('name'),
+    'description': column('description'),
+    'instructions': column('instructions'),
+    'cooking_time': column('cooking_time'),
+    'servings': column('servings'),
+    'difficulty': column('difficulty'),
+    'image': image(),
+    'category': Field(_category, ('category', 'category__name'), select_related='category'),
+    'author': Field(lambda recipe: recipe.user.username, ('user', 'user__username'), select_related='user'),
+    'created_date': column('created_date'),
+    'updated_date': column('updated_date'),
+    'ingredients': Field(_ingredients, prefetch=_recipe_ingredients),
+}
+
+RESOURCES = {
+    'recipes': Resource(
+        Recipe, RECIPE_FIELDS,
+        # Lists leave out the long text and the per-recipe ingredient rows
+        list_fields=[name for name in RECIPE_FIELDS if name not in ('instructions', 'ingredients')],
+    ),
+    'ingredients': Resource(Ingredient, {
+        'id': Field(lambda ingredient: ingredient.pk),
+        'name': column('name'),
+        'unit_of_measure': column('unit_of_measure'),
+    }),
+    'categories': Resource(Category, {
+        'id': Field(lambda category: category.pk),
+        'name': column('name'),
+        'description': column('description'),
+        'image': image(),
+    }),
+}
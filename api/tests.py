@@ -0,0 +1,326 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ingredients.models import Ingredient, RecipeIngredient
+from recipes.models import Category, Recipe
+from .views import decode_changes_cursor, decode_cursor, encode_changes_cursor, encode_cursor
+
+
+class ApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='apiuser', password='testpass123')
+        cls.category = Category.objects.create(name='Dinner')
+        cls.salt = Ingredient.objects.create(name='Salt')
+        cls.rice = Ingredient.objects.create(name='Rice')
+        cls.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                name=f'Recipe {i}', description='Short', instructions='Long instructions',
+                cooking_time=10 + i, servings=2, difficulty='Easy', user=cls.user,
+                category=cls.category if i % 2 else None,
+            )
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.salt, quantity=1)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.rice, quantity=200)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+class RecipeListApiTest(ApiTestCase):
+    """Test the recipe list: sparse fieldsets, cursor pagination and ETags"""
+
+    def test_requires_login(self):
+        """Test that anonymous requests get a JSON 401, not a login redirect"""
+        self.client.logout()
+        response = self.client.get(reverse('api:recipe_list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'error': 'Authentication required'})
+
+    def test_read_only(self):
+        """Test that the API only answers GET"""
+        response = self.client.post(reverse('api:recipe_list'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_default_fields_skip_instructions(self):
+        """Test that list payloads leave out instructions and ingredients by default"""
+        results = self.client.get(reverse('api:recipe_list')).json()['results']
+        self.assertEqual(len(results), 12)
+        self.assertNotIn('instructions', results[0])
+        self.assertNotIn('ingredients', results[0])
+        self.assertEqual(results[1]['category'], {'id': self.category.pk, 'name': 'Dinner'})
+        self.assertIsNone(results[0]['category'])
+        self.assertEqual(results[0]['author'], 'apiuser')
+
+    def test_sparse_fieldset(self):
+        """Test that fields= picks the fields and only loads their columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:recipe_list'), {'fields': 'id,name'})
+        self.assertEqual(response.json()['results'][0], {'id': self.recipes[0].pk, 'name': 'Recipe 0'})
+        recipe_query = next(q['sql'] for q in queries.captured_queries if 'recipes_recipe' in q['sql'])
+        self.assertNotIn('instructions', recipe_query)
+
+    def test_ingredients_field(self):
+        """Test that the ingredients field lists quantities and units"""
+        results = self.client.get(reverse('api:recipe_list'), {'fields': 'id,ingredients'}).json()['results']
+        self.assertEqual(results[0]['ingredients'], [
+            {'id': self.rice.pk, 'name': 'Rice', 'unit_of_measure': 'grams', 'quantity': 200.0},
+            {'id': self.salt.pk, 'name': 'Salt', 'unit_of_measure': 'grams', 'quantity': 1.0},
+        ])
+
+    def test_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        response = self.client.get(reverse('api:recipe_list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_cursor_pagination(self):
+        """Test that following next visits every recipe once, in id order"""
+        url, seen = reverse('api:recipe_list') + '?limit=5&fields=id', []
+        while url:
+            page = self.client.get(url).json()
+            seen += [row['id'] for row in page['results']]
+            url = page['next']
+        self.assertEqual(seen, [recipe.pk for recipe in self.recipes])
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the id they hold"""
+        self.assertEqual(decode_cursor(encode_cursor(1234)), 1234)
+        for bad in ('@@', 'bm90LWFuLWlk'):
+            with self.assertRaises(ValueError):
+                decode_cursor(bad)
+
+    def test_invalid_parameters(self):
+        """Test that bad cursors and limits are a 400"""
+        for params in ({'cursor': '@@'}, {'limit': 'x'}, {'limit': '0'}, {'limit': '100000'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get(reverse('api:recipe_list'), params).status_code, 400)
+
+    def test_etag(self):
+        """Test that a matching If-None-Match gets a 304 until the data changes"""
+        url = reverse('api:recipe_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(name='Renamed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(API_STREAM_PAGE_SIZE=4)
+    def test_streamed_page(self):
+        """Test that large pages are streamed as valid JSON with a next link"""
+        response = self.client.get(reverse('api:recipe_list'), {'limit': 10, 'fields': 'id,ingredients'})
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('ETag'))
+        page = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in page['results']], [r.pk for r in self.recipes[:10]])
+        self.assertEqual(len(page['results'][0]['ingredients']), 2)
+        rest = self.client.get(page['next'])
+        self.assertEqual([row['id'] for row in json.loads(b''.join(rest.streaming_content))['results']],
+                         [r.pk for r in self.recipes[10:]])
+
+
+class ResourceDetailApiTest(ApiTestCase):
+    """Test the detail endpoints and the ingredient and category lists"""
+
+    def test_recipe_detail(self):
+        """Test that details include instructions and ingredients"""
+        recipe = self.client.get(reverse('api:recipe_detail', args=[self.recipes[0].pk])).json()
+        self.assertEqual(recipe['instructions'], 'Long instructions')
+        self.assertEqual(len(recipe['ingredients']), 2)
+
+    def test_recipe_detail_not_found(self):
+        """Test that missing objects are a JSON 404"""
+        response = self.client.get(reverse('api:recipe_detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Not found'})
+
+    def test_ingredients_and_categories(self):
+        """Test the ingredient and category resources"""
+        ingredients = self.client.get(reverse('api:ingredient_list')).json()['results']
+        self.assertEqual([row['name'] for row in ingredients], ['Salt', 'Rice'])
+        category = self.client.get(reverse('api:category_detail', args=[self.category.pk])).json()
+        self.assertEqual(category, {'id': self.category.pk, 'name': 'Dinner', 'description': None, 'image': None})
+
+
+class RecipeBatchApiTest(ApiTestCase):
+    """Test fetching many recipes by id"""
+
+    def test_order_and_missing(self):
+        """Test that results follow the requested order and unknown ids are reported"""
+        ids = [self.recipes[3].pk, self.recipes[0].pk, 999999, self.recipes[3].pk]
+        payload = self.client.get(reverse('api:recipe_batch'), {'ids': ','.join(map(str, ids))}).json()
+        self.assertEqual([row['id'] for row in payload['results']], ids[:2])
+        self.assertEqual(payload['missing'], [999999])
+
+    def test_fixed_number_of_queries(self):
+        """Test that the query count doesn't grow with the number of ids"""
+        def count(recipes):
+            ids = ','.join(str(recipe.pk) for recipe in recipes)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('api:recipe_batch'), {'ids': ids})
+            return len(queries)
+
+        # Session, user, recipes and the ingredients prefetch
+        self.assertEqual(count(self.recipes[:1]), 4)
+        self.assertEqual(count(self.recipes), 4)
+
+    def test_invalid_ids(self):
+        """Test that missing, malformed and too many ids are a 400"""
+        with self.settings(API_BATCH_MAX_IDS=3):
+            for ids in ('', '1,x', '1,2,3,4'):
+                with self.subTest(ids):
+                    self.assertEqual(self.client.get(reverse('api:recipe_batch'), {'ids': ids}).status_code, 400)
+
+
+@override_settings(API_CHANGES_LAG_SECONDS=0)
+class RecipeChangesApiTest(ApiTestCase):
+    """Test the changes feed"""
+
+    def poll(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get(reverse('api:recipe_changes'), {'fields': 'id,name', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def sync(self):
+        """Follow the feed to its end and return (ids upserted, ids deleted, cursor)"""
+        page = self.poll(limit=5)
+        upserted, deleted = [], []
+        while True:
+            for change in page['changes']:
+                (upserted if change['type'] == 'upsert' else deleted).append(change['id'])
+            if not page['more']:
+                return upserted, deleted, page['cursor']
+            page = self.poll(page['cursor'], limit=5)
+
+    def test_initial_sync(self):
+        """Test that a sync without since lists every recipe in update order"""
+        upserted, deleted, cursor = self.sync()
+        self.assertEqual(upserted, [recipe.pk for recipe in self.recipes])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.poll(cursor)['changes'], [])
+
+    def test_updates_and_deletes(self):
+        """Test that later polls return only what changed, deletes included"""
+        cursor = self.sync()[2]
+        self.recipes[4].name = 'Updated'
+        self.recipes[4].save()
+        deleted_pk = self.recipes[7].pk
+        self.recipes[7].delete()
+
+        page = self.poll(cursor)
+        self.assertEqual(page['changes'][0], {
+            'type': 'upsert', 'id': self.recipes[4].pk, 'recipe': {'id': self.recipes[4].pk, 'name': 'Updated'},
+        })
+        self.assertEqual(page['changes'][1]['type'], 'delete')
+        self.assertEqual(page['changes'][1]['id'], deleted_pk)
+        self.assertFalse(page['more'])
+        self.assertEqual(self.poll(page['cursor'])['changes'], [])
+
+    def test_ingredient_changes_update_recipe(self):
+        """Test that editing a recipe's ingredients moves it up the feed"""
+        cursor = self.sync()[2]
+        salt = RecipeIngredient.objects.get(recipe=self.recipes[2], ingredient=self.salt)
+        salt.quantity = 5
+        salt.save()
+        page = self.poll(cursor)
+        self.assertEqual([c['id'] for c in page['changes']], [self.recipes[2].pk])
+        RecipeIngredient.objects.get(recipe=self.recipes[3], ingredient=self.rice).delete()
+        self.assertEqual([c['id'] for c in self.poll(page['cursor'])['changes']], [self.recipes[3].pk])
+
+    def test_category_changes_update_recipes(self):
+        """Test that renaming or deleting a category moves its recipes up the feed"""
+        categorized = [recipe.pk for recipe in self.recipes if recipe.category_id]
+        cursor = self.sync()[2]
+        self.category.description = 'Unchanged name'
+        self.category.save()
+        page = self.poll(cursor)
+        self.assertEqual(page['changes'], [])
+
+        self.category.name = 'Supper'
+        self.category.save()
+        page = self.poll(page['cursor'], fields='id,category')
+        self.assertEqual([c['id'] for c in page['changes']], categorized)
+        self.assertEqual(page['changes'][0]['recipe']['category'], {'id': self.category.pk, 'name': 'Supper'})
+
+        self.category.delete()
+        page = self.poll(page['cursor'], fields='id,category')
+        self.assertEqual([c['id'] for c in page['changes']], categorized)
+        self.assertIsNone(page['changes'][0]['recipe']['category'])
+
+    def test_ingredient_renames_update_recipes(self):
+        """Test that renaming an ingredient, changing its unit or deleting it moves its recipes up the feed"""
+        saffron = Ingredient.objects.create(name='Saffron')
+        for recipe in self.recipes[:3]:
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=saffron, quantity=1)
+        using_saffron = [recipe.pk for recipe in self.recipes[:3]]
+        cursor = self.sync()[2]
+
+        saffron.name = 'Saffron threads'
+        saffron.save()
+        page = self.poll(cursor, fields='id,ingredients')
+        self.assertEqual([c['id'] for c in page['changes']], using_saffron)
+        self.assertIn('Saffron threads', [i['name'] for i in page['changes'][0]['recipe']['ingredients']])
+
+        saffron.unit_of_measure = 'pinches'
+        saffron.save()
+        page = self.poll(page['cursor'])
+        self.assertEqual([c['id'] for c in page['changes']], using_saffron)
+
+        saffron.save()
+        page = self.poll(page['cursor'])
+        self.assertEqual(page['changes'], [])
+
+        # One UPDATE for all its recipes rather than one per recipe
+        with self.assertNumQueries(4):
+            saffron.delete()
+        page = self.poll(page['cursor'])
+        self.assertEqual([c['id'] for c in page['changes']], using_saffron)
+
+    def test_lag(self):
+        """Test that changes younger than API_CHANGES_LAG_SECONDS are held back"""
+        cursor = self.sync()[2]
+        self.recipes[0].save()
+        with self.settings(API_CHANGES_LAG_SECONDS=60):
+            page = self.poll(cursor)
+        self.assertEqual(page['changes'], [])
+        self.assertEqual(len(self.poll(page['cursor'])['changes']), 1)
+
+    def test_expired_and_invalid_cursors(self):
+        """Test that cursors issued before the tombstone retention get a 410"""
+        position = (timezone.now(), self.recipes[0].pk)
+        expired = encode_changes_cursor(*position, timezone.now() - timedelta(days=91))
+        with self.settings(RECIPE_TOMBSTONE_DAYS=90):
+            response = self.client.get(reverse('api:recipe_changes'), {'since': expired})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(decode_changes_cursor(encode_changes_cursor(*position, position[0]))[0], position)
+        for bad in ('@@', encode_cursor(5)):
+            with self.subTest(bad):
+                response = self.client.get(reverse('api:recipe_changes'), {'since': bad})
+                self.assertEqual(response.status_code, 400)
+
+    def test_poll_uses_updated_date_index(self):
+        """Test that a poll seeks in the (updated_date, id) index"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Checks the SQLite query plan')
+        cursor = self.sync()[2]
+        with CaptureQueriesContext(connection) as queries:
+            self.poll(cursor)
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "recipes_recipe"' in q['sql'])
+        with connection.cursor() as db:
+            db.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in db.fetchall())
+        self.assertIn('USING INDEX recipe_updated_idx (updated_date>?', plan)
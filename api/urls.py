@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('recipes/', views.resource_list, {'resource': 'recipes'}, name='recipe_list'),
+    path('recipes/batch/', views.recipe_batch, name='recipe_batch'),  # Many recipes by id
+    path('recipes/changes/', views.recipe_changes, name='recipe_changes'),  # Sync feed
+    path('recipes/<int:pk>/', views.resource_detail, {'resource': 'recipes'}, name='recipe_detail'),
+    path('ingredients/', views.resource_list, {'resource': 'ingredients'}, name='ingredient_list'),
+    path('ingredients/<int:pk>/', views.resource_detail, {'resource': 'ingredients'}, name='ingredient_detail'),
+    path('categories/', views.resource_list, {'resource': 'categories'}, name='category_list'),
+    path('categories/<int:pk>/', views.resource_detail, {'resource': 'categories'}, name='category_detail'),
+]
@@ -0,0 +1,251 @@
+"""Read-only JSON API for recipes, ingredients and categories.
+
+Lists are ordered by id and paginated with an opaque cursor holding the last
+id returned, so every page is an index range scan no matter how deep the
+client pages. Pages of up to ``API_STREAM_PAGE_SIZE`` rows, details and
+batches are serialized in one piece and carry an ETag of their content;
+larger pages are streamed from a server-side cursor instead of being built
+in memory, and have no ETag since the body isn't known when the headers
+are sent.
+
+``recipes/changes/`` is a feed of the recipes created, updated or deleted
+since a cursor, for clients that keep a copy of the catalog.
+"""
+import base64
+import binascii
+import functools
+import hashlib
+import json
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from recipes.changes import changes_since
+from .resources import RESOURCES
+
+# Rows serialized per chunk of a streamed page
+STREAM_CHUNK_ROWS = 100
+
+
+def _error(status, message):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _dumps(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def api_view(view):
+    """Decorator for API views: GET only, and a 401 instead of a login redirect"""
+    @require_GET
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, 'Authentication required')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _json_response(request, payload):
+    """Return ``payload`` as JSON with an ETag, or a 304 if the client has it"""
+    body = _dumps(payload)
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+    # Clients may keep the response but must revalidate it every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _b64encode(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+
+
+def encode_cursor(pk):
+    return _b64encode(str(pk))
+
+
+def decode_cursor(cursor):
+    """Return the id in a cursor, raising ValueError if it isn't one"""
+    try:
+        return int(_b64decode(cursor))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def encode_changes_cursor(timestamp, pk, issued):
+    return _b64encode(f'{timestamp.isoformat()} {pk} {issued.timestamp():.0f}')
+
+
+def decode_changes_cursor(cursor):
+    """Return ``((timestamp, id), issued)`` for a changes cursor.
+
+    Raises ValueError if it isn't one.
+    """
+    try:
+        timestamp, pk, issued = _b64decode(cursor).split(' ')
+        timestamp = datetime.fromisoformat(timestamp)
+        if timezone.is_naive(timestamp):
+            raise ValueError('Naive timestamp')
+        return (timestamp, int(pk)), datetime.fromtimestamp(int(issued), tz=dt_timezone.utc)
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def _limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {settings.API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def _next_url(request, pk):
+    params = request.GET.copy()
+    params['cursor'] = encode_cursor(pk)
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def _stream_page(request, resource, fields, rows, limit):
+    """Yield the JSON of a page, a chunk of rows at a time"""
+    yield b'{"results":['
+    chunk, count, last_pk, more = [], 0, None, False
+    for obj in rows:
+        if count == limit:
+            more = True
+            break
+        chunk.append(_dumps(resource.serialize(obj, fields)))
+        count += 1
+        last_pk = obj.pk
+        if len(chunk) == STREAM_CHUNK_ROWS:
+            yield (b',' if count > len(chunk) else b'') + b','.join(chunk)
+            chunk = []
+    if chunk:
+        yield (b',' if count > len(chunk) else b'') + b','.join(chunk)
+    yield b'],"next":' + _dumps(_next_url(request, last_pk) if more else None) + b'}'
+
+
+@api_view
+def resource_list(request, resource):
+    """Return a page of a resource, ordered by id"""
+    resource = RESOURCES[resource]
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'), resource.list_fields)
+        limit = _limit(request)
+        after = decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else 0
+    except ValueError as exc:
+        return _error(400, str(exc))
+
+    # One extra row tells whether there is a next page
+    rows = resource.queryset(fields).filter(pk__gt=after)[:limit + 1]
+    if limit > settings.API_STREAM_PAGE_SIZE:
+        response = StreamingHttpResponse(
+            _stream_page(request, resource, fields, rows.iterator(chunk_size=STREAM_CHUNK_ROWS), limit),
+            content_type='application/json',
+        )
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    rows = list(rows)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return _json_response(request, {
+        'results': [resource.serialize(obj, fields) for obj in rows],
+        'next': _next_url(request, rows[-1].pk) if more else None,
+    })
+
+
+@api_view
+def resource_detail(request, resource, pk):
+    """Return one object of a resource"""
+    resource = RESOURCES[resource]
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'), resource.fields)
+    except ValueError as exc:
+        return _error(400, str(exc))
+    obj = resource.queryset(fields).filter(pk=pk).first()
+    if obj is None:
+        return _error(404, 'Not found')
+    return _json_response(request, resource.serialize(obj, fields))
+
+
+@api_view
+def recipe_batch(request):
+    """Return the recipes with the given ids, in the order requested.
+
+    The number of queries doesn't depend on the number of ids: one for the
+    recipes and one per prefetched relation of the requested fields.
+    """
+    resource = RESOURCES['recipes']
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'), resource.fields)
+    except ValueError as exc:
+        return _error(400, str(exc))
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()))
+    except ValueError:
+        return _error(400, 'ids must be comma-separated integers')
+    if not ids:
+        return _error(400, 'ids is required')
+    if len(ids) > settings.API_BATCH_MAX_IDS:
+        return _error(400, f'At most {settings.API_BATCH_MAX_IDS} ids per request')
+
+    found = {obj.pk: obj for obj in resource.queryset(fields).filter(pk__in=ids)}
+    return _json_response(request, {
+        'results': [resource.serialize(found[pk], fields) for pk in ids if pk in found],
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
+
+@api_view
+def recipe_changes(request):
+    """Return the recipes created, updated or deleted since a cursor.
+
+    Without ``since`` the feed starts at the beginning, which lists the whole
+    catalog. The response's ``cursor`` is where the next poll continues;
+    ``more`` says whether to fetch again right away.
+    """
+    resource = RESOURCES['recipes']
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'), resource.fields)
+        limit = _limit(request)
+        position, issued = decode_changes_cursor(request.GET['since']) if request.GET.get('since') else (None, None)
+    except ValueError as exc:
+        return _error(400, str(exc))
+
+    now = timezone.now()
+    if issued and issued < now - timedelta(days=settings.RECIPE_TOMBSTONE_DAYS):
+        # Tombstones of recipes the client holds may have been pruned since
+        return _error(410, 'Cursor is older than the tombstone retention; sync again without since')
+
+    # Only hand out changes whose transactions have surely committed
+    until = now - timedelta(seconds=settings.API_CHANGES_LAG_SECONDS)
+    changes, more = changes_since(position, until, limit, recipes=resource.queryset(fields))
+    if changes:
+        position = changes[-1][:2]
+    # Reissued even without changes, so idle clients don't age into a 410
+    cursor = encode_changes_cursor(*position, now) if position else None
+    return _json_response(request, {
+        'changes': [
+            {'type': 'upsert', 'id': pk, 'recipe': resource.serialize(recipe, fields)}
+            if recipe is not None else
+            {'type': 'delete', 'id': pk, 'deleted_date': timestamp}
+            for timestamp, pk, recipe in changes
+        ],
+        'cursor': cursor,
+        'more': more,
+    })
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Throughput of the sync views under WSGI against the async views under ASGI.
+
+Seeds a SQLite catalog with ``manage.py seed_benchmark_data``, then serves
+it with each profile in turn on the same number of worker processes.
+Logged-in client threads request detail, search, analytics and "My
+Analytics" pages for a fixed time, after one warm-up request per page
+fills the analytics cache. Reported per profile: throughput, latency
+percentiles, errors, memory, and mean latency per page.
+
+Profiles:
+    wsgi        gunicorn sync workers, sync views (the Procfile setup)
+    asgi-sync   uvicorn workers, sync views run in threads by Django
+    asgi        uvicorn workers, the async views (ASYNC_VIEWS=True)
+
+The ASGI profiles need uvicorn (``pip install uvicorn``).
+
+Usage:
+    python benchmarks/asgi_vs_wsgi.py [--clients 16] [--seconds 20] [--recipes 1000] [--workers 2]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from gunicorn_load import free_port, memory_mb, wait_until_up  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# (path, weight) pairs; {pk} is replaced with a random recipe id
+REQUEST_MIX = [
+    ('/recipe/{pk}/', 40),
+    ('/search/?show_all=1', 10),
+    ('/analytics/', 20),
+    ('/analytics/?mode=client', 10),
+    ('/analytics/mine/', 20),
+]
+
+SEED = r'''
+import sys
+import django
+django.setup()
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from recipes.models import Recipe
+call_command('seed_benchmark_data', recipes=int(sys.argv[1]), verbosity=0)
+user = User.objects.filter(username__startswith='bench-user-').order_by('pk').first()
+session = SessionStore()
+session['_auth_user_id'] = str(user.pk)
+session['_auth_user_backend'] = 'django.contrib.auth.backends.ModelBackend'
+session['_auth_user_hash'] = user.get_session_auth_hash()
+session.create()
+print(','.join(map(str, Recipe.objects.values_list('pk', flat=True)[:500])))
+print(session.session_key)
+'''
+
+
+def profiles(workers, threads):
+    """Return {name: (command, extra environment)}"""
+    gunicorn = ['gunicorn', 'recipe_project.wsgi', '-c', str(BASE_DIR / 'gunicorn.conf.py'),
+                '--workers', str(workers), '--threads', str(threads)]
+    uvicorn = [sys.executable, '-m', 'uvicorn', 'recipe_project.asgi:application',
+               '--workers', str(workers), '--no-access-log', '--log-level', 'warning']
+    # Requests under ASGI run on short-lived threads; see settings.DATABASE_CONN_MAX_AGE
+    asgi_env = {'DATABASE_CONN_MAX_AGE': '0'}
+    return {
+        'wsgi': (gunicorn, {}),
+        'asgi-sync': (uvicorn, asgi_env),
+        'asgi': (uvicorn, {**asgi_env, 'ASYNC_VIEWS': 'True'}),
+    }
+
+
+def client(base_url, session_key, recipe_ids, deadline, latencies, errors):
+    """Request random pages until ``deadline``; HTTP errors count as errors"""
+    paths = [path for path, weight in REQUEST_MIX for _ in range(weight)]
+    rng = random.Random()
+    while time.time() < deadline:
+        template = rng.choice(paths)
+        path = template.format(pk=rng.choice(recipe_ids))
+        request = urllib.request.Request(base_url + path, headers={'Cookie': f'sessionid={session_key}'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            latencies.append((template, time.perf_counter() - started))
+        except (urllib.error.URLError, ConnectionError, OSError):
+            errors.append(path)
+
+
+def run_profile(name, command, extra_env, env, session_key, recipe_ids, clients, seconds):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    bind = ['--bind', f'127.0.0.1:{port}'] if command[0] == 'gunicorn' else ['--port', str(port)]
+    process = subprocess.Popen(
+        [*command, *bind], cwd=BASE_DIR, env={**env, **extra_env},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(base_url + '/', process)
+        # Fill the analytics cache first, as deploy.sh's warm_caches would
+        for path, _ in REQUEST_MIX:
+            request = urllib.request.Request(base_url + path.format(pk=recipe_ids[0]),
+                                             headers={'Cookie': f'sessionid={session_key}'})
+            urllib.request.urlopen(request, timeout=300).read()
+        latencies, errors = [], []
+        deadline = time.time() + seconds
+        threads = [
+            threading.Thread(target=client, args=(base_url, session_key, recipe_ids, deadline, latencies, errors))
+            for _ in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rss, pss = memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    by_path = {}
+    for template, seconds_taken in latencies:
+        by_path.setdefault(template, []).append(seconds_taken)
+    latencies = sorted(seconds_taken for _, seconds_taken in latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        'profile': name,
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'errors': len(errors),
+        'loaded_rss_mb': rss,
+        'loaded_pss_mb': pss,
+        'mean_ms_by_path': {path: statistics.mean(times) * 1000 for path, times in by_path.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per profile')
+    parser.add_argument('--threads', type=int, default=2, help='Threads per gunicorn worker')
+    parser.add_argument('--profiles', default='wsgi,asgi-sync,asgi')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='recipe-asgi-'))
+    try:
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='recipe_project.settings',
+            DEBUG='False',
+            ALLOWED_HOSTS='127.0.0.1',
+            DATABASE_URL=f'sqlite:///{workdir / "bench.sqlite3"}',
+            CACHE_BACKEND='file',
+            CACHE_LOCATION=str(workdir / 'cache'),
+            STATIC_ROOT=str(workdir / 'static'),
+        )
+        # With DEBUG off pages need the hashed static files manifest
+        subprocess.run([sys.executable, 'manage.py', 'collectstatic', '--noinput', '-v0'],
+                       cwd=BASE_DIR, env=env, check=True)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=BASE_DIR, env=env, check=True)
+        ids, session_key = subprocess.run(
+            [sys.executable, '-c', SEED, str(args.recipes)],
+            cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-2:]
+        recipe_ids = [int(pk) for pk in ids.split(',')]
+
+        available = profiles(args.workers, args.threads)
+        results = []
+        for name in args.profiles.split(','):
+            # Every profile starts with a cold analytics cache
+            shutil.rmtree(workdir / 'cache', ignore_errors=True)
+            command, extra_env = available[name]
+            results.append(run_profile(name, command, extra_env, env, session_key, recipe_ids,
+                                       args.clients, args.seconds))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{args.clients} clients, {args.seconds:g}s per profile, {args.recipes} recipes, '
+          f'{args.workers} workers, {os.cpu_count()} CPUs\n')
+    print(f"{'profile':<10} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'errors':>6} "
+          f"{'load RSS':>9} {'load PSS':>9}")
+    for r in results:
+        print(f"{r['profile']:<10} {r['requests_per_second']:>7.1f} {r['p50_ms']:>7.0f} {r['p95_ms']:>7.0f} "
+              f"{r['p99_ms']:>7.0f} {r['errors']:>6} {r['loaded_rss_mb']:>8.0f}M {r['loaded_pss_mb']:>8.0f}M")
+    print('\nmean latency per page (ms)')
+    print(f"{'profile':<10} " + ' '.join(f'{path:>24}' for path, _ in REQUEST_MIX))
+    for r in results:
+        print(f"{r['profile']:<10} " + ' '.join(
+            f"{r['mean_ms_by_path'].get(path, 0):>24.0f}" for path, _ in REQUEST_MIX))
+
+
+if __name__ == '__main__':
+    main()
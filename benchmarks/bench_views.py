@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Latency, query count and peak memory of the main views on a seeded catalog.
+
+Seeds a SQLite database with ``manage.py seed_benchmark_data`` (or reuses
+the one given with --db), logs in with the test client and requests every
+scenario: the recipe list, recipe details, the search page with every
+combination of its four filters, and the analytics page with a cold and a
+warm cache. Per scenario it reports latency percentiles over --requests
+requests, then runs one extra request to count queries and measure the
+peak memory allocated (tracemalloc) while serving it.
+
+The catalog is generated from a fixed seed, so results are comparable
+across commits: save them with --output and pass the file to --compare on
+the next run.
+
+Usage:
+    python benchmarks/bench_views.py [--scale 1k|10k|100k|1m] [--requests 20]
+        [--db bench.sqlite3] [--only search] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+# A value for each search filter that matches part of the generated catalog
+SEARCH_FILTERS = {
+    'recipe_name': 'soup',
+    'ingredients': 'garlic',
+    'difficulty': 'easy',
+    'cooking_time': 'quick',
+}
+
+
+def setup(db, scale, recipes, seed):
+    workdir = tempfile.mkdtemp(prefix='recipe-bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db or Path(workdir) / "bench.sqlite3"}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+    os.environ['DEBUG'] = 'False'
+    os.environ['CACHE_BACKEND'] = 'locmem'
+    # With DEBUG off pages need the hashed static files manifest
+    os.environ['STATIC_ROOT'] = str(Path(workdir) / 'static')
+
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from recipes.models import Recipe
+    from recipes.seeding import SCALES
+
+    call_command('collectstatic', interactive=False, verbosity=0)
+    call_command('migrate', verbosity=0)
+    if not Recipe.objects.exists():
+        call_command('seed_benchmark_data', recipes=recipes or SCALES[scale], seed=seed, stdout=sys.stderr)
+    return User.objects.filter(username__startswith='bench-user-').order_by('pk').first() or User.objects.first()
+
+
+def scenarios(seed):
+    """Return (name, method, path, data, before_request) tuples"""
+    from django.core.cache import cache
+    from recipes.models import Recipe
+
+    # Sample the detail pages with the seed too, so runs request the same recipes
+    rng = random.Random(seed)
+    all_pks = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+    pks = rng.sample(all_pks, min(100, len(all_pks)))
+    result = [
+        ('recipe_list', 'get', '/list/', None, None),
+        ('recipe_detail', 'get', lambda: f'/recipe/{rng.choice(pks)}/', None, None),
+        ('search_recipes (show all)', 'get', '/search/?show_all=1', None, None),
+    ]
+    names = list(SEARCH_FILTERS)
+    for size in range(len(names) + 1):
+        for combination in itertools.combinations(names, size):
+            data = {name: SEARCH_FILTERS[name] if name in combination else '' for name in names}
+            label = '+'.join(combination) if combination else 'no filters'
+            result.append((f'search_recipes ({label})', 'post', '/search/', data, None))
+    result += [
+        ('analytics_view (cold cache)', 'get', '/analytics/', None, cache.clear),
+        ('analytics_view (warm cache)', 'get', '/analytics/', None, None),
+    ]
+    return result
+
+
+def request(client, method, path, data):
+    path = path() if callable(path) else path
+    response = getattr(client, method)(path, data) if data is not None else getattr(client, method)(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+    return response
+
+
+def measure(client, scenario, requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    name, method, path, data, before_request = scenario
+    if before_request:
+        before_request()
+    request(client, method, path, data)  # warm-up
+
+    latencies = []
+    for _ in range(requests):
+        if before_request:
+            before_request()
+        started = time.perf_counter()
+        request(client, method, path, data)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Counting queries and tracing allocations slow the request down, so
+    # they get a request of their own
+    if before_request:
+        before_request()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    with CaptureQueriesContext(connection) as queries:
+        request(client, method, path, data)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        'name': name,
+        'requests': requests,
+        'p50_ms': round(percentile(0.50), 2),
+        'p95_ms': round(percentile(0.95), 2),
+        'p99_ms': round(percentile(0.99), 2),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'queries': len(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def print_table(results, previous):
+    print(f"{'scenario':<66} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'peak KiB':>9}"
+          + (f" {'p50 vs old':>11} {'queries old':>11}" if previous else ''))
+    for r in results:
+        line = (f"{r['name']:<66} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                f"{r['queries']:>7} {r['peak_memory_kib']:>9,.0f}")
+        old = previous.get(r['name'])
+        if old:
+            change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] if old['p50_ms'] else 0
+            line += f" {change:>+11.0%} {old['queries']:>11}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=('1k', '10k', '100k', '1m'), default='1k')
+    parser.add_argument('--recipes', type=int, help='Exact catalog size (overrides --scale)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=20, help='Timed requests per scenario')
+    parser.add_argument('--db', help='SQLite file to reuse; seeded only if it has no recipes')
+    parser.add_argument('--only', help='Run only scenarios whose name contains this text')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    user = setup(args.db, args.scale, args.recipes, args.seed)
+    from django import get_version
+    from django.test import Client
+    from recipes.models import Recipe
+
+    client = Client()
+    client.force_login(user)
+    results = [
+        measure(client, scenario, args.requests)
+        for scenario in scenarios(args.seed)
+        if not args.only or args.only in scenario[0]
+    ]
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'recipes': Recipe.objects.count(),
+            'seed': args.seed,
+            'requests': args.requests,
+            'python': platform.python_version(),
+            'django': get_version(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    previous = {}
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text())
+        previous = {r['name']: r for r in old['results']}
+        print(f"Comparing with {old['meta']['commit']} ({old['meta']['recipes']} recipes)")
+    meta = report['meta']
+    print(f"{meta['recipes']} recipes, {args.requests} requests per scenario, commit {meta['commit']}\n")
+    print_table(results, previous)
+
+
+if __name__ == '__main__':
+    main()
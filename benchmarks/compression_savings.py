@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Bytes saved by CompressionMiddleware on the real page templates.
+
+Seeds a throwaway SQLite database, logs in with the test client and fetches
+each page three times: uncompressed, gzip and brotli. Reports the body size
+for each encoding, the saving and the time the middleware spent compressing
+(measured as the difference to the uncompressed request, best of --runs).
+
+Usage:
+    python benchmarks/compression_savings.py [--recipes 100] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PAGES = [
+    ('login', '/login/'),
+    ('list', '/list/'),
+    ('detail', '/recipe/{pk}/'),
+    ('search (all)', '/search/?show_all=1'),
+    ('analytics', '/analytics/'),
+    ('analytics (client)', '/analytics/?mode=client'),
+    ('my analytics', '/analytics/mine/'),
+    ('analytics data', '/analytics/data/'),
+]
+
+
+def setup(recipes):
+    workdir = tempfile.mkdtemp(prefix='recipe-compression-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{workdir}/bench.sqlite3'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from ingredients.models import Ingredient, RecipeIngredient
+    from recipes.models import Category, Recipe
+
+    call_command('migrate', verbosity=0)
+    random.seed(0)
+    user = User.objects.create_user('bench', 'bench@example.com', 'bench-pass-123')
+    categories = [Category.objects.create(name=name) for name in ('Breakfast', 'Lunch', 'Dinner', 'Dessert')]
+    ingredients = [Ingredient.objects.create(name=f'Ingredient {i}') for i in range(40)]
+    for i in range(recipes):
+        recipe = Recipe.objects.create(
+            name=f'Recipe {i}', cooking_time=random.randint(5, 120), user=user,
+            category=random.choice(categories),
+            description='A tasty dish with a short description of how to make it. ' * 3,
+        )
+        for ingredient in random.sample(ingredients, random.randint(2, 8)):
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1)
+    return user, Recipe.objects.order_by('pk').first().pk
+
+
+def fetch(client, url, encoding, runs):
+    best, body = float('inf'), b''
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        body = response.content
+        applied = response.get('Content-Encoding', 'identity')
+    return len(body), best, applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    user, pk = setup(args.recipes)
+    from django.test import Client
+    from recipe_project import middleware
+
+    client = Client()
+    client.force_login(user)
+    if middleware.brotli is None:
+        print('brotli is not installed; the br column shows what clients get instead\n')
+
+    print(f"{'page':<20} {'identity':>9} {'gzip':>9} {'saved':>6} {'+ms':>6} {'br':>9} {'saved':>6} {'+ms':>6}")
+    totals = {'identity': 0, 'gzip': 0, 'br': 0}
+    for name, url in PAGES:
+        url = url.format(pk=pk)
+        size, base, _ = fetch(client, url, 'identity', args.runs)
+        gzip_size, gzip_time, _ = fetch(client, url, 'gzip', args.runs)
+        br_size, br_time, br_applied = fetch(client, url, 'br, gzip', args.runs)
+        totals['identity'] += size
+        totals['gzip'] += gzip_size
+        totals['br'] += br_size
+        label = name if br_applied != 'gzip' else f'{name} *'
+        print(f'{label:<20} {size:>9,} {gzip_size:>9,} {1 - gzip_size / size:>6.0%} '
+              f'{(gzip_time - base) * 1000:>6.1f} {br_size:>9,} {1 - br_size / size:>6.0%} '
+              f'{(br_time - base) * 1000:>6.1f}')
+    print(f"{'total':<20} {totals['identity']:>9,} {totals['gzip']:>9,} "
+          f"{1 - totals['gzip'] / totals['identity']:>6.0%} {'':>6} {totals['br']:>9,} "
+          f"{1 - totals['br'] / totals['identity']:>6.0%}")
+    print('\n* page carries a CSRF token, so it is only gzipped (with random padding)')
+
+
+if __name__ == '__main__':
+    main()
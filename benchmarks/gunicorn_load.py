@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Load test of gunicorn configurations serving the Recipe App.
+
+Each profile boots gunicorn against the same seeded SQLite database and
+file cache, then logged-in client threads request a mix of list, detail,
+search, analytics and chart PNG pages for a fixed time, after one
+warm-up request per page fills the analytics cache. Reported per
+profile: throughput, latency percentiles, errors and the memory of the
+master plus workers (RSS, and PSS which counts copy-on-write shared pages
+once).
+
+Profiles:
+    default  gunicorn's defaults (one sync worker, no preload)
+    sync     sync workers sized like the tuned config, no preload
+    tuned    gunicorn.conf.py (preloaded sync workers)
+
+Usage:
+    python benchmarks/gunicorn_load.py [--clients 16] [--seconds 20] [--recipes 300]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# (path, weight) pairs; {pk} is replaced with a random recipe id
+REQUEST_MIX = [
+    ('/list/', 35),
+    ('/recipe/{pk}/', 25),
+    ('/search/?show_all=1', 15),
+    ('/analytics/', 15),
+    ('/analytics/charts/difficulty.png', 10),
+]
+
+SEED = r'''
+import os, random, sys
+import django
+django.setup()
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from recipes.models import Category, Recipe
+random.seed(0)
+user = User.objects.create_user('bench', 'bench@example.com', 'bench-pass-123')
+categories = [Category.objects.create(name=name) for name in ('Breakfast', 'Lunch', 'Dinner', 'Dessert')]
+for i in range(int(sys.argv[1])):
+    Recipe.objects.create(name=f'Recipe {i}', cooking_time=random.randint(5, 120), user=user,
+                          category=random.choice(categories))
+session = SessionStore()
+session['_auth_user_id'] = str(user.pk)
+session['_auth_user_backend'] = 'django.contrib.auth.backends.ModelBackend'
+session['_auth_user_hash'] = user.get_session_auth_hash()
+session.create()
+print(session.session_key)
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def profiles(workdir):
+    empty_config = workdir / 'empty.conf.py'
+    empty_config.write_text('')
+    tuned_workers = os.cpu_count() * 2
+    return {
+        'default': ['-c', str(empty_config)],
+        'sync': ['-c', str(empty_config), '--workers', str(tuned_workers)],
+        'tuned': ['-c', str(BASE_DIR / 'gunicorn.conf.py')],
+    }
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in Path(f'/proc/{pid}/task/{pid}/children').read_text().split():
+        pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_mb(pid):
+    """Return (rss, pss) in MB summed over the gunicorn master and workers"""
+    rss = pss = 0
+    for child in process_tree(pid):
+        for line in Path(f'/proc/{child}/smaps_rollup').read_text().splitlines():
+            if line.startswith('Rss:'):
+                rss += int(line.split()[1])
+            elif line.startswith('Pss:'):
+                pss += int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def client(base_url, session_key, recipe_ids, deadline, latencies, errors):
+    """Request random pages until ``deadline``; HTTP errors count as errors"""
+    paths = [path for path, weight in REQUEST_MIX for _ in range(weight)]
+    rng = random.Random()
+    while time.time() < deadline:
+        template = rng.choice(paths)
+        path = template.format(pk=rng.choice(recipe_ids))
+        request = urllib.request.Request(base_url + path, headers={'Cookie': f'sessionid={session_key}'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            latencies.append((template, time.perf_counter() - started))
+        except (urllib.error.URLError, ConnectionError, OSError):
+            errors.append(path)
+
+
+def run_profile(name, args, env, session_key, recipe_ids, clients, seconds):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(
+        ['gunicorn', 'recipe_project.wsgi', '--bind', f'127.0.0.1:{port}', *args],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(base_url + '/', process)
+        idle_rss, idle_pss = memory_mb(process.pid)
+        # Fill the analytics cache first, as deploy.sh's warm_caches would
+        for path, _ in REQUEST_MIX:
+            request = urllib.request.Request(base_url + path.format(pk=recipe_ids[0]),
+                                             headers={'Cookie': f'sessionid={session_key}'})
+            urllib.request.urlopen(request, timeout=120).read()
+        latencies, errors = [], []
+        deadline = time.time() + seconds
+        threads = [
+            threading.Thread(target=client, args=(base_url, session_key, recipe_ids, deadline, latencies, errors))
+            for _ in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rss, pss = memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    by_path = {}
+    for template, seconds_taken in latencies:
+        by_path.setdefault(template, []).append(seconds_taken)
+    latencies = sorted(seconds_taken for _, seconds_taken in latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        'profile': name,
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else 0,
+        'errors': len(errors),
+        'idle_rss_mb': idle_rss,
+        'idle_pss_mb': idle_pss,
+        'loaded_rss_mb': rss,
+        'loaded_pss_mb': pss,
+        'mean_ms_by_path': {path: statistics.mean(times) * 1000 for path, times in by_path.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--recipes', type=int, default=300)
+    parser.add_argument('--profiles', default='default,sync,tuned')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='recipe-gunicorn-'))
+    try:
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='recipe_project.settings',
+            DEBUG='False',
+            ALLOWED_HOSTS='127.0.0.1',
+            DATABASE_URL=f'sqlite:///{workdir / "bench.sqlite3"}',
+            CACHE_BACKEND='file',
+            CACHE_LOCATION=str(workdir / 'cache'),
+            STATIC_ROOT=str(workdir / 'static'),
+        )
+        # With DEBUG off pages need the hashed static files manifest
+        subprocess.run([sys.executable, 'manage.py', 'collectstatic', '--noinput', '-v0'],
+                       cwd=BASE_DIR, env=env, check=True)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=BASE_DIR, env=env, check=True)
+        session_key = subprocess.run(
+            [sys.executable, '-c', SEED, str(args.recipes)],
+            cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1]
+        recipe_ids = list(range(1, args.recipes + 1))
+
+        available = profiles(workdir)
+        results = []
+        for name in args.profiles.split(','):
+            # Every profile starts with a cold analytics cache
+            shutil.rmtree(workdir / 'cache', ignore_errors=True)
+            results.append(run_profile(name, available[name], env, session_key, recipe_ids,
+                                       args.clients, args.seconds))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{args.clients} clients, {args.seconds:g}s per profile, {args.recipes} recipes, '
+          f'{os.cpu_count()} CPUs\n')
+    print(f"{'profile':<8} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'errors':>6} "
+          f"{'idle RSS':>9} {'idle PSS':>9} {'load RSS':>9} {'load PSS':>9}")
+    for r in results:
+        print(f"{r['profile']:<8} {r['requests_per_second']:>7.1f} {r['p50_ms']:>7.0f} {r['p95_ms']:>7.0f} "
+              f"{r['p99_ms']:>7.0f} {r['errors']:>6} {r['idle_rss_mb']:>8.0f}M {r['idle_pss_mb']:>8.0f}M "
+              f"{r['loaded_rss_mb']:>8.0f}M {r['loaded_pss_mb']:>8.0f}M")
+    print('\nmean latency per page (ms)')
+    print(f"{'profile':<8} " + ' '.join(f'{path:>34}' for path, _ in REQUEST_MIX))
+    for r in results:
+        print(f"{r['profile']:<8} " + ' '.join(
+            f"{r['mean_ms_by_path'].get(path, 0):>34.0f}" for path, _ in REQUEST_MIX))
+
+
+if __name__ == '__main__':
+    main()
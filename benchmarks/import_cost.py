@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Worker boot benchmark: import time and RSS of the Django app.
+
+Each measurement runs in a fresh interpreter that does what a gunicorn
+worker does on boot (load the WSGI application and the URLconf, which
+imports recipes.views). The "eager" variant additionally imports the
+pandas/matplotlib modules up front, which is what every worker paid before
+they were made lazy.
+
+Usage:
+    python benchmarks/import_cost.py [--runs 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+import recipe_project.urls
+if sys.argv[1] == 'eager':
+    import recipes.charts, recipes.dataframes
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'pandas_loaded': 'pandas' in sys.modules,
+    'matplotlib_loaded': 'matplotlib' in sys.modules,
+}))
+'''
+
+
+def measure(variant, runs):
+    """Run the probe ``runs`` times and return the median figures"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, variant],
+            cwd=BASE_DIR, check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(s['seconds'] for s in samples),
+        'max_rss_mb': statistics.median(s['max_rss_mb'] for s in samples),
+        'pandas_loaded': samples[0]['pandas_loaded'],
+        'matplotlib_loaded': samples[0]['matplotlib_loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Interpreters started per variant')
+    args = parser.parse_args()
+
+    results = {variant: measure(variant, args.runs) for variant in ('eager', 'lazy')}
+
+    print(f"{'variant':<8} {'boot (s)':>9} {'RSS (MB)':>9}  pandas  matplotlib")
+    for variant, r in results.items():
+        print(f"{variant:<8} {r['seconds']:>9.3f} {r['max_rss_mb']:>9.1f}  "
+              f"{str(r['pandas_loaded']):<6}  {r['matplotlib_loaded']}")
+    eager, lazy = results['eager'], results['lazy']
+    print(f"\nLazy imports save {eager['seconds'] - lazy['seconds']:.3f}s and "
+          f"{eager['max_rss_mb'] - lazy['max_rss_mb']:.1f} MB per worker boot.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write throughput of SQLite with and without the
+production profile from settings.SQLITE_INIT_COMMANDS.
+
+Reader and writer processes hammer a recipe-like table for a fixed time,
+the way several gunicorn workers share one db.sqlite3. The baseline uses
+SQLite's defaults (rollback journal, deferred transactions, 5s timeout);
+the tuned run uses the pragmas, busy timeout and IMMEDIATE transactions
+the Django settings apply to every connection.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--readers 4] [--writers 2] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+from recipe_project import settings  # noqa: E402
+
+PROFILES = {
+    'default': {'pragmas': [], 'timeout': 5.0, 'begin': 'BEGIN'},
+    'tuned': {
+        'pragmas': settings.SQLITE_INIT_COMMANDS,
+        'timeout': float(settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 20)),
+        'begin': 'BEGIN IMMEDIATE',
+    },
+}
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    for pragma in profile['pragmas']:
+        conn.execute(pragma)
+    return conn
+
+
+def setup_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE recipe (id INTEGER PRIMARY KEY, name TEXT, cooking_time INTEGER, views INTEGER)')
+    conn.executemany(
+        'INSERT INTO recipe (name, cooking_time, views) VALUES (?, ?, 0)',
+        ((f'Recipe {i}', i % 120) for i in range(rows)),
+    )
+    conn.execute('CREATE INDEX recipe_cooking_time ON recipe (cooking_time)')
+    conn.commit()
+    conn.close()
+
+
+def reader(path, profile, deadline, results):
+    conn = connect(path, profile)
+    ops = errors = 0
+    while time.time() < deadline:
+        try:
+            conn.execute('SELECT COUNT(*), AVG(cooking_time) FROM recipe WHERE cooking_time < ?', (30,)).fetchone()
+            conn.execute('SELECT * FROM recipe ORDER BY id DESC LIMIT 20').fetchall()
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', ops, errors))
+
+
+def writer(path, profile, deadline, results):
+    conn = connect(path, profile)
+    ops = errors = 0
+    while time.time() < deadline:
+        try:
+            conn.execute(profile['begin'])
+            conn.execute("INSERT INTO recipe (name, cooking_time, views) VALUES ('New', 25, 0)")
+            conn.execute('UPDATE recipe SET views = views + 1 WHERE id = ?', (ops % 1000 + 1,))
+            conn.execute('COMMIT')
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    results.put(('write', ops, errors))
+
+
+def run(profile_name, readers, writers, seconds, rows):
+    profile = PROFILES[profile_name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        setup_database(path, rows)
+        # journal_mode=WAL is persistent, so switch the file once up front too
+        connect(path, profile).close()
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        processes = [multiprocessing.Process(target=reader, args=(path, profile, deadline, results)) for _ in range(readers)]
+        processes += [multiprocessing.Process(target=writer, args=(path, profile, deadline, results)) for _ in range(writers)]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            kind, ops, errors = results.get()
+            totals[kind][0] += ops
+            totals[kind][1] += errors
+        for process in processes:
+            process.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile\n')
+    print(f"{'profile':<8} {'reads/s':>9} {'writes/s':>9} {'read errors':>12} {'write errors':>13}")
+    for name in PROFILES:
+        totals = run(name, args.readers, args.writers, args.seconds, args.rows)
+        print(f"{name:<8} {totals['read'][0] / args.seconds:>9.0f} {totals['write'][0] / args.seconds:>9.0f} "
+              f"{totals['read'][1]:>12} {totals['write'][1]:>13}")
+
+
+if __name__ == '__main__':
+    main()
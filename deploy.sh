@@ -12,4 +12,16 @@ python manage.py collectstatic --noinput
 echo "Running database migrations..."
 python manage.py migrate
 
+# Create the cache table (only does anything with CACHE_BACKEND=db)
+echo "Creating cache table..."
+python manage.py createcachetable
+
+# Trim the slow-query log to SLOW_QUERY_LOG_SIZE entries
+echo "Pruning the slow-query log..."
+python manage.py prune_slow_queries
+
+# Precompute analytics and charts so the first visitors don't pay for them
+echo "Warming caches..."
+python manage.py warm_caches
+
 echo "Deployment script completed!"
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Gunicorn configuration for the Recipe App.
+
+Every setting can be overridden from the environment so a dyno size change
+doesn't need a code change. See benchmarks/gunicorn_load.py for the load test
+behind the defaults and the README for the numbers.
+"""
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# prometheus_client multiprocess mode: every worker writes its metrics to
+# files here and /metrics merges them. The variable must be set before the
+# app (and with it prometheus_client) is loaded, and old files from a
+# previous run would be counted again, so both happen when this file loads.
+# The directory may be shared with other things, so only the metric files
+# prometheus_client writes (*.db) are removed, never the directory itself.
+_metrics_root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(_metrics_root, 'recipe-app-metrics'),
+)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+for _path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, '*.db')):
+    os.remove(_path)
+
+# Sync workers sized from the CPU count. Most of a request here is Python
+# work (template rendering, pandas for search), so processes carry the load;
+# threads only contend for the GIL and measured slower (see the benchmark).
+# GUNICORN_THREADS > 1 switches to gthread workers. Heroku sets
+# WEB_CONCURRENCY from the dyno's memory.
+workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2)
+threads = _env_int('GUNICORN_THREADS', 1)
+
+# Load Django (and the modules below) once in the master; forked workers
+# share those pages copy-on-write instead of importing everything again.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('1', 'true', 'yes')
+PRELOAD_MODULES = ('recipes.charts', 'recipes.dataframes')
+
+# Chart rendering grows the heap (matplotlib caches fonts, text layouts and
+# figure managers), so recycle workers regularly; the jitter keeps them from
+# all restarting at once.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# A cold analytics page renders four charts, which takes a few seconds on a
+# small dyno (the recipe-times chart is capped to RECIPE_TIMES_LIMIT bars).
+# Stay under the Heroku router's 30s limit and let in-flight renders finish
+# when a worker is recycled or the dyno restarts.
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Heartbeat files on tmpfs so a slow disk can't make workers look stuck
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+
+
+def when_ready(server):
+    """Import the lazily loaded heavy modules in the master before forking"""
+    if not preload_app:
+        return
+    import gc
+    import importlib
+
+    from django.db import connections
+
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    # Never hand a connection opened in the master to several workers
+    connections.close_all()
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collections in the workers don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """Let prometheus_client drop the live gauges of a worker that exited"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from recipes.admin_filters import AutocompleteFilterMixin, AutocompleteListFilter
 from .models import Ingredient, RecipeIngredient
 
 # Register your models here.
@@ -10,9 +11,11 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('unit_of_measure',)
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'get_quantity_display')
-    list_filter = ('ingredient', 'recipe')
+    list_filter = (('ingredient', AutocompleteListFilter), ('recipe', AutocompleteListFilter))
+    autocomplete_fields = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
     
     def get_quantity_display(self, obj):
@@ -0,0 +1,59 @@
+"""Signal handlers for the ingredients app, connected in IngredientsConfig.ready()"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.cache import bump_namespace_on_commit
+from recipes.models import Recipe
+from recipes.tasks import warm_analytics_on_commit
+from .models import Ingredient, RecipeIngredient
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_ingredient_caches(sender, instance, using, raw=False, **kwargs):
+    """Invalidate data cached under the "ingredients" namespace"""
+    if not raw:
+        bump_namespace_on_commit('ingredients', using=using)
+        warm_analytics_on_commit(using=using)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe(sender, instance, using, raw=False, origin=None, **kwargs):
+    """Move the recipe up the changes feed when its ingredients change"""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if raw or origin_model is Recipe:
+        # Deleting the recipe itself leaves a tombstone instead
+        return
+    if origin_model is Ingredient:
+        # touch_deleted_ingredient_recipes already moved them in one UPDATE
+        return
+    Recipe.objects.using(using).filter(pk=instance.recipe_id).update(updated_date=timezone.now())
+
+
+@receiver(post_init, sender=Ingredient)
+def remember_ingredient_label(sender, instance, **kwargs):
+    """Remember the name and unit recipes currently show for the ingredient"""
+    instance._feed_label = (instance.__dict__.get('name'), instance.__dict__.get('unit_of_measure'))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_renamed_ingredient_recipes(sender, instance, created, using, raw=False, **kwargs):
+    """Move the recipes using an ingredient up the changes feed when its name or unit changes"""
+    label = (instance.name, instance.unit_of_measure)
+    if not (raw or created) and label != instance._feed_label:
+        Recipe.objects.using(using).filter(ingredients=instance).update(updated_date=timezone.now())
+    instance._feed_label = label
+
+
+@receiver(pre_delete, sender=Ingredient)
+def touch_deleted_ingredient_recipes(sender, instance, using, **kwargs):
+    """Move the recipes using a deleted ingredient up the changes feed.
+
+    Runs before the delete, while the recipes can still be found through it.
+    """
+    Recipe.objects.using(using).filter(ingredients=instance).update(updated_date=timezone.now())
@@ -1,6 +1,9 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.db import IntegrityError
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from .models import Ingredient, RecipeIngredient
 from recipes.models import Recipe, Category
 
@@ -113,3 +116,75 @@ class RecipeIngredientModelTest(TestCase):
         
         recipe_ingredients = RecipeIngredient.objects.filter(recipe=self.recipe)
         self.assertEqual(recipe_ingredients.count(), 2)
+
+
+class RecipeIngredientAdminTest(TestCase):
+    
+    def setUp(self):
+        """Set up an admin user and a few recipe ingredients"""
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpassword'
+        )
+        self.client.login(username='admin', password='adminpassword')
+        self.recipe = Recipe.objects.create(name="Tomato Sauce", cooking_time=20, user=self.admin)
+        self.other_recipe = Recipe.objects.create(name="Salad", cooking_time=10, user=self.admin)
+        self.tomato = Ingredient.objects.create(name="Tomato", unit_of_measure="pieces")
+        self.lettuce = Ingredient.objects.create(name="Lettuce", unit_of_measure="pieces")
+        Ingredient.objects.create(name="Unused Saffron")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.tomato, quantity=4.0)
+        RecipeIngredient.objects.create(recipe=self.other_recipe, ingredient=self.lettuce)
+    
+    def test_changelist_filters_do_not_list_every_object(self):
+        """Test that list filters render autocomplete boxes instead of links"""
+        response = self.client.get(reverse('admin:ingredients_recipeingredient_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'autocomplete-list-filter', count=2)
+        self.assertContains(response, 'data-field-name="ingredient"')
+        self.assertContains(response, 'recipes/admin/autocomplete-filter.js')
+        self.assertNotContains(response, 'Unused Saffron')
+    
+    def test_changelist_autocomplete_filter_applies(self):
+        """Test filtering by a related object chosen in the autocomplete box"""
+        response = self.client.get(
+            reverse('admin:ingredients_recipeingredient_changelist'),
+            {'ingredient__id__exact': self.tomato.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [RecipeIngredient.objects.get(ingredient=self.tomato)])
+        # The selected object is pre-filled in the filter box
+        self.assertContains(response, f'<option value="{self.tomato.pk}" selected>Tomato (pieces)</option>', html=True)
+    
+    def test_filter_autocomplete_endpoint(self):
+        """Test the admin autocomplete endpoint used by the filter"""
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'ingredients',
+            'model_name': 'recipeingredient',
+            'field_name': 'recipe',
+            'term': 'Sal',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['text'] for r in response.json()['results']], ['Salad'])
+    
+    def test_changelist_query_count_is_constant(self):
+        """Test that more rows on the page don't add queries"""
+        def changelist_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('admin:ingredients_recipeingredient_changelist'))
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+        
+        small = changelist_queries()
+        for i in range(20):
+            recipe = Recipe.objects.create(name=f"Recipe {i}", cooking_time=20, user=self.admin)
+            ingredient = Ingredient.objects.create(name=f"Ingredient {i}")
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=i or None)
+        self.assertEqual(changelist_queries(), small)
+    
+    def test_recipe_inline_uses_autocomplete(self):
+        """Test that the recipe change form doesn't embed every ingredient"""
+        response = self.client.get(reverse('admin:recipes_recipe_change', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-field-name="ingredient"')
+        self.assertNotContains(response, 'Unused Saffron')
@@ -0,0 +1,36 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('created', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'run_after',
+                    'worker', 'finished')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'dedup_key', 'last_error')
+    readonly_fields = ('task', 'args', 'kwargs', 'dedup_key', 'attempts', 'worker', 'started', 'finished',
+                       'last_error', 'created')
+    date_hierarchy = 'created'
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        # Jobs are enqueued by code only
+        return False
+
+    @admin.action(description="Retry selected failed jobs now")
+    def retry_jobs(self, request, queryset):
+        """Queue failed jobs again with a fresh set of attempts"""
+        retried = 0
+        for job in queryset.filter(status=Job.FAILED):
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished=None,
+                    )
+            except IntegrityError:
+                continue  # The same work is already queued
+            retried += 1
+        self.message_user(request, f"Queued {retried} failed job(s) again.")
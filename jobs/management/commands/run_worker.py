@@ -0,0 +1,45 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import registered_tasks
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (image processing, difficulty recomputation, chart rendering)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is runnable instead of waiting for new ones')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+        parser.add_argument('--task', action='append', dest='tasks', metavar='NAME',
+                            help='Only run this task (repeatable; default: every task)')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Seconds between polls of an empty queue (default: JOBS_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['tasks'] or ()) - set(registered_tasks())
+        if unknown:
+            raise CommandError(f'Unknown task(s): {", ".join(sorted(unknown))}. '
+                               f'Registered: {", ".join(sorted(registered_tasks()))}')
+
+        stopping = False
+
+        def stop(signum, frame):
+            # Finish the current job, then exit
+            nonlocal stopping
+            stopping = True
+
+        previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            if options['verbosity'] >= 1 and not options['burst']:
+                self.stdout.write('Waiting for jobs. Stop with Ctrl+C or SIGTERM.')
+            processed = work(
+                tasks=options['tasks'], burst=options['burst'], max_jobs=options['max_jobs'],
+                poll_interval=options['poll_interval'], should_stop=lambda: stopping,
+            )
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} job(s).'))
@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A call to a registered task, waiting for or run by ``manage.py run_worker``.
+
+    Workers claim the queued job with the highest ``priority`` whose
+    ``run_after`` has passed. A failed job is queued again with a delay until
+    it has been attempted ``max_attempts`` times. Only one queued job may
+    hold a given ``dedup_key``, so repeated requests for the same work
+    collapse into one run.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=200, blank=True, help_text="Worker that ran the last attempt")
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            # Workers look for the next runnable job by status and priority
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+            models.Index(fields=['status', 'task'], name='job_status_task_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=models.Q(status='queued'), name='job_unique_queued_dedup_key',
+            ),
+        ]
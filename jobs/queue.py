@@ -0,0 +1,120 @@
+"""Task registry and enqueueing for the database-backed job queue.
+
+Decorate a function with ``@task`` in an app's ``tasks.py`` (they are
+imported when Django starts) and call ``function.enqueue(...)`` to have
+``manage.py run_worker`` run it later; calling the function still runs it
+inline. Arguments are stored as JSON, so pass primary keys, not instances.
+
+Jobs are ordinary rows written in the caller's transaction: a job enqueued
+inside ``transaction.atomic()`` only becomes visible to workers on commit
+and disappears on rollback.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+_tasks = {}
+# Inserts tried when a deduplicated job conflicts with a queued one that is
+# claimed before it can be found
+ENQUEUE_ATTEMPTS = 3
+
+
+class Task:
+    """A function the worker can run, with its queueing options"""
+
+    def __init__(self, func, name, priority=0, max_attempts=3, retry_delay=30, concurrency=None,
+                 timeout=600, dedup_key=None):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.dedup_key = dedup_key
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def enqueue(self, *args, **kwargs):
+        """Queue a call with the task's default options and return the Job"""
+        return self.enqueue_with(args, kwargs)
+
+    def enqueue_with(self, args=(), kwargs=None, dedup_key=None, priority=None, delay=0):
+        """Queue a call, overriding the deduplication key, priority or start delay (seconds)"""
+        kwargs = kwargs or {}
+        if dedup_key is None and self.dedup_key is not None:
+            dedup_key = self.dedup_key(*args, **kwargs)
+        job = Job(
+            task=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            dedup_key=dedup_key,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        if dedup_key is None:
+            job.save()
+            return job
+        for attempt in range(ENQUEUE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    job.save()
+                return job
+            except IntegrityError:
+                existing = Job.objects.filter(dedup_key=dedup_key, status=Job.QUEUED).first()
+                if existing is None and attempt == ENQUEUE_ATTEMPTS - 1:
+                    # Not (or no longer) a dedup conflict
+                    raise
+            if existing is None:
+                # A worker claimed the queued job in the meantime; queue ours after all
+                continue
+            # The same work is already queued: keep one job, at the higher
+            # priority unless a worker claimed it in the meantime
+            if job.priority > existing.priority:
+                Job.objects.filter(pk=existing.pk, status=Job.QUEUED).update(priority=job.priority)
+                existing.priority = job.priority
+            return existing
+
+    def backoff(self, attempts):
+        """Seconds to wait before retrying after ``attempts`` failed attempts"""
+        return self.retry_delay * 2 ** (attempts - 1)
+
+
+def task(name=None, *, priority=0, max_attempts=3, retry_delay=30, concurrency=None, timeout=600,
+         dedup_key=None):
+    """Register a function as a queueable task.
+
+    ``priority``: higher runs first. ``max_attempts``: failures are retried
+    after ``retry_delay`` seconds, doubling each time. ``concurrency``: how
+    many jobs of this task may run at once across all workers (unlimited by
+    default). ``timeout``: seconds after which a running job whose worker
+    vanished is queued again. ``dedup_key``: a callable taking the task's
+    arguments and returning the key that makes repeated enqueues collapse.
+    """
+    def decorator(func):
+        registered = Task(
+            func, name or f'{func.__module__}.{func.__name__}', priority=priority, max_attempts=max_attempts,
+            retry_delay=retry_delay, concurrency=concurrency, timeout=timeout, dedup_key=dedup_key,
+        )
+        _tasks[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    """Return the registered task called ``name``, or None"""
+    return _tasks.get(name)
+
+
+def registered_tasks():
+    """Return {name: Task} for every registered task"""
+    return dict(_tasks)
@@ -0,0 +1,192 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import ENQUEUE_ATTEMPTS, get_task, task
+from .worker import _record_failure, claim_next, prune_finished, requeue_abandoned, run_job, work
+
+calls = []
+
+
+@task('jobs.tests.record', dedup_key=lambda value: f'record:{value}')
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.explode', max_attempts=2, retry_delay=60)
+def explode():
+    raise ValueError('boom')
+
+
+@task('jobs.tests.exclusive', concurrency=1)
+def exclusive():
+    calls.append('exclusive')
+
+
+class JobQueueTest(TestCase):
+    """Test enqueueing, claiming, retries and concurrency limits"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_task_runs_inline_when_called(self):
+        """Test that calling a task runs it without queueing"""
+        record('now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+        self.assertIs(get_task('jobs.tests.record'), record)
+
+    def test_enqueue_and_run(self):
+        """Test that a queued job runs once and is marked done"""
+        job = record.enqueue('later')
+        self.assertEqual((job.task, job.args, job.status), ('jobs.tests.record', ['later'], Job.QUEUED))
+        self.assertEqual(work(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(calls, ['later'])
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(work(burst=True), 0)
+
+    def test_dedup_key(self):
+        """Test that repeated enqueues share one queued job at the highest priority"""
+        first = record.enqueue('same')
+        second = record.enqueue_with(['same'], priority=5)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.get().priority, 5)
+        # Once the job is running, new work gets a new job
+        claim_next('test')
+        third = record.enqueue('same')
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_other_integrity_errors_are_raised(self):
+        """Test that an insert failing for another reason than a queued duplicate isn't retried forever"""
+        with patch.object(Job, 'save', side_effect=IntegrityError('bad row')) as save, \
+                self.assertRaises(IntegrityError):
+            record.enqueue('same')
+        self.assertEqual(save.call_count, ENQUEUE_ATTEMPTS)
+
+    def test_late_finisher_does_not_overwrite_a_recovered_job(self):
+        """Test that a job finishing after it was requeued as abandoned keeps the requeue"""
+        record.enqueue('slow')
+        job = claim_next('slow-worker')
+        Job.objects.filter(pk=job.pk).update(started=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_abandoned(), 1)
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_priority_and_run_after(self):
+        """Test that higher priorities run first and delayed jobs wait"""
+        low = record.enqueue_with(['low'])
+        high = record.enqueue_with(['high'], priority=10)
+        record.enqueue_with(['delayed'], priority=20, delay=3600)
+        self.assertEqual(claim_next('test').pk, high.pk)
+        self.assertEqual(claim_next('test').pk, low.pk)
+        self.assertIsNone(claim_next('test'))
+
+    def test_failed_job_is_retried_then_failed(self):
+        """Test the retry backoff and the final failure"""
+        job = explode.enqueue()
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            self.assertFalse(run_job(claim_next('test')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        self.assertIsNone(claim_next('test'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            run_job(claim_next('test'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_unknown_task_fails(self):
+        """Test that jobs of unregistered tasks fail without retries"""
+        job = Job.objects.create(task='jobs.tests.missing')
+        self.assertFalse(run_job(claim_next('test')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Unknown task', job.last_error)
+
+    def test_concurrency_limit(self):
+        """Test that a task at its concurrency limit is skipped, not others"""
+        exclusive.enqueue()
+        exclusive.enqueue()
+        other = record.enqueue_with(['other'], priority=-1)
+        self.assertEqual(claim_next('worker-1').task, 'jobs.tests.exclusive')
+        self.assertEqual(claim_next('worker-2').pk, other.pk)
+        self.assertIsNone(claim_next('worker-2'))
+
+    def test_only_selected_tasks(self):
+        """Test restricting a worker to some tasks"""
+        record.enqueue('skipped')
+        exclusive.enqueue()
+        self.assertEqual(work(tasks=['jobs.tests.exclusive'], burst=True), 1)
+        self.assertEqual(calls, ['exclusive'])
+
+    def test_abandoned_job_is_requeued(self):
+        """Test that a job left running by a dead worker is retried"""
+        record.enqueue('stuck')
+        job = claim_next('dead-worker')
+        self.assertEqual(requeue_abandoned(), 0)
+        Job.objects.filter(pk=job.pk).update(started=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_abandoned(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('Abandoned by dead-worker', job.last_error)
+
+    def test_abandoned_job_is_recovered_once(self):
+        """Test that a stale copy of an attempt can't requeue the job a second time"""
+        record.enqueue('stuck')
+        job = claim_next('dead-worker')
+        self.assertTrue(_record_failure(job, 'Abandoned', get_task(job.task)))
+        self.assertFalse(_record_failure(job, 'Abandoned again', get_task(job.task)))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (Job.QUEUED, 'Abandoned'))
+
+    @override_settings(JOBS_KEEP_DAYS=7)
+    def test_prune_finished(self):
+        """Test that only old successful jobs are deleted"""
+        old = timezone.now() - timedelta(days=8)
+        Job.objects.create(task='jobs.tests.record', status=Job.DONE, finished=old)
+        Job.objects.create(task='jobs.tests.record', status=Job.FAILED, finished=old)
+        Job.objects.create(task='jobs.tests.record', status=Job.DONE, finished=timezone.now())
+        self.assertEqual(prune_finished(), 1)
+        self.assertEqual(Job.objects.count(), 2)
+
+
+class RunWorkerCommandTest(TestCase):
+    """Test the run_worker management command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_burst(self):
+        """Test that --burst runs the queue dry and exits"""
+        record.enqueue('a')
+        record.enqueue('b')
+        out = StringIO()
+        call_command('run_worker', burst=True, stdout=out)
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        self.assertIn('Ran 2 job(s).', out.getvalue())
+
+    def test_max_jobs(self):
+        """Test that --max-jobs stops after that many jobs"""
+        record.enqueue('a')
+        record.enqueue('b')
+        call_command('run_worker', burst=True, max_jobs=1, stdout=StringIO())
+        self.assertEqual(len(calls), 1)
+
+    def test_unknown_task(self):
+        """Test that --task must name a registered task"""
+        with self.assertRaises(CommandError):
+            call_command('run_worker', burst=True, tasks=['nope'], stdout=StringIO())
@@ -0,0 +1,177 @@
+"""Claiming and running jobs for ``manage.py run_worker``.
+
+Claims are plain conditional UPDATEs (``WHERE status = 'queued'``), so any
+number of worker processes can share the queue on SQLite or PostgreSQL
+without row locks: whichever UPDATE matches the row wins, the others move on
+to the next candidate. Per-task concurrency limits are checked again right
+after a claim and the job is handed back if a concurrent claim overshot.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .queue import get_task, registered_tasks
+
+logger = logging.getLogger(__name__)
+
+# Candidates fetched per claim attempt
+CLAIM_BATCH = 20
+# Timeout for running jobs of tasks this worker doesn't know
+DEFAULT_TIMEOUT = 600
+# How often the worker looks for abandoned jobs and prunes old ones (seconds)
+HOUSEKEEPING_INTERVAL = 60
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _release(pk):
+    """Hand a claimed job back to the queue"""
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=pk).update(
+                status=Job.QUEUED, worker='', started=None, attempts=F('attempts') - 1,
+            )
+    except IntegrityError:
+        # The same work was queued again in the meantime; that job covers it
+        Job.objects.filter(pk=pk).delete()
+
+
+def claim_next(worker, tasks=None):
+    """Mark the next runnable job as running for ``worker`` and return it.
+
+    ``tasks`` restricts the claim to those task names. Returns None when
+    nothing is runnable.
+    """
+    now = timezone.now()
+    limits = {name: t.concurrency for name, t in registered_tasks().items() if t.concurrency is not None}
+    running = Counter(
+        Job.objects.filter(status=Job.RUNNING, task__in=limits).values_list('task', flat=True)
+    ) if limits else Counter()
+    saturated = [name for name, limit in limits.items() if running[name] >= limit]
+
+    candidates = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).exclude(task__in=saturated)
+    if tasks:
+        candidates = candidates.filter(task__in=tasks)
+    for pk, name in candidates.order_by('-priority', 'run_after', 'pk').values_list('pk', 'task')[:CLAIM_BATCH]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started=now, finished=None, attempts=F('attempts') + 1,
+        )
+        if not claimed:
+            continue  # Another worker got there first
+        if name in limits and Job.objects.filter(status=Job.RUNNING, task=name).count() > limits[name]:
+            _release(pk)
+            continue
+        return Job.objects.get(pk=pk)
+    return None
+
+
+def _record_failure(job, error, task):
+    """Queue ``job`` again after a delay, or mark it failed once out of attempts.
+
+    Only applies while the job is still running the attempt it was claimed
+    for, so two processes recording a failure of the same attempt can't both
+    act on it. Returns whether it applied.
+    """
+    now = timezone.now()
+    attempt = Job.objects.filter(pk=job.pk, status=Job.RUNNING, started=job.started)
+    if task is not None and job.attempts < job.max_attempts:
+        try:
+            with transaction.atomic():
+                return bool(attempt.update(
+                    status=Job.QUEUED, run_after=now + timedelta(seconds=task.backoff(job.attempts)),
+                    last_error=error,
+                ))
+        except IntegrityError:
+            error += '\nNot retried: the same work is already queued again.'
+    return bool(attempt.update(status=Job.FAILED, finished=now, last_error=error))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; return True if it succeeded"""
+    task = get_task(job.task)
+    if task is None:
+        _record_failure(job, f'Unknown task {job.task!r}', None)
+        return False
+    started = time.perf_counter()
+    try:
+        task.func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+        _record_failure(job, traceback.format_exc(), task)
+        return False
+    # Only if this is still the attempt we claimed: a job that ran past its
+    # timeout may have been requeued and claimed by another worker since
+    finished = Job.objects.filter(pk=job.pk, status=Job.RUNNING, started=job.started).update(
+        status=Job.DONE, finished=timezone.now(), last_error='',
+    )
+    if not finished:
+        logger.warning('Job %s (%s) finished after it was recovered as abandoned; result not recorded',
+                       job.pk, job.task)
+        return False
+    logger.info('Job %s (%s) done in %.0f ms', job.pk, job.task, (time.perf_counter() - started) * 1000)
+    return True
+
+
+def requeue_abandoned():
+    """Retry or fail running jobs whose worker exceeded the task's timeout.
+
+    A worker that is killed mid-job leaves it running forever, which would
+    also hold a slot of the task's concurrency limit. Returns how many jobs
+    were recovered.
+    """
+    now = timezone.now()
+    recovered = 0
+    for job in Job.objects.filter(status=Job.RUNNING):
+        task = get_task(job.task)
+        timeout = task.timeout if task else DEFAULT_TIMEOUT
+        if job.started and job.started < now - timedelta(seconds=timeout):
+            # A no-op if the attempt finished or was recovered in the meantime
+            recovered += _record_failure(job, f'Abandoned by {job.worker} after {timeout}s', task)
+    return recovered
+
+
+def prune_finished():
+    """Delete jobs that finished successfully more than JOBS_KEEP_DAYS ago"""
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_KEEP_DAYS)
+    return Job.objects.filter(status=Job.DONE, finished__lt=cutoff).delete()[0]
+
+
+def work(tasks=None, burst=False, max_jobs=None, poll_interval=None, should_stop=lambda: False):
+    """Claim and run jobs until stopped and return how many were run.
+
+    With ``burst`` the loop ends as soon as no job is runnable; otherwise it
+    polls every ``poll_interval`` seconds (JOBS_POLL_INTERVAL by default).
+    """
+    name = worker_name()
+    poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+    processed = 0
+    housekeeping_at = 0
+    while not should_stop() and (max_jobs is None or processed < max_jobs):
+        # Long-running processes must drop connections the database closed
+        close_old_connections()
+        if time.monotonic() >= housekeeping_at:
+            requeue_abandoned()
+            prune_finished()
+            housekeeping_at = time.monotonic() + HOUSEKEEPING_INTERVAL
+        job = claim_next(name, tasks)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    close_old_connections()
+    return processed
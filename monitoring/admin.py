@@ -0,0 +1,47 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import ProfileRecord, SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created', 'kind', 'view', 'executions', 'duration_ms', 'origin', 'sql_preview')
+    list_filter = ('kind', 'view')
+    search_fields = ('sql', 'origin', 'path')
+    readonly_fields = ('created', 'kind', 'view', 'path', 'origin', 'executions', 'duration_ms', 'sql')
+    date_hierarchy = 'created'
+
+    def sql_preview(self, obj):
+        return obj.sql if len(obj.sql) <= 80 else f'{obj.sql[:77]}...'
+    sql_preview.short_description = 'SQL'
+
+    def has_add_permission(self, request):
+        # Entries come from the middleware only
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfileRecord)
+class ProfileRecordAdmin(admin.ModelAdmin):
+    list_display = ('created', 'view', 'path', 'user', 'status_code', 'duration_ms', 'download')
+    list_filter = ('view',)
+    search_fields = ('path', 'view')
+    fields = ('created', 'view', 'path', 'user', 'status_code', 'duration_ms', 'download', 'summary')
+    readonly_fields = fields
+    date_hierarchy = 'created'
+
+    def download(self, obj):
+        url = reverse('monitoring:profile_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.filename())
+    download.short_description = '.prof file'
+
+    def has_add_permission(self, request):
+        # Profiles come from ProfilingMiddleware only
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitoring.middleware import prune_slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Delete all but the newest SLOW_QUERY_LOG_SIZE entries of the slow-query log'
+
+    def handle(self, *args, **options):
+        deleted = prune_slow_queries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} slow-query log entr{"y" if deleted == 1 else "ies"}; '
+            f'keeping at most {settings.SLOW_QUERY_LOG_SIZE}.'
+        ))
@@ -0,0 +1,142 @@
+import gc
+import os
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+from django.test import Client, override_settings
+from django.urls import NoReverseMatch, Resolver404, resolve, reverse
+
+from monitoring.memory import TRACEBACK_FRAMES, area_growth, short_filename, take_snapshot, top_allocators
+
+# The views that render charts, build DataFrames or cache querysets
+DEFAULT_TARGETS = (
+    'recipes:analytics',
+    'recipes:my_analytics',
+    'recipes:analytics_data',
+    '/analytics/charts/difficulty.png',
+    '/search/?show_all=1',
+)
+
+
+def _format_size(size):
+    sign = '-' if size < 0 else '+'
+    size = abs(size)
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024 or unit == 'MiB':
+            return f'{sign}{size:.1f} {unit}' if unit != 'B' else f'{sign}{size} B'
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = ('Request views repeatedly under tracemalloc and report what keeps growing, '
+            'by area (charts, DataFrames, querysets) and by source line')
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', metavar='view',
+                            help='URL names or paths to trace (default: the analytics and search views)')
+        parser.add_argument('--requests', type=int, default=20, help='Traced requests per view')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untraced requests per view first, so one-time imports and caches are excluded')
+        parser.add_argument('--user', help='Username to request the views as (default: the first superuser)')
+        parser.add_argument('--top', type=int, default=10, help='Source lines to list per view')
+        parser.add_argument('--cached', action='store_true',
+                            help='Use the configured cache; by default every request renders from scratch')
+        parser.add_argument('--frames', type=int, default=TRACEBACK_FRAMES,
+                            help='Traceback depth; deeper attributes more to each area but is slower')
+        parser.add_argument('--dump', metavar='DIR', help='Also save the snapshots for offline analysis')
+
+    def handle(self, *args, **options):
+        user = self._user(options['user'])
+        paths = [self._path(target) for target in options['targets'] or DEFAULT_TARGETS]
+        if options['dump']:
+            os.makedirs(options['dump'], exist_ok=True)
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['cached']:
+            # With cache hits only the first request would render anything
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        with override_settings(**overrides):
+            client = Client()
+            client.force_login(user)
+            # Warm up untraced: tracing the first imports of matplotlib and
+            # pandas would be slow and bury the growth we're looking for
+            for path in paths:
+                for _ in range(options['warmup']):
+                    self._get(client, path)
+            tracemalloc.start(options['frames'])
+            try:
+                for path in paths:
+                    self._trace(client, path, options)
+            finally:
+                tracemalloc.stop()
+
+    def _user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named "{username}"')
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No superuser to request the views as; pass --user')
+        return user
+
+    def _path(self, target):
+        if not target.startswith('/'):
+            try:
+                target = reverse(target)
+            except NoReverseMatch:
+                raise CommandError(f'"{target}" is not a URL name without arguments; pass its path instead')
+        try:
+            resolve(target.split('?')[0])
+        except Resolver404:
+            raise CommandError(f'{target} does not match any view')
+        return target
+
+    def _get(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        response.close()
+        # With DEBUG on, Django keeps every query in connection.queries
+        reset_queries()
+
+    def _trace(self, client, path, options):
+        view = resolve(path.split('?')[0]).view_name
+        gc.collect()
+        before = take_snapshot()
+        for _ in range(options['requests']):
+            self._get(client, path)
+        gc.collect()
+        after = take_snapshot()
+
+        if options['dump']:
+            name = view.replace(':', '-')
+            before.dump(os.path.join(options['dump'], f'{name}-before.tracemalloc'))
+            after.dump(os.path.join(options['dump'], f'{name}-after.tracemalloc'))
+
+        grown = sum(trace.size for trace in after.traces) - sum(trace.size for trace in before.traces)
+        current, peak = tracemalloc.get_traced_memory()
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{view}  {path}'))
+        self.stdout.write(
+            f'  {_format_size(grown)} after {options["requests"]} requests '
+            f'({_format_size(grown // max(options["requests"], 1))} per request); '
+            f'traced {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB'
+        )
+        for area, (size, count) in area_growth(before, after).items():
+            self.stdout.write(f'  {area:<20} {_format_size(size):>12} {count:>+8,} blocks')
+
+        allocators = top_allocators(before, after, options['top'])
+        if allocators:
+            self.stdout.write('  top allocators:')
+        for diff in allocators:
+            frame = diff.traceback[0]
+            self.stdout.write(f'    {_format_size(diff.size_diff):>12} {diff.count_diff:>+8,} blocks  '
+                              f'{short_filename(frame.filename)}:{frame.lineno}')
+        tracemalloc.reset_peak()
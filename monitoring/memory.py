@@ -0,0 +1,86 @@
+"""tracemalloc helpers for pinning down memory growth in the views.
+
+Snapshots are compared per source line, and growth is also attributed to the
+areas below, matched anywhere in an allocation's traceback: allocations made
+by matplotlib while ``recipes.charts`` renders count as chart rendering even
+though the allocating line is deep inside matplotlib. A trace can belong to
+several areas (a chart render evaluates querysets), so the areas don't add up
+to the total.
+"""
+import os
+import sysconfig
+import tracemalloc
+from fnmatch import fnmatch
+
+from django.conf import settings
+
+# Deeper tracebacks attribute more allocations to an area but slow every
+# allocation down: a chart render takes 4x as long with 10 frames, 10x with 30
+TRACEBACK_FRAMES = 10
+
+AREAS = {
+    'chart rendering': ('*/recipes/charts.py', '*/matplotlib/*'),
+    'DataFrame creation': ('*/recipes/dataframes.py', '*/pandas/*'),
+    'queryset caching': ('*/django/db/models/query.py',),
+}
+
+# Allocations of tracemalloc itself and of the import machinery are noise
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def take_snapshot():
+    """Return a tracemalloc snapshot without tracemalloc's own allocations"""
+    return tracemalloc.take_snapshot().filter_traces(_NOISE)
+
+
+def _area_sizes(snapshot):
+    """Return {area: [size, count]} of the traces made within each area"""
+    sizes = {area: [0, 0] for area in AREAS}
+    # Tracebacks repeat the same few hundred files, so match each file once
+    areas_of_file = {}
+    for trace in snapshot.traces:
+        matched = set()
+        for frame in trace.traceback:
+            areas = areas_of_file.get(frame.filename)
+            if areas is None:
+                areas = areas_of_file[frame.filename] = {
+                    area for area, patterns in AREAS.items()
+                    if any(fnmatch(frame.filename, pattern) for pattern in patterns)
+                }
+            matched |= areas
+        for area in matched:
+            sizes[area][0] += trace.size
+            sizes[area][1] += 1
+    return sizes
+
+
+def area_growth(before, after):
+    """Return {area: (size_diff, count_diff)} between two snapshots"""
+    sizes_before, sizes_after = _area_sizes(before), _area_sizes(after)
+    return {
+        area: (sizes_after[area][0] - sizes_before[area][0], sizes_after[area][1] - sizes_before[area][1])
+        for area in AREAS
+    }
+
+
+def top_allocators(before, after, limit=10):
+    """Return the StatisticDiffs of the source lines that grew the most"""
+    diffs = after.compare_to(before, 'lineno')
+    return [diff for diff in diffs if diff.size_diff > 0][:limit]
+
+
+def short_filename(filename):
+    """Return a path relative to the project, site-packages or the stdlib"""
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        return os.path.relpath(filename, base_dir)
+    _, marker, rest = filename.rpartition('site-packages' + os.sep)
+    if marker:
+        return rest
+    stdlib = sysconfig.get_paths()['stdlib']
+    return os.path.relpath(filename, stdlib) if filename.startswith(stdlib) else filename
@@ -0,0 +1,73 @@
+"""Prometheus metrics of the Recipe App.
+
+With several gunicorn workers each process only sees its own requests, so
+prometheus_client runs in multiprocess mode when PROMETHEUS_MULTIPROC_DIR is
+set (gunicorn.conf.py does this): every worker writes its samples to files
+in that directory and the /metrics view merges them. Without the variable,
+e.g. under runserver or in tests, the default in-process registry is used.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+from . import timing
+
+# Latency buckets in seconds; chart renders and cold analytics pages land in
+# the upper ones
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REQUESTS = Counter(
+    'recipe_http_requests', 'HTTP requests by view, method and status',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'recipe_http_request_duration_seconds', 'Time spent handling a request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'recipe_db_queries_per_request', 'Database queries run while handling a request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    'recipe_db_time_per_request_seconds', 'Time spent in database queries per request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+TEMPLATE_RENDER = Histogram(
+    'recipe_template_render_seconds', 'Time spent rendering a template',
+    ['template'], buckets=LATENCY_BUCKETS,
+)
+CHART_RENDER = Histogram(
+    'recipe_chart_render_seconds', 'Time spent rendering a matplotlib chart',
+    ['chart'], buckets=LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'recipe_cache_lookups', 'Single-flight cache lookups by cache and result (fresh, stale, wait, miss, error)',
+    ['cache', 'result'],
+)
+
+# Server-Timing category the histograms also report to
+TIMING_CATEGORIES = {TEMPLATE_RENDER: 'template', CHART_RENDER: 'chart'}
+
+
+def record_duration(histogram, seconds, **labels):
+    """Record ``seconds`` in ``histogram`` and the request's timings"""
+    histogram.labels(**labels).observe(seconds)
+    if histogram in TIMING_CATEGORIES:
+        timing.record(TIMING_CATEGORIES[histogram], seconds)
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """Time the block and record it with ``record_duration``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(histogram, time.perf_counter() - started, **labels)
+
+
+def record_cache_lookup(key, result):
+    """Count a cache lookup under the key's namespace, e.g. "analytics" """
+    CACHE_LOOKUPS.labels(cache=key.split(':', 1)[0], result=result).inc()
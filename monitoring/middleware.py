@@ -0,0 +1,217 @@
+import logging
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_VIEW = '<unresolved>'
+_MONITORING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _query_origin():
+    """Return "file:line in function" of the app code that issued a query"""
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(base_dir) and not filename.startswith(_MONITORING_DIR)
+                and 'site-packages' not in filename):
+            return f'{os.path.relpath(filename, base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting the queries of one request.
+
+    Besides the totals it keeps every statement slower than
+    ``SLOW_QUERY_MS`` and counts executions per statement, so statements run
+    ``SLOW_QUERY_REPEAT_THRESHOLD`` times or more (N+1 patterns) show up even
+    when each execution is fast.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = []
+        # sql -> [executions, seconds, origin]
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            statement = self.statements.setdefault(sql, [0, 0.0, ''])
+            statement[0] += 1
+            statement[1] += elapsed
+            if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+                self.slow.append((sql, elapsed, _query_origin()))
+            elif statement[0] == settings.SLOW_QUERY_REPEAT_THRESHOLD:
+                # Where the repeats come from; only looked up once per statement
+                statement[2] = _query_origin()
+
+    def log_entries(self, view, path):
+        """Return unsaved SlowQuery rows for the slow and repeated statements"""
+        from .models import SlowQuery
+
+        entries = [
+            SlowQuery(kind='slow', view=view, path=path, sql=sql, origin=origin, duration_ms=elapsed * 1000)
+            for sql, elapsed, origin in self.slow
+        ]
+        entries += [
+            SlowQuery(kind='repeated', view=view, path=path, sql=sql, origin=origin,
+                      executions=executions, duration_ms=elapsed * 1000)
+            for sql, (executions, elapsed, origin) in self.statements.items()
+            if executions >= settings.SLOW_QUERY_REPEAT_THRESHOLD
+        ]
+        return entries
+
+
+# (kind, view, sql) -> time.monotonic() of the last write, per process
+_last_logged = {}
+
+
+def _throttle(entries):
+    """Drop entries whose statement this process logged for the same view
+    less than ``SLOW_QUERY_LOG_INTERVAL`` seconds ago"""
+    now = time.monotonic()
+    interval = settings.SLOW_QUERY_LOG_INTERVAL
+    kept = []
+    for entry in entries:
+        key = (entry.kind, entry.view, entry.sql)
+        last = _last_logged.get(key)
+        if last is not None and now - last < interval:
+            continue
+        _last_logged[key] = now
+        kept.append(entry)
+    if len(_last_logged) > 10 * settings.SLOW_QUERY_LOG_SIZE:
+        # Forget statements whose interval has passed so the dict stays bounded
+        for key, last in list(_last_logged.items()):
+            if now - last >= interval:
+                del _last_logged[key]
+    return kept
+
+
+def _save_slow_queries(entries):
+    """Append entries to the slow-query log.
+
+    The log is trimmed by ``manage.py prune_slow_queries``, not here, so a
+    request only pays for one INSERT.
+    """
+    from .models import SlowQuery
+
+    try:
+        SlowQuery.objects.bulk_create(entries)
+    except DatabaseError:
+        # Never fail a request because the log couldn't be written
+        logger.exception('Could not write the slow-query log')
+
+
+def prune_slow_queries():
+    """Delete all but the newest ``SLOW_QUERY_LOG_SIZE`` log entries; return how many"""
+    from .models import SlowQuery
+
+    size = settings.SLOW_QUERY_LOG_SIZE
+    cutoff = list(SlowQuery.objects.order_by('-pk').values_list('pk', flat=True)[size:size + 1])
+    if not cutoff:
+        return 0
+    return SlowQuery.objects.filter(pk__lte=cutoff[0]).delete()[0]
+
+
+def _add_execute_wrapper(wrapper):
+    for alias in connections:
+        connections[alias].execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    for alias in connections:
+        connections[alias].execute_wrappers.remove(wrapper)
+
+
+def _wants_server_timing(request):
+    if settings.SERVER_TIMING == 'all':
+        return True
+    if settings.SERVER_TIMING == 'staff':
+        user = getattr(request, 'user', None)
+        return settings.DEBUG or (user is not None and user.is_staff)
+    return False
+
+
+class MetricsMiddleware:
+    """Record latency, status and database usage of every request per view.
+
+    Also logs slow and repeated SQL statements to ``SlowQuery`` and adds a
+    ``Server-Timing`` header (db, template, chart, cache) for staff users,
+    or for everyone with ``SERVER_TIMING = 'all'``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        timings, token = timing.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        self.record(request, response, recorder, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        timings, token = timing.start()
+        started = time.perf_counter()
+        # The async ORM queries on the request's sync_to_async thread, whose
+        # connections differ from the ones seen here on the event loop
+        await sync_to_async(_add_execute_wrapper)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.stop(token)
+            await sync_to_async(_remove_execute_wrapper)(recorder)
+        elapsed = time.perf_counter() - started
+        await sync_to_async(self.record)(request, response, recorder, timings, elapsed)
+        return response
+
+    def record(self, request, response, recorder, timings, elapsed):
+        """Update the metrics, the slow-query log and the Server-Timing header"""
+        # Label by URL name rather than path so ids don't explode the series
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED_VIEW
+        metrics.REQUESTS.labels(view=view, method=request.method, status=response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(view=view).observe(elapsed)
+        metrics.DB_QUERIES.labels(view=view).observe(recorder.count)
+        metrics.DB_TIME.labels(view=view).observe(recorder.seconds)
+
+        entries = _throttle(recorder.log_entries(view, request.path[:500]))
+        if entries:
+            _save_slow_queries(entries)
+
+        if _wants_server_timing(request):
+            timings.seconds['db'] = recorder.seconds
+            timings.counts['db'] = recorder.count
+            response.headers['Server-Timing'] = timings.header(elapsed)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('slow', 'Slow statement'), ('repeated', 'Repeated statement (possible N+1)')], max_length=10)),
+                ('view', models.CharField(help_text='URL name of the view that ran the statement', max_length=200)),
+                ('path', models.CharField(max_length=500)),
+                ('sql', models.TextField()),
+                ('origin', models.CharField(blank=True, help_text='App code that issued the statement', max_length=500)),
+                ('executions', models.PositiveIntegerField(default=1)),
+                ('duration_ms', models.FloatField(help_text='Total time of all executions in the request')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Slow queries',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
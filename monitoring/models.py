@@ -0,0 +1,56 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """A slow or frequently repeated SQL statement seen while serving a request.
+
+    Written by ``MetricsMiddleware``; ``manage.py prune_slow_queries`` keeps
+    the newest ``settings.SLOW_QUERY_LOG_SIZE`` rows. Statements are stored with
+    their placeholders, never with parameter values.
+    """
+    KIND_CHOICES = [
+        ('slow', 'Slow statement'),
+        ('repeated', 'Repeated statement (possible N+1)'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    view = models.CharField(max_length=200, help_text="URL name of the view that ran the statement")
+    path = models.CharField(max_length=500)
+    sql = models.TextField()
+    origin = models.CharField(max_length=500, blank=True, help_text="App code that issued the statement")
+    executions = models.PositiveIntegerField(default=1)
+    duration_ms = models.FloatField(help_text="Total time of all executions in the request")
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} in {self.view} ({self.duration_ms:.1f} ms)"
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name_plural = "Slow queries"
+
+
+class ProfileRecord(models.Model):
+    """A cProfile capture of one request, triggered by a staff user.
+
+    ``stats`` holds the same marshalled data ``cProfile`` writes to a
+    ``.prof`` file, so downloads open in pstats, snakeviz or flameprof.
+    Only the newest ``settings.PROFILE_LOG_SIZE`` records are kept.
+    """
+    view = models.CharField(max_length=200)
+    path = models.CharField(max_length=500)
+    user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    summary = models.TextField(help_text="Top functions by cumulative time")
+    stats = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Profile of {self.view} ({self.duration_ms:.0f} ms)"
+
+    def filename(self):
+        return f"profile-{self.pk}-{self.view.replace(':', '-')}.prof"
+
+    class Meta:
+        ordering = ['-created']
@@ -0,0 +1,118 @@
+"""On-demand cProfile captures of single requests.
+
+Staff users add ``?profile=1`` to a URL (or send ``X-Profile: 1``) and
+``ProfilingMiddleware`` profiles that request, stores the result as a
+``ProfileRecord`` and points to the ``.prof`` download in the
+``X-Profile-URL`` response header.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Only one profiler can be active per interpreter, so concurrent requests in
+# threaded workers take turns; the ones that find it busy run unprofiled
+_profiler_lock = threading.Lock()
+
+SUMMARY_LINES = 40
+
+
+def wants_profile(request):
+    """Return whether a staff user asked for this request to be profiled"""
+    return _asked_for_profile(request) and request.user.is_staff
+
+
+def _asked_for_profile(request):
+    asked = request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+    return asked and settings.PROFILING_ENABLED
+
+
+def profile_request(get_response, request):
+    """Run the request under cProfile and return (response, ProfileRecord)"""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    profiler.create_stats()
+    # Marshal first: building a pstats.Stats from the profiler empties it
+    stats = marshal.dumps(profiler.stats)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).strip_dirs().sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    return response, _save(request, response, elapsed, summary.getvalue(), stats)
+
+
+def _save(request, response, elapsed, summary, stats):
+    from .models import ProfileRecord
+
+    match = request.resolver_match
+    try:
+        record = ProfileRecord.objects.create(
+            view=match.view_name if match else '<unresolved>',
+            path=request.get_full_path()[:500],
+            user=request.user,
+            status_code=response.status_code,
+            duration_ms=elapsed * 1000,
+            summary=summary,
+            stats=stats,
+        )
+        size = settings.PROFILE_LOG_SIZE
+        cutoff = list(ProfileRecord.objects.order_by('-pk').values_list('pk', flat=True)[size:size + 1])
+        if cutoff:
+            ProfileRecord.objects.filter(pk__lte=cutoff[0]).delete()
+        return record
+    except DatabaseError:
+        logger.exception('Could not store the request profile')
+        return None
+
+
+class ProfilingMiddleware:
+    """Profile requests of staff users who ask for it; see the module docstring"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response.headers['X-Profile'] = 'busy'
+            return response
+        try:
+            response, record = profile_request(self.get_response, request)
+        finally:
+            _profiler_lock.release()
+        if record is not None:
+            response.headers['X-Profile-URL'] = reverse('monitoring:profile_download', args=[record.pk])
+        return response
+
+    async def __acall__(self, request):
+        # cProfile only sees the event loop thread, not the ORM and template
+        # work done in sync_to_async threads, so async views aren't profiled
+        asked = _asked_for_profile(request)
+        response = await self.get_response(request)
+        if asked:
+            response.headers['X-Profile'] = 'unsupported'
+        return response
@@ -0,0 +1,21 @@
+"""Metrics of work done in other apps, recorded from the signals they send.
+
+The recipes app doesn't import monitoring; it announces chart renders and
+cache lookups (see ``recipes.instrumentation``) and the receivers below turn
+them into Prometheus samples and Server-Timing entries.
+"""
+from django.dispatch import receiver
+
+from recipes.instrumentation import cache_lookup, chart_rendered
+from . import metrics, timing
+
+
+@receiver(chart_rendered)
+def record_chart_render(sender, chart, seconds, **kwargs):
+    metrics.record_duration(metrics.CHART_RENDER, seconds, chart=chart)
+
+
+@receiver(cache_lookup)
+def record_cache_lookup(sender, key, result, seconds, **kwargs):
+    metrics.record_cache_lookup(key, result)
+    timing.record('cache', seconds)
@@ -0,0 +1,22 @@
+"""Django template backend that records render times.
+
+Set as the ``BACKEND`` in ``settings.TEMPLATES``; it behaves exactly like
+``DjangoTemplates`` but times every top-level ``render()`` per template name.
+"""
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with metrics.observe(metrics.TEMPLATE_RENDER, template=self.template.origin.template_name or '<string>'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
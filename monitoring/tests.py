@@ -0,0 +1,313 @@
+import marshal
+import os
+import pstats
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+from prometheus_client import REGISTRY
+
+from recipes.models import Recipe
+from . import middleware, profiling
+from .models import ProfileRecord, SlowQuery
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def n_plus_one_view(request):
+    """Count every recipe's ingredients one query at a time"""
+    return HttpResponse(' '.join(recipe.calculate_difficulty() for recipe in Recipe.objects.all()))
+
+
+# URLconf for tests that need a view the app doesn't have
+urlpatterns = [path('n-plus-one/', n_plus_one_view, name='n_plus_one')]
+
+
+class MetricsMiddlewareTest(TestCase):
+    """Test the per-view request, database and template metrics"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='metrics', password='testpass123')
+        Recipe.objects.create(name='Measured Stew', cooking_time=45, user=self.user)
+        self.client.force_login(self.user)
+
+    def test_request_metrics_per_view(self):
+        """Test that latency, status and query counts are labelled by view"""
+        requests_before = sample('recipe_http_requests_total', view='recipes:list', method='GET', status='200')
+        latency_before = sample('recipe_http_request_duration_seconds_count', view='recipes:list')
+        queries_before = sample('recipe_db_queries_per_request_sum', view='recipes:list')
+        self.client.get(reverse('recipes:list'))
+        self.assertEqual(
+            sample('recipe_http_requests_total', view='recipes:list', method='GET', status='200'),
+            requests_before + 1,
+        )
+        self.assertEqual(sample('recipe_http_request_duration_seconds_count', view='recipes:list'), latency_before + 1)
+        # Session, user and the recipe queries at least
+        self.assertGreaterEqual(sample('recipe_db_queries_per_request_sum', view='recipes:list') - queries_before, 3)
+
+    def test_unresolved_requests(self):
+        """Test that 404s for unknown paths share one label"""
+        before = sample('recipe_http_requests_total', view='<unresolved>', method='GET', status='404')
+        self.client.get('/no/such/page/')
+        self.assertEqual(sample('recipe_http_requests_total', view='<unresolved>', method='GET', status='404'), before + 1)
+
+    def test_template_render_time(self):
+        """Test that rendering a page records its template"""
+        before = sample('recipe_template_render_seconds_count', template='recipes/detail.html')
+        self.client.get(reverse('recipes:detail', args=[Recipe.objects.get().pk]))
+        self.assertEqual(sample('recipe_template_render_seconds_count', template='recipes/detail.html'), before + 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_and_chart_metrics(self):
+        """Test cache lookups and chart render times from the analytics page"""
+        from django.core.cache import cache
+
+        cache.clear()
+        miss_before = sample('recipe_cache_lookups_total', cache='analytics', result='miss')
+        fresh_before = sample('recipe_cache_lookups_total', cache='analytics', result='fresh')
+        charts_before = sample('recipe_chart_render_seconds_count', chart='difficulty')
+        self.client.get(reverse('recipes:analytics'))
+        self.client.get(reverse('recipes:analytics'))
+        # The cold charts payload also misses on the series it is built from
+        self.assertEqual(sample('recipe_cache_lookups_total', cache='analytics', result='miss'), miss_before + 2)
+        self.assertEqual(sample('recipe_cache_lookups_total', cache='analytics', result='fresh'), fresh_before + 1)
+        self.assertEqual(sample('recipe_chart_render_seconds_count', chart='difficulty'), charts_before + 1)
+
+
+class MetricsViewTest(TestCase):
+    """Test access to the /metrics endpoint"""
+
+    def test_anonymous_forbidden(self):
+        """Test that anonymous scrapes without a token are rejected"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_staff_user(self):
+        """Test that staff users get the Prometheus text format"""
+        staff = User.objects.create_user(username='ops', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('recipes:home'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'recipe_http_request_duration_seconds_bucket', response.content)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_bearer_token(self):
+        """Test that scrapers authenticate with the bearer token"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+
+
+class ServerTimingTest(TestCase):
+    """Test the Server-Timing header"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='timing', password='testpass123')
+        self.staff = User.objects.create_user(username='timing-staff', password='testpass123', is_staff=True)
+
+    def test_staff_only_by_default(self):
+        """Test that only staff users get the header"""
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(reverse('recipes:list')).has_header('Server-Timing'))
+        self.client.force_login(self.staff)
+        header = self.client.get(reverse('recipes:list'))['Server-Timing']
+        for name in ('db', 'template', 'chart', 'cache', 'total'):
+            self.assertIn(f'{name};dur=', header)
+        self.assertIn('desc="Templates (1)"', header)
+
+    @override_settings(SERVER_TIMING='all')
+    def test_all_users(self):
+        """Test that SERVER_TIMING='all' adds the header for everyone"""
+        self.assertTrue(self.client.get(reverse('recipes:login')).has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING='off')
+    def test_off(self):
+        """Test that the header can be turned off, even for staff"""
+        self.client.force_login(self.staff)
+        self.assertFalse(self.client.get(reverse('recipes:list')).has_header('Server-Timing'))
+
+
+class SlowQueryLogTest(TestCase):
+    """Test the slow and repeated statement log"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='slowlog', password='testpass123')
+        for i in range(6):
+            Recipe.objects.create(name=f'Logged {i}', cooking_time=20, user=self.user)
+        self.client.force_login(self.user)
+        middleware._last_logged.clear()
+
+    @override_settings(ROOT_URLCONF='monitoring.tests')
+    def test_repeated_statements_are_logged_with_origin(self):
+        """Test that statements reaching the repeat threshold are logged with their origin"""
+        for i in range(6, 12):
+            Recipe.objects.create(name=f'Logged {i}', cooking_time=20, user=self.user)
+        self.client.get(reverse('n_plus_one'))
+        entry = SlowQuery.objects.get(kind='repeated', view='n_plus_one')
+        self.assertIn('COUNT(*)', entry.sql)
+        self.assertEqual(entry.executions, 12)
+        self.assertRegex(entry.origin, r'^recipes/models\.py:\d+ in calculate_difficulty$')
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_statements_are_logged_without_params(self):
+        """Test that statements above the threshold are logged with placeholders"""
+        self.client.get(reverse('recipes:list'))
+        entry = SlowQuery.objects.filter(kind='slow', view='recipes:list', sql__contains='recipes_recipe').first()
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.path, reverse('recipes:list'))
+        self.assertNotIn('slowlog', ''.join(SlowQuery.objects.values_list('sql', flat=True)))
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_statements_are_logged_once_per_interval(self):
+        """Test that a process doesn't log the same statement again within the interval"""
+        self.client.get(reverse('recipes:list'))
+        logged = SlowQuery.objects.count()
+        self.assertGreater(logged, 0)
+        self.client.get(reverse('recipes:list'))
+        self.assertEqual(SlowQuery.objects.count(), logged)
+        with override_settings(SLOW_QUERY_LOG_INTERVAL=0):
+            self.client.get(reverse('recipes:list'))
+        self.assertEqual(SlowQuery.objects.count(), logged * 2)
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=3)
+    def test_prune_keeps_the_newest_entries(self):
+        """Test that the prune command keeps the newest SLOW_QUERY_LOG_SIZE entries"""
+        for i in range(5):
+            SlowQuery.objects.create(kind='slow', view='recipes:list', path='/list/', sql=f'SELECT {i}',
+                                     duration_ms=150)
+        out = StringIO()
+        call_command('prune_slow_queries', stdout=out)
+        self.assertIn('Deleted 2 slow-query log entries', out.getvalue())
+        self.assertEqual(sorted(SlowQuery.objects.values_list('sql', flat=True)), ['SELECT 2', 'SELECT 3', 'SELECT 4'])
+
+    def test_fast_requests_log_nothing(self):
+        """Test that an ordinary page view adds no entries"""
+        self.client.get(reverse('recipes:list'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_admin_changelist(self):
+        """Test that staff can browse the log in the admin"""
+        SlowQuery.objects.create(kind='slow', view='recipes:list', path='/list/', sql='SELECT 1', duration_ms=150)
+        admin = User.objects.create_superuser(username='slowadmin', password='testpass123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:monitoring_slowquery_changelist'))
+        self.assertContains(response, 'SELECT 1')
+
+
+class ProfilingTest(TestCase):
+    """Test staff-triggered request profiles"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='profiled', password='testpass123')
+        self.staff = User.objects.create_user(username='profiler', password='testpass123', is_staff=True)
+
+    def test_staff_query_parameter(self):
+        """Test that ?profile=1 stores a profile pstats can load"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('recipes:list'), {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        record = ProfileRecord.objects.get()
+        self.assertEqual(record.view, 'recipes:list')
+        self.assertEqual(record.user, self.staff)
+        self.assertEqual(response['X-Profile-URL'], reverse('monitoring:profile_download', args=[record.pk]))
+        self.assertIn('cumulative', record.summary)
+
+        download = self.client.get(response['X-Profile-URL'])
+        self.assertEqual(download['Content-Type'], 'application/octet-stream')
+        self.assertIn('recipes-list.prof', download['Content-Disposition'])
+        with tempfile.NamedTemporaryFile(suffix='.prof') as prof:
+            prof.write(download.content)
+            prof.flush()
+            functions = [name for _, _, name in pstats.Stats(prof.name).stats]
+        self.assertIn('recipe_list', functions)
+
+    def test_staff_header(self):
+        """Test that the X-Profile header triggers a profile too"""
+        self.client.force_login(self.staff)
+        self.client.get(reverse('recipes:list'), HTTP_X_PROFILE='1')
+        self.assertEqual(ProfileRecord.objects.count(), 1)
+
+    def test_ignored_for_other_users(self):
+        """Test that non-staff and anonymous requests are never profiled"""
+        self.client.get(reverse('recipes:login'), {'profile': '1'})
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('recipes:list'), {'profile': '1'})
+        self.assertFalse(response.has_header('X-Profile-URL'))
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Test that PROFILING_ENABLED=False turns the hook off"""
+        self.client.force_login(self.staff)
+        self.client.get(reverse('recipes:list'), {'profile': '1'})
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    def test_busy_profiler(self):
+        """Test that a request arriving during another profile runs unprofiled"""
+        self.client.force_login(self.staff)
+        with profiling._profiler_lock:
+            response = self.client.get(reverse('recipes:list'), {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile'], 'busy')
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    @override_settings(PROFILE_LOG_SIZE=2)
+    def test_log_is_rolling(self):
+        """Test that only the newest profiles are kept"""
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse('recipes:list'), {'profile': '1'})
+        self.assertEqual(ProfileRecord.objects.count(), 2)
+
+    def test_download_requires_staff(self):
+        """Test that only staff users can download profiles"""
+        record = ProfileRecord.objects.create(
+            view='recipes:list', path='/list/', status_code=200, duration_ms=5,
+            summary='', stats=marshal.dumps({}),
+        )
+        url = reverse('monitoring:profile_download', args=[record.pk])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = User.objects.create_superuser(username='profileadmin', password='testpass123')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(reverse('admin:monitoring_profilerecord_changelist'))
+        self.assertContains(response, record.filename())
+
+
+class TraceMemoryCommandTest(TestCase):
+    """Test the trace_memory management command"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='tracer', password='testpass123')
+        for i in range(3):
+            Recipe.objects.create(name=f'Traced {i}', cooking_time=10 * (i + 1), user=self.admin)
+
+    def test_reports_areas_and_allocators(self):
+        """Test the per-view report of the traced views"""
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as dump:
+            call_command('trace_memory', 'recipes:analytics_data', '/analytics/charts/difficulty.png',
+                         requests=1, warmup=1, frames=5, dump=dump, stdout=out)
+            self.assertIn('recipes-analytics_chart-after.tracemalloc', os.listdir(dump))
+        output = out.getvalue()
+        self.assertIn('recipes:analytics_data  /analytics/data/', output)
+        self.assertIn('recipes:analytics_chart  /analytics/charts/difficulty.png', output)
+        for area in ('chart rendering', 'DataFrame creation', 'queryset caching'):
+            self.assertIn(area, output)
+
+    def test_errors(self):
+        """Test that unknown users, views and failing pages are reported"""
+        with self.assertRaises(CommandError):
+            call_command('trace_memory', 'recipes:analytics', user='nobody', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('trace_memory', 'recipes:detail', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('trace_memory', '/analytics/charts/unknown.png', requests=1, warmup=0, stdout=StringIO())
@@ -0,0 +1,52 @@
+"""Per-request time breakdown for the ``Server-Timing`` header.
+
+``MetricsMiddleware`` opens a ``RequestTimings`` for every request in a
+context variable; ``record`` adds to it from wherever the work happens
+(database wrapper, template backend, chart rendering, analytics cache).
+The entries can overlap: template time includes querysets evaluated while
+rendering and cache time includes recomputing a missing payload.
+"""
+from contextvars import ContextVar
+
+# Server-Timing metric names and descriptions, in header order
+CATEGORIES = {
+    'db': 'Database',
+    'template': 'Templates',
+    'chart': 'Chart rendering',
+    'cache': 'Analytics cache',
+}
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.seconds = dict.fromkeys(CATEGORIES, 0.0)
+        self.counts = dict.fromkeys(CATEGORIES, 0)
+
+    def header(self, total):
+        """Return the ``Server-Timing`` header value"""
+        entries = [
+            f'{name};dur={self.seconds[name] * 1000:.1f};desc="{description} ({self.counts[name]})"'
+            for name, description in CATEGORIES.items()
+        ]
+        entries.append(f'total;dur={total * 1000:.1f};desc="Total"')
+        return ', '.join(entries)
+
+
+def start():
+    """Start collecting timings for the current request; returns (timings, token)"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record(category, seconds):
+    """Add ``seconds`` spent on ``category`` to the current request, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.seconds[category] += seconds
+        timings.counts[category] += 1
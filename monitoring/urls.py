@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('profiles/<int:pk>.prof', views.profile_download, name='profile_download'),  # Request profile download (staff)
+]
@@ -0,0 +1,41 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .models import ProfileRecord
+
+
+def _authorized(request):
+    """Allow scrapes with the METRICS_TOKEN bearer token, staff users and DEBUG"""
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header, f'Bearer {settings.METRICS_TOKEN}'):
+            return True
+    return settings.DEBUG or request.user.is_staff
+
+
+def metrics_view(request):
+    """Expose the metrics of all workers in the Prometheus text format"""
+    if not _authorized(request):
+        return HttpResponseForbidden('Forbidden')
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+@staff_member_required
+def profile_download(request, pk):
+    """Download a stored request profile as a .prof file"""
+    record = get_object_or_404(ProfileRecord, pk=pk)
+    response = HttpResponse(bytes(record.stats), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{record.filename()}"'
+    return response
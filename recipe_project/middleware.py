@@ -0,0 +1,128 @@
+"""Compression of dynamic responses.
+
+WhiteNoise already serves pre-compressed static files and returns before the
+middleware below it runs, so ``CompressionMiddleware`` only sees responses
+built by views: the HTML pages, the analytics JSON and so on.
+
+BREACH: a compressed response can leak a secret when it also reflects
+attacker-controlled input, because the compressed length reveals how much of
+the input matches the secret. The only secret in our pages is the CSRF token.
+Django already masks it with a fresh random value per response. Pages that
+rendered a token are only gzipped, with a random number of padding bytes in
+the gzip header (as Django's GZipMiddleware does), so lengths stay noisy.
+Brotli has no equivalent padding, so it is only used for pages without a token.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+# Upper bound of the random padding added to gzip responses
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def _accepted_encodings(header):
+    """Return the content codings a client accepts, ignoring q=0 entries"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress text responses with brotli or gzip, whichever the client accepts"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        """Return ``response`` compressed for the client, if worthwhile"""
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        # get_token() sets this key whenever a page renders a CSRF token;
+        # CsrfViewMiddleware resets its value, but not the key, on the way out
+        carries_csrf_token = 'CSRF_COOKIE_NEEDS_UPDATE' in request.META
+        if brotli is not None and settings.COMPRESSION_BROTLI and 'br' in accepted and not carries_csrf_token:
+            encoding = 'br'
+        elif 'gzip' in accepted or '*' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Leave async streams alone rather than blocking on them
+                return response
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=GZIP_MAX_RANDOM_BYTES,
+                )
+            # The compressed size isn't known until the stream is consumed
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would claim the compressed bytes equal the original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def should_compress(self, response):
+        """Return whether ``response`` is worth compressing at all"""
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return False
+        return response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE
@@ -0,0 +1,67 @@
+"""Database routing for optional read replicas.
+
+Reads are only sent to a replica inside ``replica_reads()`` (or a view
+decorated with ``reads_from_replica``) and only for the catalog apps, so
+sessions, auth and admin edits keep read-your-writes consistency on the
+primary. Writes always go to the primary.
+"""
+import functools
+import random
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Apps whose reads may be served by a replica
+REPLICA_APPS = {'recipes', 'ingredients'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Route catalog reads in this block to a replica, if one is configured"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_from_replica(view):
+    """Decorator running a read-only reporting view against a replica"""
+    if iscoroutinefunction(view):
+        # The context variable carries over to the ORM's sync_to_async threads
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _replica_reads.get() and model._meta.app_label in REPLICA_APPS:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -13,7 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,24 +45,31 @@ INSTALLED_APPS = [
     'recipes',
     'users',
     'ingredients',
+    'monitoring',
+    'jobs',
+    'api',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
+    'recipe_project.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'recipe_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also records render times (see monitoring)
+        'BACKEND': 'monitoring.templates.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,14 +88,106 @@ WSGI_APPLICATION = 'recipe_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Seconds to keep connections open between requests. Set it to 0 under ASGI:
+# requests there run on short-lived threads whose connections would linger.
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=600, cast=int)
+
 DATABASES = {
     'default': dj_database_url.config(
         default=f'sqlite:///{BASE_DIR / "db.sqlite3"}',
-        conn_max_age=600,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
         conn_health_checks=True,
     )
 }
 
+# Optional read replicas, one database URL each. Reporting reads (analytics,
+# search and exports) are sent to them by recipe_project.routers.ReplicaRouter;
+# everything else, including all writes, stays on the primary.
+# For local testing: DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+DATABASE_REPLICAS = []
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True)
+    # Tests read replicas through the primary's test database
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['recipe_project.routers.ReplicaRouter']
+
+# SQLite production profile, applied to every new connection. Options an
+# operator already set (e.g. ?timeout=5 in DATABASE_URL) are kept.
+# WAL lets readers keep reading while a writer commits, synchronous=NORMAL is
+# durable in WAL mode with far fewer fsyncs, and IMMEDIATE transactions take
+# the write lock up front so concurrent writers wait for the busy timeout
+# instead of failing with "database is locked".
+SQLITE_PRODUCTION_PROFILE = config('SQLITE_PRODUCTION_PROFILE', default=True, cast=bool)
+SQLITE_INIT_COMMANDS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)}",
+    # Negative values are KiB rather than pages
+    f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_KB', default=64 * 1024, cast=int)}",
+    'PRAGMA temp_store=MEMORY',
+]
+
+SQLITE_PROFILE_OPTIONS = {
+    'init_command': ';'.join(SQLITE_INIT_COMMANDS),
+    'transaction_mode': 'IMMEDIATE',
+    # Seconds to wait for a lock before raising "database is locked"
+    'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+}
+
+
+def apply_sqlite_profile(database):
+    """Add the profile to a SQLite database's OPTIONS, keeping options already set"""
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        options = database.setdefault('OPTIONS', {})
+        for name, value in SQLITE_PROFILE_OPTIONS.items():
+            options.setdefault(name, value)
+
+
+if SQLITE_PRODUCTION_PROFILE:
+    for database in DATABASES.values():
+        apply_sqlite_profile(database)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# CACHE_BACKEND picks the backend: "locmem" (per process, the default),
+# "file" (shared by the workers on one machine) or "db" (shared by every
+# machine using the database; run `python manage.py createcachetable` first).
+# CACHE_LOCATION is the directory for "file" and the table name for "db".
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'recipe-app'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'django_cache'),
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}, not {CACHE_BACKEND!r}"
+    )
+_cache_class, _cache_location = CACHE_BACKENDS[CACHE_BACKEND]
+
+CACHES = {
+    'default': {
+        'BACKEND': _cache_class,
+        'LOCATION': config('CACHE_LOCATION', default=_cache_location),
+        'KEY_PREFIX': 'recipe-app',
+        'TIMEOUT': config('CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int)},
+    }
+}
+
+# Test runs swap in a dummy cache and plain static files storage
+TEST_RUNNER = 'recipe_project.test_runner.TestRunner'
+
+# Analytics payloads are served from cache for ANALYTICS_FRESH_SECONDS, then
+# returned stale for up to ANALYTICS_STALE_SECONDS while one worker refreshes them
+ANALYTICS_FRESH_SECONDS = config('ANALYTICS_FRESH_SECONDS', default=60, cast=int)
+ANALYTICS_STALE_SECONDS = config('ANALYTICS_STALE_SECONDS', default=3600, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,14 +224,91 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
 
 # Media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# WhiteNoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise serves the hashed, pre-compressed files written by collectstatic
+# and sends far-future cache headers for them, so the page stylesheets are
+# downloaded once per deploy. The manifest only exists after collectstatic,
+# so test runs use the plain storage (see recipe_project/test_runner.py).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Compression of dynamic responses (see recipe_project/middleware.py).
+# Brotli is used when the optional "brotli" package is installed.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_CONTENT_TYPES = {
+    'text/html',
+    'text/plain',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+}
+COMPRESSION_BROTLI = config('COMPRESSION_BROTLI', default=True, cast=bool)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
+# Prometheus metrics at /metrics (see monitoring/). Scrapers authenticate with
+# "Authorization: Bearer <METRICS_TOKEN>"; staff users can always view them.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Slow-query log (monitoring.SlowQuery, viewable in the admin): statements
+# slower than SLOW_QUERY_MS, and statements run SLOW_QUERY_REPEAT_THRESHOLD
+# times or more in one request (N+1 patterns). Each process logs a statement
+# at most once per view every SLOW_QUERY_LOG_INTERVAL seconds, and
+# `manage.py prune_slow_queries` keeps the newest SLOW_QUERY_LOG_SIZE entries.
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=int)
+SLOW_QUERY_REPEAT_THRESHOLD = config('SLOW_QUERY_REPEAT_THRESHOLD', default=10, cast=int)
+SLOW_QUERY_LOG_INTERVAL = config('SLOW_QUERY_LOG_INTERVAL', default=60, cast=int)
+SLOW_QUERY_LOG_SIZE = config('SLOW_QUERY_LOG_SIZE', default=1000, cast=int)
+
+# Server-Timing response header: "staff" (staff users, everyone with DEBUG),
+# "all" or "off"
+SERVER_TIMING = config('SERVER_TIMING', default='staff')
+
+# On-demand request profiles: staff add ?profile=1 (or "X-Profile: 1") to a
+# URL and get a downloadable .prof in the admin (monitoring.ProfileRecord).
+# Only the newest PROFILE_LOG_SIZE profiles are kept.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_LOG_SIZE = config('PROFILE_LOG_SIZE', default=50, cast=int)
+
+# Serve the detail, search and analytics pages with the async views in
+# recipes/async_views.py. Only worth it under ASGI (recipe_project.asgi, e.g.
+# uvicorn); see benchmarks/asgi_vs_wsgi.py.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Background jobs (jobs.Job), run by `python manage.py run_worker`. Idle
+# workers poll every JOBS_POLL_INTERVAL seconds; successful jobs are deleted
+# after JOBS_KEEP_DAYS. With ANALYTICS_WARM_ON_CHANGE, recipe and ingredient
+# changes queue a re-render of the analytics cache (needs a shared cache).
+JOBS_POLL_INTERVAL = config('JOBS_POLL_INTERVAL', default=1.0, cast=float)
+JOBS_KEEP_DAYS = config('JOBS_KEEP_DAYS', default=7, cast=int)
+ANALYTICS_WARM_ON_CHANGE = config('ANALYTICS_WARM_ON_CHANGE', default=False, cast=bool)
+# Uploaded recipe images are downscaled to this many pixels per side by a job
+RECIPE_IMAGE_MAX_SIZE = config('RECIPE_IMAGE_MAX_SIZE', default=1600, cast=int)
+
+# JSON API (/api/v1/): list page size when ?limit= is missing and its maximum,
+# pages above API_STREAM_PAGE_SIZE rows are streamed, and the most ids one
+# batch request may ask for
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=1000, cast=int)
+API_STREAM_PAGE_SIZE = config('API_STREAM_PAGE_SIZE', default=200, cast=int)
+API_BATCH_MAX_IDS = config('API_BATCH_MAX_IDS', default=100, cast=int)
+# The changes feed (/api/v1/recipes/changes/) holds back changes younger than
+# API_CHANGES_LAG_SECONDS so slow transactions commit before clients move
+# past them. Recipe tombstones are kept RECIPE_TOMBSTONE_DAYS; older cursors
+# get a 410 and must sync from the start.
+API_CHANGES_LAG_SECONDS = config('API_CHANGES_LAG_SECONDS', default=5, cast=int)
+RECIPE_TOMBSTONE_DAYS = config('RECIPE_TOMBSTONE_DAYS', default=90, cast=int)
 
 # Security settings for production
 SECURE_BROWSER_XSS_FILTER = True
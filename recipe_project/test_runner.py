@@ -0,0 +1,38 @@
+"""Test runner that swaps in test-friendly caches and static files storage.
+
+Applied with ``override_settings`` when the test environment is set up, so
+it doesn't depend on how the tests were started, and ``settings.py`` stays
+the same for test and production processes.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    # A dummy cache so cached payloads never leak between tests; tests that
+    # exercise caching override it with a local-memory cache
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    },
+    # The hashed static files manifest only exists after collectstatic
+    'STORAGES': {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        },
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
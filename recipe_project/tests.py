@@ -0,0 +1,177 @@
+import gzip
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from recipes.models import Recipe
+from . import settings as project_settings
+from . import middleware
+from .middleware import CompressionMiddleware
+from .routers import ReplicaRouter, replica_reads
+
+
+class SQLiteProductionProfileTest(TestCase):
+    """Test that the SQLite production pragmas are applied to connections"""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_profile_options(self):
+        """Test the connection options of the default database"""
+        options = settings.DATABASES['default']['OPTIONS']
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', options['init_command'])
+        self.assertGreater(options['timeout'], 5)
+
+    def test_profile_keeps_configured_options(self):
+        """Test that the profile only fills in options that aren't set"""
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {'timeout': 3}}
+        project_settings.apply_sqlite_profile(database)
+        self.assertEqual(database['OPTIONS']['timeout'], 3)
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+        postgres = {'ENGINE': 'django.db.backends.postgresql', 'OPTIONS': {}}
+        project_settings.apply_sqlite_profile(postgres)
+        self.assertEqual(postgres['OPTIONS'], {})
+
+    def test_pragmas_applied_to_connection(self):
+        """Test that new connections run the init commands"""
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+
+
+class TestRunnerSettingsTest(SimpleTestCase):
+    """Test that the test runner swaps in test settings without changing settings.py"""
+
+    def test_test_settings_applied(self):
+        """Test that tests run with a dummy cache and plain static files storage"""
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.dummy.DummyCache')
+        self.assertEqual(
+            settings.STORAGES['staticfiles']['BACKEND'], 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        )
+
+    def test_settings_module_unchanged(self):
+        """Test that the settings module keeps the production cache and storage"""
+        self.assertNotEqual(project_settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.dummy.DummyCache')
+        self.assertEqual(
+            project_settings.STORAGES['staticfiles']['BACKEND'],
+            'whitenoise.storage.CompressedManifestStaticFilesStorage',
+        )
+
+
+class ReplicaRouterTest(TestCase):
+    """Test routing of catalog reads to read replicas"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """Test that reads outside replica_reads() use the primary"""
+        with override_settings(DATABASE_REPLICAS=['replica_1']):
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_catalog_reads_use_replica(self):
+        """Test that catalog reads inside replica_reads() go to a replica"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica_1')
+            self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_no_replicas_configured(self):
+        """Test that without replicas everything stays on the primary"""
+        with override_settings(DATABASE_REPLICAS=[]), replica_reads():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_writes_use_primary(self):
+        """Test that writes always go to the primary"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_analytics_view_reads_from_replica(self):
+        """Test that the analytics view runs inside replica_reads()"""
+        user = User.objects.create_user(username='replica', password='testpass123')
+        self.client.force_login(user)
+        routed = []
+        original = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            routed.append((model._meta.app_label, alias))
+            return alias
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            response = self.client.get(reverse('recipes:analytics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('recipes', 'default'), routed)
+        self.assertNotIn(('auth', 'default'), routed)
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    """Test compression of dynamic responses"""
+
+    body = b'<html>' + b'<p>Tomato soup with basil</p>' * 200 + b'</html>'
+
+    def compress(self, response, accept='gzip', meta=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept, **(meta or {}))
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip(self):
+        """Test that large HTML responses are gzipped"""
+        response = self.compress(HttpResponse(self.body))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_threshold_and_content_types(self):
+        """Test that small and non-text responses are left alone"""
+        small = self.compress(HttpResponse(b'<p>short</p>'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        png = self.compress(HttpResponse(self.body, content_type='image/png'))
+        self.assertFalse(png.has_header('Content-Encoding'))
+
+    def test_client_without_gzip(self):
+        """Test that clients refusing gzip get the plain response"""
+        response = self.compress(HttpResponse(self.body), accept='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_streaming(self):
+        """Test that streaming responses are compressed chunk by chunk"""
+        response = self.compress(StreamingHttpResponse(iter([self.body, self.body]), content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body * 2)
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        """Test that brotli is preferred when the client accepts it"""
+        response = self.compress(HttpResponse(self.body), accept='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), self.body)
+
+    def test_pages_with_csrf_token_are_only_gzipped(self):
+        """Test that pages carrying a CSRF token never use brotli"""
+        response = self.compress(HttpResponse(self.body), accept='gzip, br',
+                                 meta={'CSRF_COOKIE_NEEDS_UPDATE': False})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_login_page_is_gzipped_with_random_padding(self):
+        """Test the real login form: gzip only, different length per response"""
+        lengths = set()
+        for _ in range(5):
+            response = self.client.get(reverse('recipes:login'), HTTP_ACCEPT_ENCODING='br, gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            lengths.add(len(response.content))
+        self.assertGreater(len(lengths), 1)
@@ -18,9 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from monitoring.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
+    path('monitoring/', include('monitoring.urls')),
+    path('api/v1/', include('api.urls')),  # Read-only JSON API
     path('', include('recipes.urls')),
 ]
 
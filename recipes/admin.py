@@ -1,12 +1,19 @@
 from django.contrib import admin
+from django.db.models import Prefetch
 from .models import Recipe, Category
+from .difficulty import recompute_difficulty
+from .tasks import process_recipe_image, recompute_recipe_difficulty
 from ingredients.models import RecipeIngredient
 
+# Larger selections are recomputed by a background job (manage.py run_worker)
+INLINE_RECOMPUTE_LIMIT = 500
+
 # Register your models here.
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 3  # Show 3 empty ingredient forms by default
+    autocomplete_fields = ('ingredient',)  # Search ingredients instead of listing them all per row
     verbose_name = "Ingredient"
     verbose_name_plural = "Ingredients"
 
@@ -20,9 +27,12 @@ class CategoryAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'difficulty', 'cooking_time', 'servings', 'user', 'created_date', 'get_ingredients_display')
     list_filter = ('difficulty', 'category', 'created_date')
+    list_select_related = ('category', 'user')
     search_fields = ('name', 'description')
     readonly_fields = ('created_date', 'updated_date', 'difficulty')
+    autocomplete_fields = ('category', 'user')
     inlines = [RecipeIngredientInline]
+    actions = ['recompute_difficulty_action']
     
     fieldsets = (
         ('Basic Information', {
@@ -37,10 +47,41 @@ class RecipeAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Prefetch ingredients so the changelist preview costs no extra queries per row"""
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('recipeingredient_set', queryset=RecipeIngredient.objects.select_related('ingredient'))
+        )
+    
     def get_ingredients_display(self, obj):
         """Display ingredients in the list view"""
         ingredients = obj.get_ingredients_list()
         if ingredients:
-            return "; ".join(ingredients[:3])  # Show first 3 ingredients
+            preview = "; ".join(ingredients[:3])  # Show first 3 ingredients
+            if len(ingredients) > 3:
+                preview += f" (+{len(ingredients) - 3} more)"
+            return preview
         return "No ingredients"
     get_ingredients_display.short_description = "Ingredients" # type: ignore
+    
+    @admin.action(description="Recompute difficulty for selected recipes")
+    def recompute_difficulty_action(self, request, queryset):
+        """Recompute the stored difficulty of the selected recipes in batches"""
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        if len(pks) > INLINE_RECOMPUTE_LIMIT:
+            recompute_recipe_difficulty.enqueue(pks)
+            self.message_user(request, f"Queued difficulty recomputation of {len(pks)} recipes.")
+            return
+        checked, updated = recompute_difficulty(queryset)
+        self.message_user(request, f"Checked {checked} recipes, updated difficulty on {updated}.")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.image and 'image' in form.changed_data:
+            process_recipe_image.enqueue(obj.pk)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if any(formset.has_changed() for formset in formsets):
+            # Recipe.save() computed the difficulty before the ingredients were saved
+            recompute_recipe_difficulty.enqueue_with([[form.instance.pk]], dedup_key=f'difficulty:{form.instance.pk}')
@@ -0,0 +1,210 @@
+"""Aggregation of recipe analytics series.
+
+This module only depends on the ORM so it is cheap to import; the
+matplotlib rendering lives in ``recipes.charts`` and is loaded on demand.
+The ``cached_*`` helpers coalesce regeneration through ``recipes.singleflight``
+so concurrent requests don't all rebuild the same payload; with
+``background=False`` a stale payload is refreshed before returning, which is
+what ``manage.py warm_caches`` wants.
+"""
+import base64
+import heapq
+
+from django.conf import settings
+from django.db.models import Avg, Case, CharField, Count, Value, When
+from django.db.models.functions import TruncMonth
+
+from .models import Recipe
+from . import singleflight
+from .cache import namespace_version
+from .rollups import DEFAULT_GRANULARITY, creation_timeseries
+
+# Cooking time buckets shared by the PNG charts and the JSON series
+TIME_BUCKETS = ('Quick (<30 min)', 'Medium (30-60 min)', 'Long (>60 min)')
+DIFFICULTY_LEVELS = ('Easy', 'Medium', 'Hard')
+ANALYTICS_CHARTS = ('difficulty', 'cooking-time', 'recipe-times', 'created-over-time')
+# The recipe-times chart has a bar per recipe; matplotlib takes over 20s to
+# lay out a thousand of them, so it shows the longest recipes only
+RECIPE_TIMES_LIMIT = 30
+
+
+def time_bucket(cooking_time):
+    """Return the cooking time bucket label for a number of minutes"""
+    if cooking_time < 30:
+        return TIME_BUCKETS[0]
+    elif cooking_time <= 60:
+        return TIME_BUCKETS[1]
+    return TIME_BUCKETS[2]
+
+
+def build_analytics_series(granularity=DEFAULT_GRANULARITY):
+    """Aggregate the analytics chart series from all recipes.
+
+    Returns plain lists and dicts so the result can be rendered server-side
+    with matplotlib or shipped to the browser as JSON. The "recipes added
+    over time" series comes from the precomputed rollups at ``granularity``.
+    """
+    difficulty_counts = dict.fromkeys(DIFFICULTY_LEVELS, 0)
+    time_counts = dict.fromkeys(TIME_BUCKETS, 0)
+    recipe_times = []
+
+    # One query: the difficulty is annotated in SQL instead of counting the
+    # ingredients of every recipe separately
+    recipes = Recipe.objects.with_calculated_difficulty().only('name', 'cooking_time')
+    for recipe in recipes:
+        difficulty_counts[recipe.calculated_difficulty] += 1
+        time_counts[time_bucket(recipe.cooking_time)] += 1
+        recipe_times.append((recipe.name, recipe.cooking_time))
+
+    total = len(recipe_times)
+    total_time = sum(minutes for _, minutes in recipe_times)
+    # Keep the longest recipes, sorted by cooking time for better visualization
+    recipe_times = heapq.nlargest(RECIPE_TIMES_LIMIT, recipe_times, key=lambda item: item[1])
+    recipe_times.reverse()
+
+    return {
+        'difficulty': {
+            'labels': [level for level in DIFFICULTY_LEVELS if difficulty_counts[level]],
+            'counts': [difficulty_counts[level] for level in DIFFICULTY_LEVELS if difficulty_counts[level]],
+        },
+        'cooking_time': {
+            'labels': [bucket for bucket in TIME_BUCKETS if time_counts[bucket]],
+            'counts': [time_counts[bucket] for bucket in TIME_BUCKETS if time_counts[bucket]],
+        },
+        'recipe_times': {
+            'names': [name for name, _ in recipe_times],
+            'minutes': [minutes for _, minutes in recipe_times],
+        },
+        'created_over_time': creation_timeseries(granularity),
+        'summary': {
+            'total_recipes': total,
+            'avg_cooking_time': round(total_time / total, 1) if total else 0,
+            'easy_count': difficulty_counts['Easy'],
+            'medium_count': difficulty_counts['Medium'],
+            'hard_count': difficulty_counts['Hard'],
+            'quick_count': time_counts[TIME_BUCKETS[0]],
+        },
+    }
+
+
+def user_analytics_queries(user):
+    """Return {name: callable} for the independent queries of ``build_user_analytics``.
+
+    Each callable runs one query and returns plain rows, so the async view
+    can run them concurrently; ``assemble_user_analytics`` combines them.
+    """
+    recipes = Recipe.objects.filter(user=user).order_by()
+    bucket = Case(
+        When(cooking_time__lt=30, then=Value(TIME_BUCKETS[0])),
+        When(cooking_time__lte=60, then=Value(TIME_BUCKETS[1])),
+        default=Value(TIME_BUCKETS[2]),
+        output_field=CharField(),
+    )
+    return {
+        'summary': lambda: recipes.aggregate(total_recipes=Count('id'), avg_cooking_time=Avg('cooking_time')),
+        'difficulty': lambda: list(
+            recipes.with_calculated_difficulty().values('calculated_difficulty').annotate(total=Count('id'))
+        ),
+        'cooking_time': lambda: list(recipes.annotate(bucket=bucket).values('bucket').annotate(total=Count('id'))),
+        'categories': lambda: list(
+            recipes.values('category__name').annotate(total=Count('id')).order_by('-total', 'category__name')
+        ),
+        'monthly': lambda: list(
+            recipes.annotate(month=TruncMonth('created_date')).values('month')
+            .annotate(total=Count('id')).order_by('month')
+        ),
+    }
+
+
+def build_user_analytics(user):
+    """Aggregate the analytics series for one user's recipes.
+
+    Every series is a single grouped query over the user's recipes, served
+    by the (user, created_date) index, so the cost doesn't depend on
+    instantiating the user's recipes one by one.
+    """
+    return assemble_user_analytics({name: query() for name, query in user_analytics_queries(user).items()})
+
+
+def assemble_user_analytics(rows):
+    """Build the user analytics series from the results of ``user_analytics_queries``"""
+    summary, categories, monthly = rows['summary'], rows['categories'], rows['monthly']
+
+    difficulty_counts = dict.fromkeys(DIFFICULTY_LEVELS, 0)
+    for row in rows['difficulty']:
+        difficulty_counts[row['calculated_difficulty']] = row['total']
+
+    time_counts = dict.fromkeys(TIME_BUCKETS, 0)
+    for row in rows['cooking_time']:
+        time_counts[row['bucket']] = row['total']
+
+    return {
+        'difficulty': {
+            'labels': [level for level in DIFFICULTY_LEVELS if difficulty_counts[level]],
+            'counts': [difficulty_counts[level] for level in DIFFICULTY_LEVELS if difficulty_counts[level]],
+        },
+        'cooking_time': {
+            'labels': [bucket for bucket in TIME_BUCKETS if time_counts[bucket]],
+            'counts': [time_counts[bucket] for bucket in TIME_BUCKETS if time_counts[bucket]],
+        },
+        'categories': {
+            'labels': [row['category__name'] or 'Uncategorized' for row in categories],
+            'counts': [row['total'] for row in categories],
+        },
+        'created_per_month': {
+            'periods': [row['month'].date().isoformat() for row in monthly],
+            'counts': [row['total'] for row in monthly],
+        },
+        'summary': {
+            'total_recipes': summary['total_recipes'],
+            'avg_cooking_time': round(summary['avg_cooking_time'] or 0, 1),
+            'easy_count': difficulty_counts['Easy'],
+            'medium_count': difficulty_counts['Medium'],
+            'hard_count': difficulty_counts['Hard'],
+            'quick_count': time_counts[TIME_BUCKETS[0]],
+        },
+    }
+
+
+def _cached(key, compute, background=True):
+    # One stable key per payload; after recipes, ingredients or analytics are
+    # invalidated the previous payload is served while it is recomputed
+    return singleflight.get_or_compute(
+        f'analytics:{key}', compute,
+        fresh_for=settings.ANALYTICS_FRESH_SECONDS,
+        stale_for=settings.ANALYTICS_STALE_SECONDS,
+        background=background,
+        version=namespace_version('analytics'),
+    )
+
+
+def cached_analytics_series(granularity=DEFAULT_GRANULARITY, background=True):
+    """Return ``build_analytics_series`` through the single-flight cache"""
+    return _cached(f'series:{granularity}', lambda: build_analytics_series(granularity), background)
+
+
+def cached_analytics_charts(granularity=DEFAULT_GRANULARITY, background=True):
+    """Return the series and every chart as base64 PNG, cached together"""
+    def compute():
+        from .charts import render_analytics_chart
+
+        series = cached_analytics_series(granularity, background=False)
+        charts = {}
+        if series['summary']['total_recipes']:
+            for chart in ANALYTICS_CHARTS:
+                charts[chart] = base64.b64encode(render_analytics_chart(chart, series)).decode()
+        return {'series': series, 'charts': charts}
+
+    return _cached(f'charts:{granularity}', compute, background)
+
+
+def cached_analytics_chart_png(chart, granularity=DEFAULT_GRANULARITY, background=True):
+    """Return a single chart as PNG bytes, taken from the cached charts payload"""
+    payload = cached_analytics_charts(granularity, background)
+    if chart in payload['charts']:
+        return base64.b64decode(payload['charts'][chart])
+
+    # The payload has no charts for an empty catalog; the empty chart is cheap
+    from .charts import render_analytics_chart
+
+    return render_analytics_chart(chart, payload['series'])
@@ -0,0 +1,109 @@
+"""Async versions of the detail, search and analytics views for ASGI.
+
+``recipes.urls`` routes to these instead of ``recipes.views`` when
+``ASYNC_VIEWS`` is set. Under gunicorn's WSGI workers they would only add an
+event loop per request, so the sync views stay the default there.
+
+Django's async ORM runs every query of a request on one thread, so the
+queries themselves don't overlap. Work that doesn't need the request's
+connection goes through ``in_executor`` instead, on a pool thread with its
+own connection: the DataFrame of search results, the analytics cache and
+chart rendering, and the independent aggregates of "My Analytics", which
+run concurrently. Templates are rendered with ``sync_to_async`` because
+they can load the session and ``request.user`` lazily.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.http import Http404
+from django.shortcuts import render
+
+from recipe_project.routers import reads_from_replica
+from .analytics import assemble_user_analytics, cached_analytics_charts, cached_analytics_series, user_analytics_queries
+from .models import Recipe
+from .views import (
+    analytics_context, detail_context, detail_queryset, filter_search_results, requested_granularity,
+    search_queryset,
+)
+
+_render = sync_to_async(render)
+
+
+def _call_and_close(func, args):
+    try:
+        return func(*args)
+    finally:
+        # Pool threads open their own connections; don't leak them
+        connections.close_all()
+
+
+async def in_executor(func, *args):
+    """Run blocking ``func(*args)`` on a thread pool, off the event loop"""
+    return await sync_to_async(_call_and_close, thread_sensitive=False)(func, args)
+
+
+@login_required
+async def recipe_detail(request, pk):
+    """Display detailed view of a single recipe - Protected view"""
+    try:
+        recipe = await detail_queryset().aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise Http404('No Recipe matches the given query.')
+    return await _render(request, 'recipes/detail.html', detail_context(recipe))
+
+
+@login_required
+@reads_from_replica
+async def search_recipes(request):
+    """Search recipes with multiple criteria"""
+    from . import dataframes
+
+    recipes_df = dataframes.empty_recipes_dataframe()
+    search_performed = False
+
+    if request.method == 'POST' or request.GET.get('show_all'):
+        search_performed = True
+        criteria = request.POST if request.method == 'POST' else None
+        recipes = filter_search_results([recipe async for recipe in search_queryset(criteria)], criteria)
+        if recipes:
+            # pandas work would otherwise block every request on this worker
+            recipes_df = await in_executor(dataframes.recipes_to_dataframe, recipes)
+
+    context = {
+        'recipes_df': recipes_df,
+        'search_performed': search_performed,
+        'recipes_count': len(recipes_df) if not recipes_df.empty else 0
+    }
+    return await _render(request, 'recipes/search.html', context)
+
+
+@login_required
+@reads_from_replica
+async def analytics_view(request):
+    """Display data analytics with charts (see ``recipes.views.analytics_view``)"""
+    granularity = requested_granularity(request)
+    client_mode = request.GET.get('mode') == 'client'
+
+    # A cache miss aggregates and renders matplotlib charts for seconds
+    if client_mode:
+        series, charts = await in_executor(cached_analytics_series, granularity), {}
+    else:
+        payload = await in_executor(cached_analytics_charts, granularity)
+        series, charts = payload['series'], payload['charts']
+
+    return await _render(request, 'recipes/analytics.html', analytics_context(granularity, client_mode, series, charts))
+
+
+@login_required
+async def my_analytics_view(request):
+    """Display analytics for the logged-in user's own recipes"""
+    queries = user_analytics_queries(await request.auser())
+    results = await asyncio.gather(*(in_executor(query) for query in queries.values()))
+    series = assemble_user_analytics(dict(zip(queries, results)))
+    context = {
+        'chart_series': series,
+        **series['summary'],
+    }
+    return await _render(request, 'recipes/my_analytics.html', context)
@@ -0,0 +1,72 @@
+"""Versioned cache namespaces.
+
+Cached data belongs to one or more namespaces ("recipes", "ingredients",
+"analytics"). Every namespace has a version number stored in the cache, and
+``namespace_version`` combines it with the versions of the namespaces it
+depends on. Cached entries store the version they were computed for
+(``recipes.singleflight``), so bumping a namespace marks everything derived
+from it as stale at once, without scanning or deleting keys, while the
+previous value is still there to serve until the refresh lands.
+The signal handlers in ``recipes.signals`` and ``ingredients.signals`` bump
+the versions whenever the underlying models change.
+"""
+from django.core.cache import caches
+from django.db import transaction
+
+NAMESPACES = ('recipes', 'ingredients', 'analytics')
+# Namespaces whose changes invalidate a namespace's data
+DEPENDENCIES = {
+    'recipes': ('recipes',),
+    'ingredients': ('ingredients',),
+    'analytics': ('recipes', 'ingredients', 'analytics'),
+}
+
+
+def _version_key(namespace):
+    return f'ns:{namespace}:version'
+
+
+def _check(namespace):
+    if namespace not in NAMESPACES:
+        raise ValueError(f'Unknown cache namespace: {namespace}')
+
+
+def namespace_versions(*namespaces, cache_alias='default'):
+    """Return the current version of each namespace, in one cache round trip"""
+    for namespace in namespaces:
+        _check(namespace)
+    cache = caches[cache_alias]
+    stored = cache.get_many([_version_key(namespace) for namespace in namespaces])
+    return [stored.get(_version_key(namespace), 1) for namespace in namespaces]
+
+
+def namespace_version(namespace, cache_alias='default'):
+    """Return the current versions of ``namespace`` and its dependencies as one string"""
+    _check(namespace)
+    return '.'.join(map(str, namespace_versions(*DEPENDENCIES[namespace], cache_alias=cache_alias)))
+
+
+def bump_namespace(namespace, cache_alias='default'):
+    """Invalidate everything cached under ``namespace`` and its dependents"""
+    _check(namespace)
+    cache = caches[cache_alias]
+    key = _version_key(namespace)
+    # Versions never expire, otherwise a reset to 1 could revive old entries
+    if cache.add(key, 2, timeout=None):
+        return 2
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def bump_namespace_on_commit(namespace, using=None):
+    """Bump ``namespace`` once the current transaction commits.
+
+    Bumping before the commit would let a concurrent reader cache the old
+    rows under the new version.
+    """
+    _check(namespace)
+    transaction.on_commit(lambda: bump_namespace(namespace), using=using)
@@ -0,0 +1,137 @@
+"""Server-side matplotlib rendering of the analytics charts.
+
+Importing this module pulls in matplotlib, so views import it lazily on
+first use instead of at module load.
+"""
+import io
+import threading
+import time
+
+import matplotlib
+matplotlib.use('Agg')  # Use non-GUI backend
+import matplotlib.pyplot as plt
+
+from .instrumentation import chart_rendered
+
+DIFFICULTY_COLORS = {'Easy': '#2ecc71', 'Medium': '#f39c12', 'Hard': '#e74c3c'}
+TIME_BUCKET_COLORS = {
+    'Quick (<30 min)': '#3498db',
+    'Medium (30-60 min)': '#f39c12',
+    'Long (>60 min)': '#e74c3c',
+}
+
+# pyplot keeps a global "current figure", so renders in different threads
+# (threaded workers, warm_caches) must not interleave
+_pyplot_lock = threading.Lock()
+
+
+def _figure_to_png():
+    """Save the current pyplot figure as PNG bytes and close it"""
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    png = buffer.getvalue()
+    buffer.close()
+    plt.close()
+    return png
+
+
+def render_analytics_chart(chart, series):
+    """Render one of the ANALYTICS_CHARTS from the aggregated series as PNG bytes"""
+    with _pyplot_lock:
+        started = time.perf_counter()
+        try:
+            return _render_analytics_chart(chart, series)
+        finally:
+            chart_rendered.send(sender=None, chart=chart, seconds=time.perf_counter() - started)
+
+
+def _render_analytics_chart(chart, series):
+    if chart == 'difficulty':
+        # Bar Chart - Recipes by Difficulty
+        plt.figure(figsize=(10, 6))
+        x_labels = series['difficulty']['labels']
+        y_values = series['difficulty']['counts']
+
+        bars = plt.bar(x_labels, y_values, color=[DIFFICULTY_COLORS[label] for label in x_labels])
+        plt.title('Recipes by Difficulty Level', fontsize=16, fontweight='bold')
+        plt.xlabel('Difficulty Level', fontsize=12)
+        plt.ylabel('Number of Recipes', fontsize=12)
+
+        # Add value labels on bars
+        for i, bar in enumerate(bars):
+            height = bar.get_height()
+            plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                    f'{int(y_values[i])}', ha='center', va='bottom', fontweight='bold')
+
+        plt.tight_layout()
+
+    elif chart == 'cooking-time':
+        # Pie Chart - Cooking Time Categories
+        plt.figure(figsize=(8, 8))
+        labels = series['cooking_time']['labels']
+        sizes = series['cooking_time']['counts']
+        colors = [TIME_BUCKET_COLORS[label] for label in labels]
+
+        plt.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
+        plt.title('Recipe Distribution by Cooking Time', fontsize=16, fontweight='bold')
+
+    elif chart == 'recipe-times':
+        # Horizontal Bar Chart - Recipe Names vs Cooking Time
+        plt.figure(figsize=(14, 8))
+        recipe_names = series['recipe_times']['names']
+        cooking_times = series['recipe_times']['minutes']
+
+        # Create color map based on cooking time (gradient from green to red)
+        colors = []
+        max_time = max(cooking_times) if cooking_times else 60
+        for time in cooking_times:
+            if time < 20:
+                colors.append('#27ae60')  # Green for quick recipes
+            elif time < 40:
+                colors.append('#f39c12')  # Orange for medium recipes
+            else:
+                colors.append('#e74c3c')  # Red for long recipes
+
+        plt.barh(recipe_names, cooking_times, color=colors, alpha=0.8, edgecolor='white', linewidth=1)
+
+        plt.title('Longest Recipe Cooking Times', fontsize=16, fontweight='bold')
+        plt.xlabel('Cooking Time (minutes)', fontsize=12)
+        plt.ylabel('Recipe Names', fontsize=12)
+
+        # Add time labels on bars
+        for i, v in enumerate(cooking_times):
+            plt.text(v + max_time * 0.01, i, f'{v} min', va='center', fontweight='bold')
+
+        # Add a grid for easier reading
+        plt.grid(axis='x', alpha=0.3)
+        plt.tight_layout()
+
+    elif chart == 'created-over-time':
+        # Stacked Bar Chart - Recipes Added Over Time per Category
+        plt.figure(figsize=(14, 6))
+        timeseries = series['created_over_time']
+        periods = timeseries['periods']
+        positions = range(len(periods))
+        bottom = [0] * len(periods)
+        palette = plt.get_cmap('tab20')
+
+        for i, category in enumerate(timeseries['categories']):
+            plt.bar(positions, category['counts'], bottom=bottom, label=category['name'],
+                    color=palette(i % 20), edgecolor='white', linewidth=0.5)
+            bottom = [b + c for b, c in zip(bottom, category['counts'])]
+
+        plt.title(f"Recipes Added per {timeseries['granularity'].capitalize()}", fontsize=16, fontweight='bold')
+        plt.xlabel('Period', fontsize=12)
+        plt.ylabel('Recipes Added', fontsize=12)
+        # Thin out the tick labels so long day series stay readable
+        step = max(1, len(periods) // 12)
+        plt.xticks(list(positions)[::step], periods[::step], rotation=45, ha='right')
+        if timeseries['categories']:
+            plt.legend(loc='upper left', fontsize=9)
+        plt.grid(axis='y', alpha=0.3)
+        plt.tight_layout()
+
+    else:
+        raise ValueError(f'Unknown analytics chart: {chart}')
+
+    return _figure_to_png()
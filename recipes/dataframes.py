@@ -0,0 +1,31 @@
+"""pandas DataFrame construction for the search results table.
+
+Importing this module pulls in pandas, so views import it lazily on first
+use instead of at module load.
+"""
+import pandas as pd
+
+
+def empty_recipes_dataframe():
+    """Return an empty DataFrame for pages where no search was performed"""
+    return pd.DataFrame()
+
+
+def recipes_to_dataframe(recipes):
+    """Build the search results DataFrame from an iterable of recipes.
+
+    Pass recipes from ``with_calculated_difficulty()`` with their ingredients
+    prefetched; otherwise every row costs extra queries.
+    """
+    df_data = []
+    for recipe in recipes:
+        ingredients = recipe.get_ingredients_list()
+        difficulty = getattr(recipe, 'calculated_difficulty', None) or recipe.calculate_difficulty()
+        df_data.append({
+            'id': recipe.pk,
+            'name': recipe.name,
+            'cooking_time': recipe.cooking_time,
+            'difficulty': difficulty,
+            'ingredients': ', '.join(ingredients[:3]) + ('...' if len(ingredients) > 3 else '')
+        })
+    return pd.DataFrame(df_data)
@@ -0,0 +1,93 @@
+"""Batch recomputation of the stored ``Recipe.difficulty``.
+
+The stored difficulty goes stale when the thresholds in
+``Recipe.difficulty_for`` change or ingredients are edited outside the
+admin. ``recompute_difficulty`` fixes it in batches: per batch one query
+loads the recipes, one grouped query counts their ingredients and a single
+``bulk_update`` writes the rows that changed.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+
+from ingredients.models import RecipeIngredient
+from .cache import bump_namespace_on_commit
+from .models import Recipe
+
+DEFAULT_BATCH_SIZE = 500
+
+# SQLite allows a single writer at a time anyway, and shared-cache in-memory
+# databases fail with "table is locked" instead of honouring the busy timeout
+_sqlite_write_lock = threading.Lock()
+
+
+def _recompute_batch(pks):
+    """Recompute one batch of recipes and return how many changed"""
+    recipes = list(Recipe.objects.filter(pk__in=pks).only('pk', 'cooking_time', 'difficulty'))
+    counts = dict(
+        RecipeIngredient.objects.filter(recipe_id__in=pks)
+        .order_by().values('recipe_id').annotate(total=Count('id'))
+        .values_list('recipe_id', 'total')
+    )
+    changed = []
+    now = timezone.now()
+    for recipe in recipes:
+        difficulty = Recipe.difficulty_for(recipe.cooking_time, counts.get(recipe.pk, 0))
+        if recipe.difficulty != difficulty:
+            recipe.difficulty = difficulty
+            # bulk_update() skips auto_now; the changes feed needs the new date
+            recipe.updated_date = now
+            changed.append(recipe)
+    if changed:
+        fields = ['difficulty', 'updated_date']
+        if connections[Recipe.objects.db].vendor == 'sqlite':
+            with _sqlite_write_lock:
+                Recipe.objects.bulk_update(changed, fields)
+        else:
+            Recipe.objects.bulk_update(changed, fields)
+    return len(recipes), len(changed)
+
+
+def _recompute_batch_in_thread(pks):
+    try:
+        return _recompute_batch(pks)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def recompute_difficulty(queryset=None, batch_size=DEFAULT_BATCH_SIZE, workers=1, progress=None):
+    """Recompute the stored difficulty of ``queryset`` (all recipes by default).
+
+    With ``workers`` > 1 batches are processed in parallel threads.
+    ``progress`` is called as ``progress(checked, total)`` after each batch.
+    Returns a ``(checked, updated)`` tuple.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    batches = [pks[i:i + batch_size] for i in range(0, len(pks), batch_size)]
+    checked = updated = 0
+
+    def record(result):
+        nonlocal checked, updated
+        checked += result[0]
+        updated += result[1]
+        if progress:
+            progress(checked, len(pks))
+
+    if workers > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_recompute_batch_in_thread, batch) for batch in batches]
+            for future in as_completed(futures):
+                record(future.result())
+    else:
+        for batch in batches:
+            record(_recompute_batch(batch))
+    if updated:
+        # bulk_update() sends no signals
+        bump_namespace_on_commit('recipes')
+    return checked, updated
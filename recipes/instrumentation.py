@@ -0,0 +1,15 @@
+"""Signals sent from expensive work in the recipes app.
+
+Monitoring (or anything else) can connect to them to record metrics; the
+recipes app itself doesn't depend on who listens, or whether anyone does.
+
+- ``chart_rendered``: a matplotlib chart was rendered. Sent with ``chart``
+  (its name) and ``seconds``.
+- ``cache_lookup``: ``singleflight.get_or_compute`` returned or raised.
+  Sent with ``key``, ``result`` ("fresh", "stale", "wait", "miss", or
+  "error" if computing the value raised) and ``seconds``.
+"""
+from django.dispatch import Signal
+
+chart_rendered = Signal()
+cache_lookup = Signal()
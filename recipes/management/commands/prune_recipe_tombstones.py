@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import RecipeTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete recipe tombstones older than RECIPE_TOMBSTONE_DAYS'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.RECIPE_TOMBSTONE_DAYS)
+        deleted, _ = RecipeTombstone.objects.filter(deleted_date__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
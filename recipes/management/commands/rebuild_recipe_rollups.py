@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "recipes added over time" rollups from the recipe table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup rows.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.difficulty import DEFAULT_BATCH_SIZE, recompute_difficulty
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored difficulty of recipes in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Recipe ids to recompute (default: all recipes)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Recipes per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Batches processed in parallel')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+
+        def progress(checked, total):
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'  {checked}/{total} recipes checked')
+
+        checked, updated = recompute_difficulty(
+            queryset, batch_size=options['batch_size'], workers=options['workers'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} recipes, updated {updated}.'))
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.analytics import cached_analytics_charts
+from recipes.rollups import GRANULARITIES
+
+# Backends whose entries are visible to the web workers after this command exits
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.redis.RedisCache',
+)
+
+
+def _build_font_cache():
+    # Importing the font manager builds matplotlib's on-disk font cache, which
+    # otherwise happens during the first chart request after a deploy
+    from matplotlib import font_manager
+
+    return len(font_manager.fontManager.ttflist)
+
+
+def warmup_tasks(shared_cache=True):
+    """Return (name, callable) pairs for everything worth precomputing.
+
+    The charts payload of a granularity contains its series, and the PNG
+    exports are taken from it, so one task per granularity warms them all.
+    """
+    tasks = [('matplotlib font cache', _build_font_cache)]
+    if shared_cache:
+        for granularity in GRANULARITIES:
+            tasks.append((f'analytics charts ({granularity})',
+                          lambda g=granularity: cached_analytics_charts(g, background=False)))
+    return tasks
+
+
+class Command(BaseCommand):
+    help = 'Precompute analytics payloads and charts so the first requests after a deploy are fast'
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES['default']['BACKEND']
+        shared_cache = backend in SHARED_CACHE_BACKENDS
+        if not shared_cache:
+            self.stderr.write(self.style.WARNING(
+                f'{backend} is not shared between processes; only warming the matplotlib font cache. '
+                'Set CACHE_BACKEND=file or CACHE_BACKEND=db to warm the analytics too.'
+            ))
+
+        # The font cache doesn't touch the database, so it is built in a thread
+        # while the analytics are computed. Those run one after the other:
+        # chart rendering is serialized on the pyplot lock anyway, and each
+        # granularity renders its charts only once
+        font_task, *tasks = warmup_tasks(shared_cache)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            font_result = executor.submit(self._run, *font_task)
+            results = [self._run(name, task) for name, task in tasks]
+            results.insert(0, font_result.result())
+
+        failed = 0
+        for name, elapsed_ms, exc in results:
+            if exc is not None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'  {name}: failed ({exc})'))
+            elif options['verbosity'] >= 1:
+                self.stdout.write(f'  {name}: {elapsed_ms:.0f} ms')
+
+        elapsed = time.perf_counter() - started
+        message = f'Warmed {len(results) - failed}/{len(results)} caches in {elapsed:.2f}s.'
+        self.stdout.write(self.style.SUCCESS(message) if not failed else self.style.WARNING(message))
+
+    @staticmethod
+    def _run(name, task):
+        """Run one warm-up task, returning (name, elapsed ms, exception or None)"""
+        task_started = time.perf_counter()
+        error = None
+        try:
+            task()
+        except Exception as exc:
+            error = exc
+        return name, (time.perf_counter() - task_started) * 1000, error
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_category_image_recipe_description_recipe_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCreationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='recipes.category')),
+            ],
+            options={
+                'ordering': ['granularity', 'period_start'],
+                'unique_together': {('granularity', 'period_start', 'category')},
+            },
+        ),
+    ]
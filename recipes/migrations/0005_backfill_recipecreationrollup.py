@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+
+def backfill_rollups(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeCreationRollup = apps.get_model('recipes', 'RecipeCreationRollup')
+    truncs = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    rows = []
+    for granularity, trunc in truncs.items():
+        grouped = (
+            Recipe.objects.order_by()
+            .annotate(period=trunc('created_date'))
+            .values('period', 'category')
+            .annotate(total=Count('id'))
+        )
+        for group in grouped:
+            rows.append(RecipeCreationRollup(
+                granularity=granularity,
+                period_start=group['period'].date(),
+                category_id=group['category'],
+                recipe_count=group['total'],
+            ))
+    RecipeCreationRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipecreationrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0002_alter_recipeingredient_quantity'),
+        ('recipes', '0005_backfill_recipecreationrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'created_date'], name='recipe_user_created_idx'),
+        ),
+    ]
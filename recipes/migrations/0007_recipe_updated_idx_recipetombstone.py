@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:36
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0002_alter_recipeingredient_quantity'),
+        ('recipes', '0006_recipe_user_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField()),
+                ('deleted_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_date', 'id'], name='recipe_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetombstone',
+            index=models.Index(fields=['deleted_date', 'recipe_id'], name='tombstone_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_uncategorized_duplicates(apps, schema_editor):
+    # Deleted categories left several NULL-category rows for the same period;
+    # keep one per period holding their sum
+    RecipeCreationRollup = apps.get_model('recipes', 'RecipeCreationRollup')
+    duplicates = (
+        RecipeCreationRollup.objects.filter(category__isnull=True)
+        .values('granularity', 'period_start')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('recipe_count'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = RecipeCreationRollup.objects.filter(
+            category__isnull=True, granularity=group['granularity'], period_start=group['period_start'],
+        )
+        rows.exclude(pk=group['keep']).delete()
+        rows.update(recipe_count=group['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_updated_idx_recipetombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipecreationrollup',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='recipes.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipecreationrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('granularity', 'period_start'), name='rollup_uncategorized_unique'),
+        ),
+    ]
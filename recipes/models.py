@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -14,6 +17,30 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = "Categories"
 
+class RecipeQuerySet(models.QuerySet):
+    def with_ingredient_count(self):
+        """Annotate each recipe with ``ingredient_count`` using a correlated subquery"""
+        from ingredients.models import RecipeIngredient
+
+        counts = (
+            RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe').annotate(total=Count('id')).values('total')
+        )
+        return self.annotate(
+            ingredient_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+        )
+    
+    def with_calculated_difficulty(self):
+        """Annotate ``calculated_difficulty`` in SQL, mirroring Recipe.difficulty_for()"""
+        return self.with_ingredient_count().annotate(
+            calculated_difficulty=Case(
+                When(cooking_time__lt=30, ingredient_count__lte=5, then=Value('Easy')),
+                When(cooking_time__lte=60, ingredient_count__lte=10, then=Value('Medium')),
+                default=Value('Hard'),
+                output_field=models.CharField(),
+            )
+        )
+
 class Recipe(models.Model):
     DIFFICULTY_CHOICES = [
         ('Easy', 'Easy'),
@@ -34,6 +61,8 @@ class Recipe(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     ingredients = models.ManyToManyField('ingredients.Ingredient', through='ingredients.RecipeIngredient', blank=True)
     
+    objects = RecipeQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
     
@@ -50,12 +79,15 @@ class Recipe(models.Model):
     
     def calculate_difficulty(self):
         """Calculate recipe difficulty based on cooking time and number of ingredients"""
-        ingredient_count = self.ingredients.count()
-        
+        return self.difficulty_for(self.cooking_time, self.ingredients.count())
+    
+    @staticmethod
+    def difficulty_for(cooking_time, ingredient_count):
+        """Return the difficulty for a cooking time and number of ingredients"""
         # Base difficulty on cooking time and ingredient complexity
-        if self.cooking_time < 30 and ingredient_count <= 5:
+        if cooking_time < 30 and ingredient_count <= 5:
             return 'Easy'
-        elif self.cooking_time <= 60 and ingredient_count <= 10:
+        elif cooking_time <= 60 and ingredient_count <= 10:
             return 'Medium'
         else:
             return 'Hard'
@@ -72,3 +104,62 @@ class Recipe(models.Model):
     
     class Meta:
         ordering = ['-created_date']
+        indexes = [
+            # Per-user analytics filter by user and group by creation period
+            models.Index(fields=['user', 'created_date'], name='recipe_user_created_idx'),
+            # The changes feed reads recipes in (updated_date, id) order from a cursor
+            models.Index(fields=['updated_date', 'id'], name='recipe_updated_idx'),
+        ]
+
+class RecipeTombstone(models.Model):
+    """Record of a deleted recipe for the changes feed.
+
+    Created by the signals in ``recipes.signals`` so clients that mirror the
+    catalog learn about deletes. ``prune_recipe_tombstones`` removes rows
+    older than ``RECIPE_TOMBSTONE_DAYS``.
+    """
+    recipe_id = models.BigIntegerField()
+    deleted_date = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Recipe {self.recipe_id} deleted {self.deleted_date:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_date', 'recipe_id'], name='tombstone_deleted_idx'),
+        ]
+
+class RecipeCreationRollup(models.Model):
+    """Number of recipes created per period and category.
+
+    Rows are maintained incrementally by the signals in ``recipes.signals``
+    so the "recipes added over time" chart never re-groups the recipe table.
+    A NULL category holds uncategorized recipes; a deleted category's counts
+    are moved into those rows first (see ``rollups.merge_into_uncategorized``).
+    """
+    GRANULARITY_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+    
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    recipe_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        category = self.category.name if self.category else 'Uncategorized'
+        return f"{self.recipe_count} {category} recipes in {self.granularity} of {self.period_start}"
+    
+    class Meta:
+        unique_together = ('granularity', 'period_start', 'category')
+        constraints = [
+            # NULLs never collide in unique_together, so uncategorized rows
+            # need a constraint of their own
+            models.UniqueConstraint(
+                fields=['granularity', 'period_start'], condition=models.Q(category__isnull=True),
+                name='rollup_uncategorized_unique',
+            ),
+        ]
+        ordering = ['granularity', 'period_start']
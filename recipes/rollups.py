@@ -0,0 +1,165 @@
+"""Incrementally maintained "recipes added over time" rollups.
+
+Each recipe contributes one count to a ``RecipeCreationRollup`` row per
+granularity (day, week and month) for the period it was created in. The
+signal handlers in ``recipes.signals`` call ``apply_recipe_delta`` when a
+recipe is created, deleted or moved to another category, and
+``merge_into_uncategorized`` before a category is deleted; ``rebuild_rollups``
+recomputes everything from scratch after bulk loads that bypass signals.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .cache import bump_namespace_on_commit
+from .models import Recipe, RecipeCreationRollup
+
+GRANULARITIES = ('day', 'week', 'month')
+DEFAULT_GRANULARITY = 'month'
+# Number of most recent periods shown on the chart per granularity
+TIMESERIES_PERIODS = {'day': 90, 'week': 52, 'month': 24}
+UNCATEGORIZED = 'Uncategorized'
+
+
+def period_start(granularity, day):
+    """Return the first day of the period containing ``day``"""
+    if granularity == 'day':
+        return day
+    elif granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    elif granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def next_period(granularity, start):
+    """Return the start of the period following ``start``"""
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    elif granularity == 'week':
+        return start + timedelta(days=7)
+    elif granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def _add_to_rollup(granularity, start, category_id, delta):
+    """Atomically add ``delta`` to a single rollup row, creating it if needed"""
+    rows = RecipeCreationRollup.objects.filter(
+        granularity=granularity, period_start=start, category_id=category_id,
+    )
+    if rows.update(recipe_count=F('recipe_count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            RecipeCreationRollup.objects.create(
+                granularity=granularity, period_start=start,
+                category_id=category_id, recipe_count=delta,
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        rows.update(recipe_count=F('recipe_count') + delta)
+
+
+def apply_recipe_delta(created_date, category_id, delta):
+    """Add ``delta`` recipes created at ``created_date`` to every granularity"""
+    day = timezone.localdate(created_date)
+    for granularity in GRANULARITIES:
+        _add_to_rollup(granularity, period_start(granularity, day), category_id, delta)
+
+
+def merge_into_uncategorized(category_id):
+    """Move the counts of a category about to be deleted into the uncategorized rows.
+
+    Its recipes become uncategorized when the category goes, so their counts
+    are added to the uncategorized row of each period, or the category's row
+    becomes that row when the period has none yet.
+    """
+    own = RecipeCreationRollup.objects.filter(
+        category_id=category_id, granularity=OuterRef('granularity'), period_start=OuterRef('period_start'),
+    )
+    uncategorized = RecipeCreationRollup.objects.filter(
+        category__isnull=True, granularity=OuterRef('granularity'), period_start=OuterRef('period_start'),
+    )
+    with transaction.atomic():
+        RecipeCreationRollup.objects.filter(category__isnull=True).filter(Exists(own)).update(
+            recipe_count=F('recipe_count') + Subquery(own.values('recipe_count')[:1]),
+        )
+        rows = RecipeCreationRollup.objects.filter(category_id=category_id)
+        rows.exclude(Exists(uncategorized)).update(category=None)
+        rows.delete()
+
+
+def rebuild_rollups():
+    """Recompute all rollup rows from the recipe table"""
+    truncs = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    rows = []
+    for granularity, trunc in truncs.items():
+        grouped = (
+            Recipe.objects.order_by()
+            .annotate(period=trunc('created_date'))
+            .values('period', 'category')
+            .annotate(total=Count('id'))
+        )
+        for group in grouped:
+            rows.append(RecipeCreationRollup(
+                granularity=granularity,
+                period_start=group['period'].date(),
+                category_id=group['category'],
+                recipe_count=group['total'],
+            ))
+    with transaction.atomic():
+        RecipeCreationRollup.objects.all().delete()
+        RecipeCreationRollup.objects.bulk_create(rows, batch_size=1000)
+        bump_namespace_on_commit('analytics')
+    return len(rows)
+
+
+def creation_timeseries(granularity=DEFAULT_GRANULARITY):
+    """Return recipes created per period, overall and per category.
+
+    The result covers the most recent ``TIMESERIES_PERIODS[granularity]``
+    periods that contain recipes, with empty periods filled with zeros.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    rollups = RecipeCreationRollup.objects.filter(granularity=granularity, recipe_count__gt=0)
+    latest = rollups.order_by('-period_start').values_list('period_start', flat=True).first()
+    if latest is None:
+        return {'granularity': granularity, 'periods': [], 'totals': [], 'categories': []}
+
+    first = latest
+    for _ in range(TIMESERIES_PERIODS[granularity] - 1):
+        first = period_start(granularity, first - timedelta(days=1))
+    earliest = rollups.filter(period_start__gte=first).order_by('period_start') \
+        .values_list('period_start', flat=True).first()
+
+    periods = []
+    start = earliest
+    while start <= latest:
+        periods.append(start)
+        start = next_period(granularity, start)
+    index = {start: i for i, start in enumerate(periods)}
+
+    by_category = {}
+    grouped = (
+        rollups.filter(period_start__gte=earliest)
+        .values('period_start', 'category__name')
+        .annotate(total=Sum('recipe_count'))
+    )
+    for group in grouped:
+        name = group['category__name'] or UNCATEGORIZED
+        counts = by_category.setdefault(name, [0] * len(periods))
+        counts[index[group['period_start']]] += group['total']
+
+    names = sorted(by_category, key=lambda name: (name == UNCATEGORIZED, name))
+    return {
+        'granularity': granularity,
+        'periods': [start.isoformat() for start in periods],
+        'totals': [sum(counts[i] for counts in by_category.values()) for i in range(len(periods))],
+        'categories': [{'name': name, 'counts': by_category[name]} for name in names],
+    }
@@ -0,0 +1,180 @@
+"""Seeded generator of large, realistic catalogs for benchmarks.
+
+``seed_catalog`` bulk-inserts users, categories, ingredients, recipes and
+their ``RecipeIngredient`` rows in batches. The same seed always produces
+the same catalog, so benchmark runs on different commits measure the same
+data. Ingredient popularity follows a Zipf-like curve (salt and onions are
+in many recipes, saffron in few), recipes have 2-20 ingredients around a
+mean of about 8, and creation dates are spread over the last ``days`` days.
+
+Bulk inserts skip ``Recipe.save`` and the signals, so the stored difficulty
+is computed here from the generated fan-out, and the rollups and cache
+namespaces are refreshed once at the end.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from ingredients.models import Ingredient, RecipeIngredient
+from .cache import bump_namespace_on_commit
+from .models import Category, Recipe
+from .rollups import rebuild_rollups
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_BATCH_SIZE = 5000
+USERNAME_PREFIX = 'bench-user-'
+
+CATEGORIES = (
+    'Breakfast', 'Lunch', 'Dinner', 'Dessert', 'Snack', 'Soup', 'Salad', 'Baking',
+    'Vegetarian', 'Seafood', 'Drinks', 'Sides',
+)
+INGREDIENT_BASES = (
+    'salt', 'onion', 'garlic', 'olive oil', 'butter', 'flour', 'egg', 'sugar', 'milk', 'tomato',
+    'pepper', 'carrot', 'potato', 'rice', 'lemon', 'chicken', 'beef', 'cheese', 'basil', 'cream',
+    'lentils', 'chickpeas', 'spinach', 'mushroom', 'ginger', 'cumin', 'paprika', 'honey', 'yogurt',
+    'pasta', 'salmon', 'shrimp', 'tofu', 'coconut milk', 'cinnamon', 'vanilla', 'oats', 'almonds',
+    'parsley', 'thyme', 'rosemary', 'chili', 'soy sauce', 'vinegar', 'apple', 'banana', 'bread',
+    'celery', 'zucchini', 'saffron',
+)
+INGREDIENT_VARIANTS = (
+    '', 'fresh', 'dried', 'smoked', 'organic', 'roasted', 'ground', 'red', 'green', 'wild',
+    'sweet', 'baby', 'aged', 'frozen', 'chopped', 'toasted', 'pickled', 'black', 'white', 'young',
+)
+# The ingredients a dish is named after (nobody makes "Salt Soup")
+MAIN_INGREDIENTS = INGREDIENT_BASES[9:]
+UNITS = ('grams', 'ml', 'pieces', 'tbsp', 'tsp', 'cups')
+DISH_ADJECTIVES = (
+    'Smoky', 'Creamy', 'Spicy', 'Classic', 'Rustic', 'Quick', 'Hearty', 'Zesty', 'Golden',
+    'Grandma\'s', 'Crispy', 'Slow-Cooked', 'Summer', 'Winter', 'Herbed', 'Honey-Glazed',
+)
+DISHES = (
+    'Soup', 'Stew', 'Curry', 'Salad', 'Pasta', 'Risotto', 'Tacos', 'Pie', 'Bake', 'Stir-Fry',
+    'Pancakes', 'Omelette', 'Bowl', 'Skewers', 'Tart', 'Casserole', 'Chili', 'Flatbread',
+)
+
+
+def catalog_sizes(recipes):
+    """Return (users, ingredients) for a catalog of ``recipes`` recipes"""
+    return max(5, recipes // 50), min(len(INGREDIENT_BASES) * len(INGREDIENT_VARIANTS), max(200, recipes // 100))
+
+
+def ingredient_names(count):
+    """Return ``count`` distinct ingredient names, the most common ones first"""
+    names = []
+    for variant in INGREDIENT_VARIANTS:
+        for base in INGREDIENT_BASES:
+            names.append(f'{variant} {base}'.strip())
+            if len(names) == count:
+                return names
+    return names
+
+
+@contextmanager
+def _explicit_dates():
+    """Let the INSERTs in the block keep the generated recipe dates.
+
+    auto_now_add/auto_now would stamp every generated recipe with the current
+    time, and writing the dates with a second UPDATE costs as much as the
+    insert. The flags are class-wide, so the block should only wrap the
+    seeder's own bulk_create.
+    """
+    fields = [Recipe._meta.get_field('created_date'), Recipe._meta.get_field('updated_date')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _fanout(rng):
+    return min(20, max(2, round(rng.gauss(8, 3.5))))
+
+
+def _cooking_time(rng):
+    return min(240, max(5, round(rng.lognormvariate(3.5, 0.6))))
+
+
+def seed_catalog(recipes, seed=0, batch_size=DEFAULT_BATCH_SIZE, days=3 * 365, progress=None):
+    """Generate a catalog of ``recipes`` recipes and return the row counts.
+
+    ``progress(created, total)`` is called after every batch.
+    """
+    rng = random.Random(seed)
+    user_count, ingredient_count = catalog_sizes(recipes)
+
+    users = User.objects.bulk_create(
+        [User(username=f'{USERNAME_PREFIX}{i}', password='!') for i in range(user_count)],
+        batch_size=batch_size,
+    )
+    categories = Category.objects.bulk_create([Category(name=name) for name in CATEGORIES])
+    names = ingredient_names(ingredient_count)
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, unit_of_measure=rng.choice(UNITS)) for name in names], ignore_conflicts=True,
+    )
+    ids_by_name = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'pk'))
+    ingredient_ids = [ids_by_name[name] for name in names]
+    # Zipf-like popularity: the n-th ingredient is used 1/n as often as the first
+    cum_weights, total = [], 0.0
+    for rank in range(1, len(ingredient_ids) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+
+    now = timezone.now()
+    created = links = 0
+    while created < recipes:
+        size = min(batch_size, recipes - created)
+        batch, fanouts = [], []
+        for i in range(created, created + size):
+            fanout, cooking_time = _fanout(rng), _cooking_time(rng)
+            created_date = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            batch.append(Recipe(
+                name=f'{rng.choice(DISH_ADJECTIVES)} {rng.choice(MAIN_INGREDIENTS).title()} {rng.choice(DISHES)} #{i + 1}',
+                description=f'A {rng.choice(DISHES).lower()} for {rng.randint(1, 8)} with a few pantry staples.',
+                instructions='Prepare the ingredients.\nCook everything together.\nSeason and serve.',
+                cooking_time=cooking_time,
+                servings=rng.randint(1, 8),
+                difficulty=Recipe.difficulty_for(cooking_time, fanout),
+                created_date=created_date,
+                updated_date=created_date,
+                user=rng.choice(users),
+                # About one recipe in twenty is uncategorized
+                category=rng.choice(categories) if rng.random() >= 0.05 else None,
+            ))
+            fanouts.append(fanout)
+
+        with transaction.atomic():
+            with _explicit_dates():
+                Recipe.objects.bulk_create(batch)
+            rows = []
+            for recipe, fanout in zip(batch, fanouts):
+                chosen = set()
+                while len(chosen) < fanout:
+                    chosen.update(rng.choices(ingredient_ids, cum_weights=cum_weights, k=fanout - len(chosen)))
+                rows.extend(
+                    RecipeIngredient(recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                                     quantity=round(rng.uniform(0.5, 500), 1))
+                    for ingredient_id in chosen
+                )
+            RecipeIngredient.objects.bulk_create(rows, batch_size=batch_size)
+        created += size
+        links += len(rows)
+        if progress:
+            progress(created, recipes)
+
+    rebuild_rollups()
+    for namespace in ('recipes', 'ingredients'):
+        bump_namespace_on_commit(namespace)
+    return {
+        'users': len(users),
+        'categories': len(categories),
+        'ingredients': len(ingredient_ids),
+        'recipes': created,
+        'recipe_ingredients': links,
+    }
@@ -0,0 +1,82 @@
+"""Signal handlers for the recipes app, connected in RecipesConfig.ready()"""
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_namespace_on_commit
+from .models import Category, Recipe, RecipeTombstone
+from .rollups import apply_recipe_delta, merge_into_uncategorized
+from .tasks import warm_analytics_on_commit
+
+
+@receiver(post_init, sender=Recipe)
+def remember_rollup_category(sender, instance, **kwargs):
+    """Remember the category a recipe is currently counted under"""
+    # Read from __dict__ so deferred fields are not fetched on every load
+    instance._rollup_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender=Recipe)
+def update_creation_rollups(sender, instance, created, raw=False, **kwargs):
+    """Count new recipes and move recipes whose category changed"""
+    if raw:
+        return
+    if created:
+        apply_recipe_delta(instance.created_date, instance.category_id, 1)
+    elif instance.category_id != instance._rollup_category_id:
+        apply_recipe_delta(instance.created_date, instance._rollup_category_id, -1)
+        apply_recipe_delta(instance.created_date, instance.category_id, 1)
+    instance._rollup_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Recipe)
+def discount_deleted_recipe(sender, instance, **kwargs):
+    """Remove deleted recipes from the creation rollups"""
+    apply_recipe_delta(instance.created_date, instance._rollup_category_id, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_tombstone(sender, instance, using, **kwargs):
+    """Record the delete for the changes feed"""
+    RecipeTombstone.objects.using(using).create(recipe_id=instance.pk)
+
+
+@receiver(post_init, sender=Category)
+def remember_category_name(sender, instance, **kwargs):
+    """Remember the name recipes currently show for their category"""
+    instance._feed_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Category)
+def touch_renamed_category_recipes(sender, instance, created, using, raw=False, **kwargs):
+    """Move the recipes of a renamed category up the changes feed"""
+    if not (raw or created) and instance.name != instance._feed_name:
+        Recipe.objects.using(using).filter(category=instance).update(updated_date=timezone.now())
+    instance._feed_name = instance.name
+
+
+@receiver(pre_delete, sender=Category)
+def uncategorize_rollups(sender, instance, **kwargs):
+    """Count a deleted category's recipes as uncategorized in the rollups"""
+    merge_into_uncategorized(instance.pk)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_deleted_category_recipes(sender, instance, using, **kwargs):
+    """Move the recipes of a deleted category up the changes feed.
+
+    Runs before the delete: the SET_NULL on their category is a queryset
+    update that sends no signals, and afterwards they can't be told apart.
+    """
+    Recipe.objects.using(using).filter(category=instance).update(updated_date=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_recipe_caches(sender, instance, using, raw=False, **kwargs):
+    """Invalidate data cached under the "recipes" namespace"""
+    if not raw:
+        bump_namespace_on_commit('recipes', using=using)
+        warm_analytics_on_commit(using=using)
@@ -0,0 +1,120 @@
+"""Request coalescing and stale-while-revalidate on top of the Django cache.
+
+``get_or_compute`` makes sure only one caller recomputes a given key at a
+time. Callers that arrive while a value is being recomputed either get the
+last good copy (if there is one) or wait for the winner to publish it.
+Once a value has been computed, readers never block again: a stale value is
+returned immediately and refreshed in a background thread. A value computed
+for an older ``version`` of its inputs counts as stale, so invalidating the
+inputs doesn't leave readers without a copy to serve.
+
+Coalescing spans worker processes only when the cache backend is shared
+(database or file based); with the local-memory backend it is per process.
+"""
+import contextvars
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import connections
+
+from .instrumentation import cache_lookup
+
+# How often waiting callers poll the cache for the winner's result
+POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _acquire(cache, key, lock_timeout):
+    """Try to become the single caller recomputing ``key``"""
+    token = uuid.uuid4().hex
+    return token if cache.add(_lock_key(key), token, lock_timeout) else None
+
+
+def _release(cache, key, token):
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _compute_and_store(cache, key, compute, fresh_for, stale_for, token, version):
+    """Compute a value, publish it and release the lock"""
+    try:
+        value = compute()
+        # ``version`` was read before computing, so a change that lands
+        # mid-computation leaves the entry stale rather than mislabelled
+        cache.set(key, {'value': value, 'computed_at': time.time(), 'version': version}, fresh_for + stale_for)
+        return value
+    finally:
+        _release(cache, key, token)
+
+
+def _refresh_in_background(cache, key, compute, fresh_for, stale_for, token, version):
+    def run():
+        try:
+            _compute_and_store(cache, key, compute, fresh_for, stale_for, token, version)
+        finally:
+            # Threads get their own connections; don't leak them
+            connections.close_all()
+
+    # Carry context such as replica routing over to the refresh thread
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name=f'refresh {key}', daemon=True).start()
+
+
+def get_or_compute(key, compute, fresh_for, stale_for, lock_timeout=60, wait_timeout=15,
+                   background=True, version=None, cache_alias='default'):
+    """Return the cached value for ``key``, computing it at most once at a time.
+
+    - Fresh values (younger than ``fresh_for`` seconds and computed for the
+      current ``version``) are returned as is.
+    - Stale values (up to ``fresh_for + stale_for`` seconds old, or computed
+      for another ``version``) are returned
+      immediately while one caller refreshes them, in a background thread
+      unless ``background`` is False.
+    - On a cold cache the first caller computes the value and the others
+      wait up to ``wait_timeout`` seconds for it before computing it
+      themselves.
+    """
+    started = time.perf_counter()
+    result = 'error'
+    try:
+        value, result = _get_or_compute(key, compute, fresh_for, stale_for, lock_timeout, wait_timeout,
+                                        background, version, cache_alias)
+        return value
+    finally:
+        cache_lookup.send(sender=None, key=key, result=result, seconds=time.perf_counter() - started)
+
+
+def _get_or_compute(key, compute, fresh_for, stale_for, lock_timeout, wait_timeout, background, version,
+                    cache_alias):
+    """Return ``(value, result)``, where ``result`` says how the value was found"""
+    cache = caches[cache_alias]
+    entry = cache.get(key)
+
+    if entry is not None:
+        if entry.get('version') == version and time.time() - entry['computed_at'] < fresh_for:
+            return entry['value'], 'fresh'
+        token = _acquire(cache, key, lock_timeout)
+        if token:
+            if background:
+                _refresh_in_background(cache, key, compute, fresh_for, stale_for, token, version)
+            else:
+                return _compute_and_store(cache, key, compute, fresh_for, stale_for, token, version), 'stale'
+        return entry['value'], 'stale'
+
+    token = _acquire(cache, key, lock_timeout)
+    if token:
+        return _compute_and_store(cache, key, compute, fresh_for, stale_for, token, version), 'miss'
+
+    # Someone else is computing the first copy; wait for it
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value'], 'wait'
+    return compute(), 'miss'
@@ -0,0 +1,12 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist when an autocomplete list filter changes
+    $(document).on('change', 'select.autocomplete-list-filter', function() {
+        const value = $(this).val();
+        window.location.search = value
+            ? this.dataset.queryString.replace('__value__', encodeURIComponent(value))
+            : this.dataset.clearQueryString;
+    });
+}
@@ -0,0 +1,123 @@
+// SVG chart drawing for the analytics dashboards.
+// Each function takes a container element and the aggregated series that
+// the server ships as JSON, so no chart rendering happens on our workers.
+(function() {
+    const SVG_NS = 'http://www.w3.org/2000/svg';
+    const difficultyColors = {'Easy': '#2ecc71', 'Medium': '#f39c12', 'Hard': '#e74c3c'};
+    // Keyed by label like recipes.charts.TIME_BUCKET_COLORS: empty buckets
+    // are left out of the series, so positions don't identify a bucket
+    const bucketColors = {'Quick (<30 min)': '#3498db', 'Medium (30-60 min)': '#f39c12', 'Long (>60 min)': '#e74c3c'};
+    const palette = ['#667eea', '#2ecc71', '#f39c12', '#e74c3c', '#3498db', '#9b59b6', '#1abc9c', '#e67e22', '#34495e', '#95a5a6'];
+
+    function el(name, attrs, text) {
+        const node = document.createElementNS(SVG_NS, name);
+        Object.keys(attrs).forEach(key => node.setAttribute(key, attrs[key]));
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function svg(width, height) {
+        return el('svg', {viewBox: `0 0 ${width} ${height}`, width: width, role: 'img'});
+    }
+
+    function drawBarChart(container, labels, counts) {
+        const width = 500, height = 300, pad = 40;
+        const chart = svg(width, height);
+        const max = Math.max(...counts, 1);
+        const slot = (width - pad * 2) / Math.max(labels.length, 1);
+        labels.forEach((label, i) => {
+            const barHeight = (height - pad * 2) * counts[i] / max;
+            const x = pad + i * slot + slot * 0.15;
+            const y = height - pad - barHeight;
+            chart.appendChild(el('rect', {x: x, y: y, width: slot * 0.7, height: barHeight, fill: difficultyColors[label] || palette[i % palette.length]}));
+            chart.appendChild(el('text', {x: x + slot * 0.35, y: y - 6, 'text-anchor': 'middle', 'font-weight': 'bold'}, counts[i]));
+            chart.appendChild(el('text', {x: x + slot * 0.35, y: height - pad + 20, 'text-anchor': 'middle'}, label));
+        });
+        container.appendChild(chart);
+    }
+
+    function drawPieChart(container, labels, counts) {
+        const size = 300, r = 110, cx = size / 2, cy = size / 2;
+        const chart = svg(size, size);
+        const total = counts.reduce((a, b) => a + b, 0);
+        let angle = -Math.PI / 2;
+        labels.forEach((label, i) => {
+            const slice = 2 * Math.PI * counts[i] / total;
+            const mid = angle + slice / 2;
+            const pct = (100 * counts[i] / total).toFixed(1) + '%';
+            const color = bucketColors[label] || palette[i % palette.length];
+            if (counts[i] === total) {
+                chart.appendChild(el('circle', {cx: cx, cy: cy, r: r, fill: color}));
+            } else {
+                const x1 = cx + r * Math.cos(angle), y1 = cy + r * Math.sin(angle);
+                const x2 = cx + r * Math.cos(angle + slice), y2 = cy + r * Math.sin(angle + slice);
+                const large = slice > Math.PI ? 1 : 0;
+                chart.appendChild(el('path', {d: `M${cx},${cy} L${x1},${y1} A${r},${r} 0 ${large} 1 ${x2},${y2} Z`, fill: color}));
+            }
+            chart.appendChild(el('text', {x: cx + r * 0.6 * Math.cos(mid), y: cy + r * 0.6 * Math.sin(mid), 'text-anchor': 'middle', 'font-weight': 'bold'}, pct));
+            angle += slice;
+        });
+        container.appendChild(chart);
+        const legend = document.createElement('p');
+        legend.textContent = labels.map((label, i) => `${label}: ${counts[i]}`).join(' · ');
+        container.appendChild(legend);
+    }
+
+    function cookingTimeColor(minutes) {
+        return minutes < 20 ? '#27ae60' : (minutes < 40 ? '#f39c12' : '#e74c3c');
+    }
+
+    // options.suffix is appended to value labels, options.color maps a value to a fill
+    function drawHorizontalBarChart(container, names, values, options) {
+        const settings = Object.assign({suffix: '', color: () => '#667eea'}, options);
+        const rowHeight = 22, labelWidth = 180, width = 600;
+        const height = names.length * rowHeight + 20;
+        const chart = svg(width, height);
+        const max = Math.max(...values, 1);
+        names.forEach((name, i) => {
+            const y = 10 + i * rowHeight;
+            const barWidth = (width - labelWidth - 70) * values[i] / max;
+            chart.appendChild(el('text', {x: labelWidth - 8, y: y + 15, 'text-anchor': 'end'}, name));
+            chart.appendChild(el('rect', {x: labelWidth, y: y + 2, width: barWidth, height: rowHeight - 4, fill: settings.color(values[i]), opacity: 0.8}));
+            chart.appendChild(el('text', {x: labelWidth + barWidth + 6, y: y + 15, 'font-weight': 'bold'}, `${values[i]}${settings.suffix}`));
+        });
+        container.appendChild(chart);
+    }
+
+    // categories is a list of {name, counts} stacked on top of each other per period
+    function drawStackedBarChart(container, periods, categories, totals) {
+        const width = 900, height = 320, pad = 40, legendHeight = 24;
+        const chart = svg(width, height + legendHeight);
+        const max = Math.max(...totals, 1);
+        const slot = (width - pad * 2) / Math.max(periods.length, 1);
+        const step = Math.max(1, Math.floor(periods.length / 12));
+        const bottoms = periods.map(() => 0);
+        categories.forEach((category, c) => {
+            category.counts.forEach((count, i) => {
+                const barHeight = (height - pad * 2) * count / max;
+                bottoms[i] += barHeight;
+                if (count) {
+                    chart.appendChild(el('rect', {x: pad + i * slot + slot * 0.1, y: height - pad - bottoms[i], width: slot * 0.8, height: barHeight, fill: palette[c % palette.length]}));
+                }
+            });
+            chart.appendChild(el('rect', {x: pad + c * 140, y: height + 6, width: 12, height: 12, fill: palette[c % palette.length]}));
+            chart.appendChild(el('text', {x: pad + c * 140 + 18, y: height + 17, 'font-size': 12}, category.name));
+        });
+        periods.forEach((period, i) => {
+            if (i % step === 0) {
+                chart.appendChild(el('text', {x: pad + i * slot + slot / 2, y: height - pad + 16, 'text-anchor': 'middle', 'font-size': 11}, period));
+            }
+        });
+        container.appendChild(chart);
+    }
+
+    window.RecipeCharts = {
+        drawBarChart: drawBarChart,
+        drawPieChart: drawPieChart,
+        drawHorizontalBarChart: drawHorizontalBarChart,
+        drawStackedBarChart: drawStackedBarChart,
+        cookingTimeColor: cookingTimeColor,
+    };
+})();
@@ -0,0 +1,78 @@
+"""Background tasks of the recipes app, run by ``manage.py run_worker``"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import task
+from .analytics import cached_analytics_charts
+from .difficulty import recompute_difficulty
+from .models import Recipe
+from .rollups import GRANULARITIES
+
+
+@task(priority=10, concurrency=2, dedup_key=lambda recipe_id: f'recipe-image:{recipe_id}')
+def process_recipe_image(recipe_id):
+    """Downscale an uploaded recipe image to at most RECIPE_IMAGE_MAX_SIZE pixels per side"""
+    from PIL import Image, ImageOps
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only('pk', 'image').first()
+    if recipe is None or not recipe.image:
+        return
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    with recipe.image.open('rb') as f:
+        image = Image.open(f)
+        image_format = image.format
+        if max(image.size) <= max_size:
+            return
+        # Apply the camera's rotation before the EXIF data is dropped
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+
+    buffer = BytesIO()
+    options = {'quality': 85, 'optimize': True} if image_format == 'JPEG' else {'optimize': True}
+    image.save(buffer, format=image_format, **options)
+    storage, name = recipe.image.storage, recipe.image.name
+    # Save next to the original, which is only deleted once the recipe points
+    # at the new file, so a failure at any step leaves a working image
+    saved_name = storage.save(name, ContentFile(buffer.getvalue()))
+    # update() so the recipe's signals don't queue this task again; it only
+    # applies if no other image was uploaded in the meantime
+    if Recipe.objects.filter(pk=recipe_id, image=name).update(image=saved_name, updated_date=timezone.now()):
+        storage.delete(name)
+    else:
+        storage.delete(saved_name)
+
+
+@task()
+def recompute_recipe_difficulty(recipe_ids):
+    """Recompute the stored difficulty of the given recipes"""
+    recompute_difficulty(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+# Chart rendering is memory hungry; one at a time is plenty
+@task(priority=-10, concurrency=1, dedup_key=lambda granularity: f'warm-analytics:{granularity}')
+def warm_analytics(granularity):
+    """Render the analytics payload of one granularity into the cache.
+
+    The charts payload contains the series, and PNG exports are taken from it.
+    """
+    cached_analytics_charts(granularity, background=False)
+
+
+def warm_analytics_on_commit(using=None):
+    """Queue re-rendering of the analytics cache once the transaction commits.
+
+    Does nothing unless ANALYTICS_WARM_ON_CHANGE is set. Runs after the cache
+    namespace bump, so the jobs render under the new keys.
+    """
+    if not settings.ANALYTICS_WARM_ON_CHANGE:
+        return
+
+    def enqueue():
+        for granularity in GRANULARITIES:
+            warm_analytics.enqueue(granularity)
+
+    transaction.on_commit(enqueue, using=using)
@@ -0,0 +1,109 @@
+"""Tests of the async views in ``recipes.async_views``.
+
+The views are served through ``AsyncClient``, so the middleware runs in
+async mode as it does under ASGI. These are ``TransactionTestCase``s: the
+views run some queries on pool threads with their own connections, which
+can't see rows left uncommitted by a ``TestCase``.
+"""
+from asyncio import iscoroutinefunction
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path, resolve, reverse
+
+from ingredients.models import Ingredient, RecipeIngredient
+from . import async_views, urls as recipe_urls
+from .analytics import build_user_analytics
+from .models import Category, Recipe
+
+ASYNC_VIEWS = {
+    'detail': async_views.recipe_detail,
+    'search': async_views.search_recipes,
+    'analytics': async_views.analytics_view,
+    'my_analytics': async_views.my_analytics_view,
+}
+
+# recipes.urls as it is with ASYNC_VIEWS = True
+urlpatterns = [
+    path('', include(([
+        path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+        for pattern in recipe_urls.urlpatterns
+    ], 'recipes'))),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTest(TransactionTestCase):
+    """Test the async views and the middleware in async mode"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', password='testpass123', is_staff=True)
+        category = Category.objects.create(name='Dinner')
+        garlic = Ingredient.objects.create(name='Garlic')
+        self.stew = Recipe.objects.create(name='Garlic Stew', cooking_time=45, user=self.user, category=category)
+        RecipeIngredient.objects.create(recipe=self.stew, ingredient=garlic, quantity=2)
+        Recipe.objects.create(name='Toast', cooking_time=5, user=self.user)
+        self.async_client.force_login(self.user)
+
+    def test_urlconf_swaps_the_views(self):
+        """Test that the sync views stay the default and these are async"""
+        self.assertIs(recipe_urls.io_views, recipe_urls.views)
+        for name, view in ASYNC_VIEWS.items():
+            path = reverse(f'recipes:{name}', args=[self.stew.pk] if name == 'detail' else [])
+            self.assertIs(resolve(path).func, view)
+            self.assertTrue(iscoroutinefunction(view))
+
+    async def test_detail(self):
+        """Test the recipe detail page and the 404 for unknown recipes"""
+        response = await self.async_client.get(reverse('recipes:detail', args=[self.stew.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Garlic Stew')
+        self.assertEqual(response.context['ingredients_list'], ['2.0 grams of Garlic'])
+        response = await self.async_client.get(reverse('recipes:detail', args=[self.stew.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_search(self):
+        """Test showing all recipes and filtering by ingredient and cooking time"""
+        response = await self.async_client.get(reverse('recipes:search'), {'show_all': '1'})
+        self.assertEqual(response.context['recipes_count'], 2)
+        response = await self.async_client.post(reverse('recipes:search'), {'ingredients': 'garl', 'cooking_time': 'medium'})
+        self.assertEqual(response.context['recipes_count'], 1)
+        self.assertContains(response, 'Garlic Stew')
+        response = await self.async_client.post(reverse('recipes:search'), {'cooking_time': 'long'})
+        self.assertEqual(response.context['recipes_count'], 0)
+
+    async def test_analytics(self):
+        """Test the analytics page with server-rendered and client-side charts"""
+        with patch('recipes.charts._render_analytics_chart', return_value=b'\x89PNG'):
+            response = await self.async_client.get(reverse('recipes:analytics'))
+        self.assertEqual(response.context['total_recipes'], 2)
+        self.assertEqual(response.context['chart_mode'], 'png')
+        self.assertTrue(response.context['difficulty_chart'])
+        response = await self.async_client.get(reverse('recipes:analytics'), {'mode': 'client'})
+        self.assertEqual(response.context['chart_mode'], 'client')
+        self.assertEqual(response.context['chart_series']['summary']['total_recipes'], 2)
+
+    async def test_my_analytics_matches_sync(self):
+        """Test that the concurrent aggregates give the same series as the sync view"""
+        response = await self.async_client.get(reverse('recipes:my_analytics'))
+        self.assertEqual(response.status_code, 200)
+        expected = await async_views.in_executor(build_user_analytics, self.user)
+        self.assertEqual(response.context['chart_series'], expected)
+
+    async def test_login_required(self):
+        """Test that anonymous users are redirected to the login page"""
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('recipes:analytics'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(SERVER_TIMING='all')
+    async def test_middleware_in_async_mode(self):
+        """Test query counting, compression and profiling with an async middleware chain"""
+        response = await self.async_client.get(
+            reverse('recipes:detail', args=[self.stew.pk]), {'profile': '1'}, headers={'Accept-Encoding': 'gzip'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="Database \([1-9]\d*\)"')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['X-Profile'], 'unsupported')
@@ -0,0 +1,162 @@
+"""Query-count budgets for every URL in ``recipes.urls``.
+
+Each case is requested against a generated catalog of 10 recipes and again
+against one of 1000. A case fails when its query count grows with the
+catalog (an N+1 pattern) or exceeds the budget declared in
+``QUERY_BUDGETS``. Failures include a diff of the SQL captured at the two
+sizes, with literals replaced by ``?``, so the repeated statement is obvious.
+
+Budgets include the two queries every authenticated request makes (session
+and user). The analytics cache is a dummy cache under test, so the analytics
+cases measure a cold render. Drawing the charts runs no queries, only
+matplotlib work on the already aggregated series, so it is skipped: the
+four charts take several seconds even with the recipe-times chart capped.
+"""
+import difflib
+import re
+from collections import Counter
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ingredients.models import Ingredient
+from .analytics import ANALYTICS_CHARTS, time_bucket
+from .models import Category, Recipe
+from .seeding import USERNAME_PREFIX, seed_catalog
+from .urls import urlpatterns
+
+SIZES = (10, 1000)
+
+# Case name -> maximum number of queries
+QUERY_BUDGETS = {
+    'home': 2,
+    'login': 2,
+    'logout': 4,
+    'list': 5,
+    'detail': 5,
+    'search (empty form)': 2,
+    'search (show all)': 5,
+    'search (recipe_name)': 5,
+    'search (ingredients)': 5,
+    'search (difficulty)': 5,
+    'search (cooking_time)': 5,
+    'search (all filters)': 5,
+    'analytics': 6,
+    'analytics (client mode)': 6,
+    'my_analytics': 7,
+    'analytics_data': 6,
+    **{f'analytics_chart ({chart})': 6 for chart in ANALYTICS_CHARTS},
+}
+
+COOKING_TIME_FILTERS = {'Quick (<30 min)': 'quick', 'Medium (30-60 min)': 'medium', 'Long (>60 min)': 'long'}
+
+
+DIFF_LINES = 40
+
+
+def _normalize(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?(e[+-]?\d+)?\b', '?', sql)
+    sql = re.sub(r'IN \((\?, )*\?\)', 'IN (...)', sql)
+    # Prefetches on SQLite can spell IN as a chain of ORs
+    return re.sub(r'((\S+) = \?)(?: OR \2 = \?)+', r'\1 OR ...', sql)
+
+
+def _growth_report(small, large):
+    """Describe which statements multiplied, followed by the SQL diff"""
+    small_counts, large_counts = Counter(small), Counter(large)
+    lines = [
+        f'  {small_counts[sql]} -> {count} times: {sql}'
+        for sql, count in large_counts.most_common() if count > small_counts[sql]
+    ]
+    diff = list(difflib.unified_diff(small, large, f'{SIZES[0]} recipes', f'{SIZES[1]} recipes', lineterm=''))
+    if len(diff) > DIFF_LINES:
+        diff = diff[:DIFF_LINES] + [f'... {len(diff) - DIFF_LINES} more lines']
+    return '\n'.join(['Statements that grew:', *lines, '', *diff])
+
+
+def _cases(recipe):
+    """Return (name, method, path, data) for every case, built around ``recipe``"""
+    # Every filter value comes from the same recipe, so each combination of
+    # filters matches at least one row at both catalog sizes
+    ingredient = recipe.recipeingredient_set.select_related('ingredient').first().ingredient
+    filters = {
+        'recipe_name': recipe.name.split()[-2],
+        'ingredients': ingredient.name,
+        'difficulty': recipe.difficulty_for(recipe.cooking_time, recipe.ingredients.count()).lower(),
+        'cooking_time': COOKING_TIME_FILTERS[time_bucket(recipe.cooking_time)],
+    }
+    cases = [
+        ('home', 'get', reverse('recipes:home'), None),
+        ('login', 'get', reverse('recipes:login'), None),
+        ('list', 'get', reverse('recipes:list'), None),
+        ('detail', 'get', reverse('recipes:detail', args=[recipe.pk]), None),
+        ('search (empty form)', 'get', reverse('recipes:search'), None),
+        ('search (show all)', 'get', reverse('recipes:search'), {'show_all': '1'}),
+    ]
+    for name, value in filters.items():
+        cases.append((f'search ({name})', 'post', reverse('recipes:search'), {name: value}))
+    cases += [
+        ('search (all filters)', 'post', reverse('recipes:search'), filters),
+        ('analytics', 'get', reverse('recipes:analytics'), None),
+        ('analytics (client mode)', 'get', reverse('recipes:analytics'), {'mode': 'client'}),
+        ('my_analytics', 'get', reverse('recipes:my_analytics'), None),
+        ('analytics_data', 'get', reverse('recipes:analytics_data'), None),
+    ]
+    cases += [
+        (f'analytics_chart ({chart})', 'get', reverse('recipes:analytics_chart', args=[chart]), None)
+        for chart in ANALYTICS_CHARTS
+    ]
+    # Last, since it ends the session
+    cases.append(('logout', 'get', reverse('recipes:logout'), None))
+    return cases
+
+
+class QueryBudgetTest(TestCase):
+    """Test that no recipes view's query count grows with the catalog"""
+
+    def _measure(self, size):
+        """Seed a catalog of ``size`` recipes and return {case: captured SQL}"""
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        Category.objects.all().delete()
+        Ingredient.objects.all().delete()
+        seed_catalog(size, seed=0)
+        recipe = Recipe.objects.order_by('pk').first()
+
+        captured = {}
+        for name, method, path, data in _cases(recipe):
+            self.client.force_login(recipe.user)
+            with patch('recipes.charts._render_analytics_chart', return_value=b'\x89PNG'), \
+                    CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(path, data or {})
+            self.assertEqual(response.status_code, 200, f'{name}: {method.upper()} {path}')
+            captured[name] = [_normalize(query['sql']) for query in queries.captured_queries]
+        return captured
+
+    def test_every_url_has_a_budget(self):
+        """Test that new recipes URLs can't skip the budgets"""
+        for pattern in urlpatterns:
+            self.assertTrue(
+                any(case == pattern.name or case.startswith(f'{pattern.name} (') for case in QUERY_BUDGETS),
+                f'recipes:{pattern.name} has no entry in QUERY_BUDGETS',
+            )
+
+    def test_query_budgets(self):
+        """Test query counts against the budgets at both catalog sizes"""
+        small, large = (self._measure(size) for size in SIZES)
+        self.assertEqual(set(small), set(QUERY_BUDGETS))
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                self.assertLessEqual(
+                    len(large[name]), len(small[name]),
+                    f'{name}: {len(small[name])} queries with {SIZES[0]} recipes but '
+                    f'{len(large[name])} with {SIZES[1]}\n{_growth_report(small[name], large[name])}',
+                )
+                self.assertLessEqual(
+                    len(large[name]), budget,
+                    f'{name}: {len(large[name])} queries, budget {budget}\n' + '\n'.join(large[name]),
+                )
@@ -1,11 +1,29 @@
-from django.test import TestCase, Client
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
+from django.core.management import CommandError, call_command
+from io import StringIO
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.urls import reverse
-from django.db.models import Count
-from unittest.mock import patch
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from datetime import datetime, timedelta
+from unittest.mock import ANY, patch
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import pandas as pd
-from .models import Category, Recipe
+from .models import Category, Recipe, RecipeCreationRollup, RecipeTombstone
+from .analytics import build_user_analytics
+from .difficulty import recompute_difficulty
+from .rollups import creation_timeseries, rebuild_rollups
+from . import singleflight
+from .cache import bump_namespace, namespace_version, namespace_versions
 from ingredients.models import Ingredient, RecipeIngredient
 
 class CategoryModelTest(TestCase):
@@ -791,6 +809,692 @@ class RecipeAnalyticsViewTest(TestCase):
         self.assertContains(response, 'Start building your recipe collection')
 
 
+class RecipeAnalyticsClientModeTest(TestCase):
+    """Test the client-side chart mode and PNG export of analytics"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data for client-side analytics tests"""
+        cls.user = User.objects.create_user(
+            username='chartuser',
+            email='chart@example.com',
+            password='chartpass123'
+        )
+        Recipe.objects.create(name="Quick Toast", cooking_time=5, user=cls.user)
+        Recipe.objects.create(name="Slow Roast", cooking_time=120, user=cls.user)
+        Recipe.objects.create(name="Stew", cooking_time=45, user=cls.user)
+    
+    def setUp(self):
+        """Set up for each test method"""
+        self.client = Client()
+        self.client.login(username='chartuser', password='chartpass123')
+    
+    def test_analytics_data_returns_series(self):
+        """Test that the JSON endpoint returns the aggregated series"""
+        response = self.client.get(reverse('recipes:analytics_data'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertEqual(data['difficulty'], {'labels': ['Easy', 'Medium', 'Hard'], 'counts': [1, 1, 1]})
+        self.assertEqual(data['cooking_time']['counts'], [1, 1, 1])
+        self.assertEqual(data['recipe_times']['names'], ['Quick Toast', 'Stew', 'Slow Roast'])
+        self.assertEqual(data['recipe_times']['minutes'], [5, 45, 120])
+        self.assertEqual(data['summary']['total_recipes'], 3)
+        # Compact separators keep the payload small
+        self.assertNotIn(b', ', response.content)
+    
+    def test_recipe_times_keep_the_longest_recipes(self):
+        """Test that the recipe-times series is capped to the longest recipes"""
+        with patch('recipes.analytics.RECIPE_TIMES_LIMIT', 2):
+            data = self.client.get(reverse('recipes:analytics_data')).json()
+        self.assertEqual(data['recipe_times']['names'], ['Stew', 'Slow Roast'])
+        self.assertEqual(data['recipe_times']['minutes'], [45, 120])
+        self.assertEqual(data['summary']['total_recipes'], 3)
+        self.assertEqual(data['summary']['avg_cooking_time'], 56.7)
+    
+    @patch('matplotlib.pyplot.savefig')
+    def test_client_mode_skips_server_rendering(self, mock_savefig):
+        """Test that client mode ships the series without rendering PNGs"""
+        response = self.client.get(reverse('recipes:analytics'), {'mode': 'client'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(mock_savefig.called)
+        self.assertContains(response, 'id="analytics-series"')
+        self.assertNotContains(response, 'data:image/png;base64')
+        self.assertEqual(response.context['chart_series']['summary']['total_recipes'], 3)
+    
+    def test_chart_png_export(self):
+        """Test that each chart can be exported as a PNG"""
+        for chart in ('difficulty', 'cooking-time', 'recipe-times', 'created-over-time'):
+            response = self.client.get(reverse('recipes:analytics_chart', args=[chart]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/png')
+            self.assertTrue(response.content.startswith(b'\x89PNG'))
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_analytics_payload_is_cached(self):
+        """Test that repeated analytics requests reuse the cached charts"""
+        cache.clear()
+        with patch('matplotlib.pyplot.savefig') as mock_savefig:
+            self.client.get(reverse('recipes:analytics'))
+            renders = mock_savefig.call_count
+            self.client.get(reverse('recipes:analytics'))
+        self.assertEqual(renders, 4)
+        self.assertEqual(mock_savefig.call_count, renders)
+        cache.clear()
+    
+    def test_client_pie_colors_match_server_charts(self):
+        """Test that the browser colors cooking time buckets by label, like the PNG"""
+        from django.contrib.staticfiles import finders
+        from .charts import TIME_BUCKET_COLORS
+
+        with open(finders.find('recipes/js/analytics-charts.js')) as f:
+            script = f.read()
+        for label, color in TIME_BUCKET_COLORS.items():
+            self.assertIn(f"'{label}': '{color}'", script)
+        self.assertNotIn('bucketColors[i]', script)
+    
+    def test_chart_png_export_unknown_chart(self):
+        """Test that unknown chart names return 404"""
+        response = self.client.get(reverse('recipes:analytics_chart', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeCreationRollupTest(TestCase):
+    """Test the incrementally maintained recipe creation rollups"""
+    
+    def setUp(self):
+        """Set up test data for rollup tests"""
+        self.user = User.objects.create_user(username='rollupuser', password='rolluppass123')
+        self.italian = Category.objects.create(name="Italian")
+        self.mexican = Category.objects.create(name="Mexican")
+    
+    def rollup_counts(self, granularity):
+        """Return {(period_start, category_id): count} for non-empty rollups"""
+        return {
+            (row.period_start, row.category_id): row.recipe_count
+            for row in RecipeCreationRollup.objects.filter(granularity=granularity, recipe_count__gt=0)
+        }
+    
+    def test_recipe_creation_updates_rollups(self):
+        """Test that creating recipes increments every granularity"""
+        Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        Recipe.objects.create(name="Pasta", cooking_time=25, user=self.user, category=self.italian)
+        Recipe.objects.create(name="Tacos", cooking_time=15, user=self.user)
+        
+        today = timezone.localdate()
+        self.assertEqual(self.rollup_counts('day'), {(today, self.italian.pk): 2, (today, None): 1})
+        month_start = today.replace(day=1)
+        self.assertEqual(self.rollup_counts('month')[(month_start, self.italian.pk)], 2)
+        week_start = today - timedelta(days=today.weekday())
+        self.assertEqual(self.rollup_counts('week')[(week_start, None)], 1)
+    
+    def test_deleting_category_keeps_totals(self):
+        """Test that a deleted category's recipes are counted once, as uncategorized"""
+        Recipe.objects.create(name="Tacos", cooking_time=15, user=self.user)
+        Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        # A period where only the deleted category has recipes
+        last_year = timezone.now() - timedelta(days=400)
+        old = Recipe.objects.create(name="Lasagne", cooking_time=60, user=self.user, category=self.italian)
+        Recipe.objects.filter(pk=old.pk).update(created_date=last_year)
+        rebuild_rollups()
+        
+        self.italian.delete()
+        Recipe.objects.create(name="Burrito", cooking_time=15, user=self.user)
+        
+        for granularity in ('day', 'week', 'month'):
+            rows = RecipeCreationRollup.objects.filter(granularity=granularity)
+            self.assertEqual(rows.aggregate(total=Sum('recipe_count'))['total'], Recipe.objects.count())
+            self.assertFalse(rows.exclude(category=None).exclude(category=self.mexican).exists())
+        today = timezone.localdate()
+        self.assertEqual(self.rollup_counts('day')[(today, None)], 3)
+        self.assertEqual(creation_timeseries('month')['totals'][-1], 3)
+    
+    def test_uncategorized_rows_are_unique(self):
+        """Test that a period can't get two uncategorized rows"""
+        from django.db import IntegrityError, transaction
+        
+        Recipe.objects.create(name="Tacos", cooking_time=15, user=self.user)
+        row = RecipeCreationRollup.objects.get(granularity='day', category=None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeCreationRollup.objects.create(granularity='day', period_start=row.period_start, recipe_count=1)
+    
+    def test_category_change_and_delete_update_rollups(self):
+        """Test that moving or deleting a recipe keeps the rollups in sync"""
+        recipe = Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        recipe.category = self.mexican
+        recipe.save()
+        today = timezone.localdate()
+        self.assertEqual(self.rollup_counts('day'), {(today, self.mexican.pk): 1})
+        
+        Recipe.objects.get(pk=recipe.pk).delete()
+        self.assertEqual(self.rollup_counts('day'), {})
+    
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test that a full rebuild produces the same counts"""
+        Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        Recipe.objects.create(name="Tacos", cooking_time=15, user=self.user, category=self.mexican)
+        incremental = {g: self.rollup_counts(g) for g in ('day', 'week', 'month')}
+        rebuild_rollups()
+        self.assertEqual({g: self.rollup_counts(g) for g in ('day', 'week', 'month')}, incremental)
+    
+    def test_creation_timeseries_fills_gaps_per_category(self):
+        """Test the time series covers every period with per-category counts"""
+        jan = Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        mar = Recipe.objects.create(name="Tacos", cooking_time=15, user=self.user, category=self.mexican)
+        Recipe.objects.filter(pk=jan.pk).update(created_date=timezone.make_aware(datetime(2025, 1, 15)))
+        Recipe.objects.filter(pk=mar.pk).update(created_date=timezone.make_aware(datetime(2025, 3, 2)))
+        rebuild_rollups()
+        
+        series = creation_timeseries('month')
+        self.assertEqual(series['periods'], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual(series['totals'], [1, 0, 1])
+        self.assertEqual(series['categories'], [
+            {'name': 'Italian', 'counts': [1, 0, 0]},
+            {'name': 'Mexican', 'counts': [0, 0, 1]},
+        ])
+    
+    def test_analytics_data_includes_timeseries(self):
+        """Test that the analytics JSON honours the granularity parameter"""
+        Recipe.objects.create(name="Pizza", cooking_time=20, user=self.user, category=self.italian)
+        self.client.login(username='rollupuser', password='rolluppass123')
+        response = self.client.get(reverse('recipes:analytics_data'), {'granularity': 'day'})
+        timeseries = response.json()['created_over_time']
+        self.assertEqual(timeseries['granularity'], 'day')
+        self.assertEqual(timeseries['periods'], [timezone.localdate().isoformat()])
+        self.assertEqual(timeseries['totals'], [1])
+
+
+class UserAnalyticsTest(TestCase):
+    """Test the per-user analytics dashboard"""
+    
+    def setUp(self):
+        """Set up recipes for two users"""
+        self.user = User.objects.create_user(username='owner', password='ownerpass123')
+        self.other = User.objects.create_user(username='other', password='otherpass123')
+        self.italian = Category.objects.create(name="Italian")
+        self.ingredients = [Ingredient.objects.create(name=f"Ingredient {i}") for i in range(7)]
+        
+        Recipe.objects.create(name="Toast", cooking_time=5, user=self.user, category=self.italian)
+        Recipe.objects.create(name="Risotto", cooking_time=45, user=self.user, category=self.italian)
+        big = Recipe.objects.create(name="Feast", cooking_time=20, user=self.user)
+        for ingredient in self.ingredients:
+            RecipeIngredient.objects.create(recipe=big, ingredient=ingredient)
+        Recipe.objects.create(name="Not Mine", cooking_time=200, user=self.other)
+    
+    def test_calculated_difficulty_annotation_matches_model(self):
+        """Test that the SQL difficulty matches Recipe.calculate_difficulty()"""
+        for recipe in Recipe.objects.with_calculated_difficulty():
+            self.assertEqual(recipe.calculated_difficulty, recipe.calculate_difficulty())
+    
+    def test_user_analytics_only_counts_own_recipes(self):
+        """Test that series are filtered to the given user"""
+        series = build_user_analytics(self.user)
+        self.assertEqual(series['summary']['total_recipes'], 3)
+        self.assertEqual(series['summary']['avg_cooking_time'], 23.3)
+        # Feast is quick but has 7 ingredients, so it is Medium
+        self.assertEqual(series['difficulty'], {'labels': ['Easy', 'Medium'], 'counts': [1, 2]})
+        self.assertEqual(series['cooking_time'], {
+            'labels': ['Quick (<30 min)', 'Medium (30-60 min)'], 'counts': [2, 1],
+        })
+        self.assertEqual(series['categories'], {'labels': ['Italian', 'Uncategorized'], 'counts': [2, 1]})
+        self.assertEqual(series['created_per_month']['counts'], [3])
+    
+    def test_user_analytics_query_count_is_constant(self):
+        """Test that adding recipes doesn't add queries"""
+        with self.assertNumQueries(5):
+            build_user_analytics(self.user)
+        for i in range(20):
+            Recipe.objects.create(name=f"Extra {i}", cooking_time=10 + i * 5, user=self.user)
+        with self.assertNumQueries(5):
+            build_user_analytics(self.user)
+    
+    def test_my_analytics_view(self):
+        """Test the per-user analytics page"""
+        self.client.login(username='other', password='otherpass123')
+        response = self.client.get(reverse('recipes:my_analytics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'recipes/my_analytics.html')
+        self.assertEqual(response.context['total_recipes'], 1)
+        self.assertContains(response, 'id="analytics-series"')
+    
+    def test_recipe_user_created_index(self):
+        """Test the composite index backing per-user queries"""
+        indexes = {index.name: index.fields for index in Recipe._meta.indexes}
+        self.assertEqual(indexes['recipe_user_created_idx'], ['user', 'created_date'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SingleFlightTest(SimpleTestCase):
+    """Test request coalescing and stale-while-revalidate"""
+    
+    def setUp(self):
+        """Start every test with an empty cache"""
+        cache.clear()
+        self.calls = 0
+    
+    def compute(self, value='fresh', delay=0):
+        """Return a compute callable that counts its invocations"""
+        def run():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return run
+    
+    def test_fresh_value_is_computed_once(self):
+        """Test that a fresh cached value is reused"""
+        for _ in range(3):
+            value = singleflight.get_or_compute('k', self.compute(), fresh_for=60, stale_for=60)
+        self.assertEqual(value, 'fresh')
+        self.assertEqual(self.calls, 1)
+    
+    def test_concurrent_cold_requests_are_coalesced(self):
+        """Test that concurrent callers on a cold cache compute only once"""
+        results = []
+        compute = self.compute(delay=0.3)
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                singleflight.get_or_compute('k', compute, fresh_for=60, stale_for=60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['fresh'] * 8)
+        self.assertEqual(self.calls, 1)
+    
+    def test_stale_value_is_served_while_refreshing(self):
+        """Test that readers get the stale copy and it is refreshed in the background"""
+        cache.set('k', {'value': 'stale', 'computed_at': time.time() - 120}, 600)
+        value = singleflight.get_or_compute('k', self.compute(delay=0.1), fresh_for=60, stale_for=600)
+        self.assertEqual(value, 'stale')
+        
+        deadline = time.monotonic() + 5
+        while cache.get('k')['value'] != 'fresh' and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(cache.get('k')['value'], 'fresh')
+        self.assertEqual(self.calls, 1)
+    
+    def test_stale_value_returned_when_refresh_in_progress(self):
+        """Test that only the lock holder refreshes a stale value"""
+        cache.set('k', {'value': 'stale', 'computed_at': time.time() - 120}, 600)
+        cache.add('k:lock', 'other-worker', 60)
+        value = singleflight.get_or_compute('k', self.compute(), fresh_for=60, stale_for=600)
+        self.assertEqual(value, 'stale')
+        self.assertEqual(self.calls, 0)
+    
+    def test_new_version_serves_old_value_while_refreshing(self):
+        """Test that a value computed for an older version is stale, not missing"""
+        singleflight.get_or_compute('k', self.compute('v1'), fresh_for=60, stale_for=600, version=1)
+        value = singleflight.get_or_compute('k', self.compute('v2', delay=0.1), fresh_for=60, stale_for=600, version=2)
+        self.assertEqual(value, 'v1')
+        
+        deadline = time.monotonic() + 5
+        while cache.get('k')['value'] != 'v2' and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(cache.get('k'), {'value': 'v2', 'computed_at': ANY, 'version': 2})
+        value = singleflight.get_or_compute('k', self.compute('v3'), fresh_for=60, stale_for=600, version=2)
+        self.assertEqual(value, 'v2')
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheNamespaceTest(TestCase):
+    """Test versioned cache namespaces and their invalidation by signals"""
+    
+    def setUp(self):
+        """Start every test with an empty cache"""
+        cache.clear()
+        self.user = User.objects.create_user(username='cacheuser', password='testpass123')
+    
+    def test_bump_changes_dependent_versions(self):
+        """Test that bumping a namespace changes its version and its dependents' versions"""
+        ingredients_version = namespace_version('ingredients')
+        analytics_version = namespace_version('analytics')
+        self.assertEqual(namespace_versions('recipes', 'analytics'), [1, 1])
+        self.assertEqual(bump_namespace('recipes'), 2)
+        self.assertEqual(bump_namespace('recipes'), 3)
+        self.assertEqual(namespace_version('recipes'), '3')
+        self.assertNotEqual(namespace_version('analytics'), analytics_version)
+        self.assertEqual(namespace_version('ingredients'), ingredients_version)
+    
+    def test_unknown_namespace(self):
+        """Test that unknown namespaces are rejected"""
+        with self.assertRaises(ValueError):
+            namespace_version('users')
+    
+    def test_model_changes_bump_versions(self):
+        """Test that saving and deleting models bumps their namespace on commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(name='Cached', cooking_time=10, user=self.user)
+        recipes_version, ingredients_version = namespace_versions('recipes', 'ingredients')
+        self.assertGreater(recipes_version, 1)
+        self.assertEqual(ingredients_version, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient = Ingredient.objects.create(name='Salt')
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient)
+        self.assertGreater(namespace_versions('ingredients')[0], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertGreater(namespace_versions('recipes')[0], recipes_version)
+    
+    def test_no_bump_before_commit(self):
+        """Test that versions are unchanged until the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Recipe.objects.create(name='Pending', cooking_time=10, user=self.user)
+            self.assertEqual(namespace_versions('recipes'), [1])
+        self.assertTrue(callbacks)
+    
+    def test_analytics_cache_invalidated_by_new_recipe(self):
+        """Test that a recipe write serves the old analytics at once and refreshes them"""
+        from .analytics import cached_analytics_series
+        
+        self.assertEqual(cached_analytics_series()['summary']['total_recipes'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(name='Fresh', cooking_time=10, user=self.user)
+        
+        # The next reader gets the previous payload without computing; the
+        # refresh is handed to a background thread
+        with patch('recipes.analytics.build_analytics_series') as build, \
+                patch('recipes.singleflight._refresh_in_background') as refresh:
+            self.assertEqual(cached_analytics_series()['summary']['total_recipes'], 0)
+        build.assert_not_called()
+        refresh.assert_called_once()
+        # Once the refresh has run, readers see the new recipe
+        singleflight._compute_and_store(*refresh.call_args.args)
+        self.assertEqual(cached_analytics_series()['summary']['total_recipes'], 1)
+    
+    def test_recompute_difficulty_bumps_recipes(self):
+        """Test that bulk difficulty updates, which send no signals, still invalidate"""
+        recipe = Recipe.objects.create(name='Stale', cooking_time=90, user=self.user)
+        Recipe.objects.filter(pk=recipe.pk).update(difficulty='Easy')
+        version = namespace_versions('recipes')[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_difficulty()
+        self.assertGreater(namespace_versions('recipes')[0], version)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WarmCachesCommandTest(TestCase):
+    """Test the warm_caches management command"""
+    
+    def setUp(self):
+        """Start with an empty cache and one recipe"""
+        cache.clear()
+        user = User.objects.create_user(username='warmuser', password='testpass123')
+        Recipe.objects.create(name='Warm Soup', cooking_time=20, user=user)
+    
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'recipe-warm-caches-test'),
+    }})
+    def test_warm_caches(self):
+        """Test that analytics payloads, series and PNGs are cached after warming"""
+        cache.clear()
+        out, err = StringIO(), StringIO()
+        call_command('warm_caches', stdout=out, stderr=err)
+        self.assertIn('analytics charts (month)', out.getvalue())
+        self.assertIn('Warmed 4/4 caches', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+        
+        from .analytics import cached_analytics_chart_png, cached_analytics_charts, cached_analytics_series
+        
+        with patch('recipes.analytics.build_analytics_series') as build, \
+                patch('recipes.charts._render_analytics_chart') as render:
+            payload = cached_analytics_charts('week')
+            series = cached_analytics_series('week')
+            png = cached_analytics_chart_png('difficulty')
+        build.assert_not_called()
+        render.assert_not_called()
+        self.assertEqual(payload['series']['summary']['total_recipes'], 1)
+        self.assertEqual(series, payload['series'])
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        cache.clear()
+    
+    def test_local_cache_only_warms_fonts(self):
+        """Test that a per-process cache only gets the font cache warmed"""
+        out, err = StringIO(), StringIO()
+        with patch('recipes.analytics.build_analytics_series') as build:
+            call_command('warm_caches', stdout=out, stderr=err)
+        build.assert_not_called()
+        self.assertIn('Warmed 1/1 caches', out.getvalue())
+        self.assertIn('not shared between processes', err.getvalue())
+
+
+class SeedBenchmarkDataCommandTest(TestCase):
+    """Test the seed_benchmark_data management command"""
+    
+    def test_seeded_catalog(self):
+        """Test the size, fan-out, difficulty and rollups of a small catalog"""
+        out = StringIO()
+        call_command('seed_benchmark_data', recipes=120, seed=3, stdout=out)
+        self.assertIn('120 recipes', out.getvalue())
+        
+        self.assertEqual(Recipe.objects.count(), 120)
+        self.assertEqual(User.objects.filter(username__startswith='bench-user-').count(), 5)
+        counts = Recipe.objects.annotate(total=Count('recipeingredient')).values_list('total', flat=True)
+        self.assertTrue(all(2 <= total <= 20 for total in counts))
+        # Stored difficulty matches the generated ingredients
+        mismatched = [
+            recipe for recipe in Recipe.objects.with_calculated_difficulty()
+            if recipe.difficulty != recipe.calculated_difficulty
+        ]
+        self.assertEqual(mismatched, [])
+        # Creation dates are spread out rather than all "now"
+        oldest = Recipe.objects.order_by('created_date').first().created_date
+        self.assertLess(oldest, timezone.now() - timedelta(days=30))
+        self.assertFalse(Recipe.objects.exclude(updated_date=F('created_date')).exists())
+        # ...without switching off auto_now for the rest of the process
+        self.assertTrue(Recipe._meta.get_field('created_date').auto_now_add)
+        self.assertTrue(Recipe._meta.get_field('updated_date').auto_now)
+        month_total = RecipeCreationRollup.objects.filter(granularity='month').aggregate(total=Sum('recipe_count'))
+        self.assertEqual(month_total['total'], 120)
+    
+    def test_refuses_to_seed_twice(self):
+        """Test that a database can only be seeded once"""
+        call_command('seed_benchmark_data', recipes=5, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark_data', recipes=5, stdout=StringIO())
+
+
+class RecipeAdminChangelistTest(TestCase):
+    """Test that the recipe admin changelist has a constant query count"""
+    
+    def setUp(self):
+        """Set up an admin user and shared ingredients"""
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        self.ingredients = [Ingredient.objects.create(name=f"Ingredient {i}") for i in range(5)]
+        self.add_recipes(3)
+    
+    def add_recipes(self, count):
+        """Create recipes, each with a category and five ingredients"""
+        start = Recipe.objects.count()
+        for i in range(start, start + count):
+            category = Category.objects.create(name=f"Category {i}")
+            recipe = Recipe.objects.create(name=f"Recipe {i}", cooking_time=20, user=self.admin, category=category)
+            for ingredient in self.ingredients:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1)
+    
+    def changelist_queries(self):
+        """Return the number of queries made rendering the changelist"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:recipes_recipe_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_changelist_query_count_is_constant(self):
+        """Test that more rows on the page don't add queries"""
+        small = self.changelist_queries()
+        self.add_recipes(20)
+        self.assertEqual(self.changelist_queries(), small)
+    
+    def test_ingredients_preview(self):
+        """Test the ingredients preview column"""
+        response = self.client.get(reverse('admin:recipes_recipe_changelist'))
+        self.assertContains(response, '1.0 grams of Ingredient 0; 1.0 grams of Ingredient 1; 1.0 grams of Ingredient 2 (+2 more)')
+
+
+class RecipeDifficultyRecomputeTest(TestCase):
+    """Test batch recomputation of the stored difficulty"""
+    
+    def setUp(self):
+        """Set up recipes whose stored difficulty is stale"""
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.ingredients = [Ingredient.objects.create(name=f"Ingredient {i}") for i in range(7)]
+        self.create_recipes(4)
+    
+    def create_recipes(self, count):
+        """Create ``count`` quick recipes, half of them with 7 ingredients"""
+        for i in range(count):
+            recipe = Recipe.objects.create(name=f"Recipe {i}", cooking_time=10, user=self.user)
+            if i % 2:
+                for ingredient in self.ingredients:
+                    RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient)
+        Recipe.objects.update(difficulty='Hard')
+    
+    def assert_difficulties_current(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.difficulty, recipe.calculate_difficulty())
+    
+    def test_recompute_updates_stale_rows(self):
+        """Test that stale difficulties are fixed and reported"""
+        progress = []
+        checked, updated = recompute_difficulty(batch_size=3, progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual((checked, updated), (4, 4))
+        self.assertEqual(progress, [(3, 4), (4, 4)])
+        self.assert_difficulties_current()
+        self.assertEqual(recompute_difficulty(), (4, 0))
+    
+    def test_recompute_query_count_per_batch_is_constant(self):
+        """Test that a batch costs the same number of queries regardless of its size"""
+        with CaptureQueriesContext(connection) as small:
+            recompute_difficulty(batch_size=100)
+        Recipe.objects.update(difficulty='Hard')
+        self.create_recipes(40)
+        with CaptureQueriesContext(connection) as large:
+            recompute_difficulty(batch_size=100)
+        self.assertEqual(len(large), len(small))
+    
+    def test_management_command(self):
+        """Test the recompute_difficulty management command"""
+        stdout = StringIO()
+        call_command('recompute_difficulty', '--batch-size', '2', stdout=stdout)
+        self.assertIn('2/4 recipes checked', stdout.getvalue())
+        self.assertIn('Checked 4 recipes, updated 4.', stdout.getvalue())
+        self.assert_difficulties_current()
+    
+    def test_admin_action(self):
+        """Test the recompute difficulty admin action on selected recipes"""
+        self.client.login(username='admin', password='adminpass123')
+        selected = list(Recipe.objects.values_list('pk', flat=True)[:2])
+        response = self.client.post(reverse('admin:recipes_recipe_changelist'), {
+            'action': 'recompute_difficulty_action',
+            '_selected_action': selected,
+        }, follow=True)
+        self.assertContains(response, 'Checked 2 recipes')
+        self.assertEqual(Recipe.objects.exclude(pk__in=selected).filter(difficulty='Hard').count(), 2)
+
+
+class RecipeDifficultyParallelRecomputeTest(TransactionTestCase):
+    """Test recomputing difficulty with parallel batches"""
+    
+    def test_parallel_batches(self):
+        """Test that parallel workers recompute every recipe"""
+        user = User.objects.create_user(username='parallel', password='parallelpass123')
+        for i in range(12):
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10 * i, user=user)
+        Recipe.objects.update(difficulty='Hard')
+        checked, updated = recompute_difficulty(batch_size=3, workers=2)
+        self.assertEqual(checked, 12)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.difficulty, recipe.calculate_difficulty())
+
+
+class RecipeLazyImportTest(TestCase):
+    """Test that heavy analytics dependencies are not loaded on boot"""
+    
+    def test_views_import_does_not_load_pandas_or_matplotlib(self):
+        """Test that loading the URLconf leaves pandas and matplotlib unimported"""
+        probe = (
+            "import django, sys; django.setup(); import recipe_project.urls; "
+            "print('pandas' in sys.modules, 'matplotlib' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', probe], check=True, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'recipe_project.settings'},
+        ).stdout
+        self.assertEqual(output.strip(), 'False False')
+
+
+class RecipeInstrumentationTest(SimpleTestCase):
+    """Test that chart rendering and caching announce their work without importing monitoring"""
+    
+    def test_no_monitoring_import(self):
+        """Test that the chart and cache modules load without the monitoring app"""
+        probe = (
+            "import sys; import recipes.charts, recipes.singleflight; "
+            "print('monitoring' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', probe], check=True, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'recipe_project.settings'},
+        ).stdout
+        self.assertEqual(output.strip(), 'False')
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_lookup_signal(self):
+        """Test that every lookup is announced with how it was answered"""
+        from .instrumentation import cache_lookup
+        
+        lookups = []
+        
+        def receiver(sender, key, result, seconds, **kwargs):
+            lookups.append((key, result))
+        
+        cache_lookup.connect(receiver)
+        try:
+            for _ in range(2):
+                singleflight.get_or_compute('instrumented', lambda: 1, fresh_for=60, stale_for=60)
+            with self.assertRaises(ZeroDivisionError):
+                singleflight.get_or_compute('failing', lambda: 1 / 0, fresh_for=60, stale_for=60)
+        finally:
+            cache_lookup.disconnect(receiver)
+        self.assertEqual(lookups, [('instrumented', 'miss'), ('instrumented', 'fresh'), ('failing', 'error')])
+
+
+class RecipeStylesheetTest(TestCase):
+    """Test that pages use the static stylesheets instead of inline styles"""
+    
+    def setUp(self):
+        """Log in and create a recipe to view"""
+        self.user = User.objects.create_user(username='styleuser', password='testpass123')
+        self.recipe = Recipe.objects.create(name='Styled Salad', cooking_time=10, user=self.user)
+        self.client.force_login(self.user)
+    
+    def test_pages_link_stylesheets(self):
+        """Test that every page links its stylesheet and embeds no <style> block"""
+        pages = {
+            reverse('recipes:home'): 'home.css',
+            reverse('recipes:list'): 'list.css',
+            reverse('recipes:detail', args=[self.recipe.pk]): 'detail.css',
+            reverse('recipes:search'): 'search.css',
+            reverse('recipes:analytics'): 'analytics.css',
+            reverse('recipes:my_analytics'): 'analytics.css',
+        }
+        for url, stylesheet in pages.items():
+            response = self.client.get(url)
+            self.assertContains(response, f'/static/recipes/css/{stylesheet}')
+            self.assertNotContains(response, '<style>')
+    
+    def test_stylesheets_are_static_files(self):
+        """Test that the linked stylesheets are found by the staticfiles finders"""
+        from django.contrib.staticfiles import finders
+        
+        for name in ('analytics', 'detail', 'home', 'list', 'login', 'search', 'success'):
+            self.assertIsNotNone(finders.find(f'recipes/css/{name}.css'))
+
+
 class RecipeFormTest(TestCase):
     """Test recipe forms and form validation"""
     
@@ -1023,3 +1727,123 @@ class RecipePaginationTest(TestCase):
         # Should return all 15 recipes
         self.assertContains(response, 'Recipe 1')
         self.assertContains(response, 'Recipe 15')
+
+
+class RecipeTasksTest(TestCase):
+    """Test the background tasks of the recipes app"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tasks', password='testpass123')
+        self.recipe = Recipe.objects.create(name='Queued Stew', cooking_time=45, user=self.user)
+
+    def test_process_recipe_image(self):
+        """Test that large uploads are downscaled and small ones left alone"""
+        import tempfile
+        from io import BytesIO
+        from django.core.files.base import ContentFile
+        from PIL import Image
+        from .tasks import process_recipe_image
+
+        def upload(size):
+            buffer = BytesIO()
+            Image.new('RGB', size, 'orange').save(buffer, format='JPEG')
+            self.recipe.image.save('stew.jpg', ContentFile(buffer.getvalue()))
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, RECIPE_IMAGE_MAX_SIZE=400):
+            upload((1000, 500))
+            original = self.recipe.image.name
+            process_recipe_image(self.recipe.pk)
+            self.recipe.refresh_from_db()
+            with self.recipe.image.open('rb') as f:
+                self.assertEqual(Image.open(f).size, (400, 200))
+            # The original is replaced, not left behind
+            self.assertNotEqual(self.recipe.image.name, original)
+            self.assertFalse(self.recipe.image.storage.exists(original))
+            
+            # A failed save keeps the original image
+            upload((1000, 500))
+            original = self.recipe.image.name
+            with patch('django.core.files.storage.FileSystemStorage._save', side_effect=OSError('disk full')), \
+                    self.assertRaises(OSError):
+                process_recipe_image(self.recipe.pk)
+            self.recipe.refresh_from_db()
+            self.assertEqual(self.recipe.image.name, original)
+            with self.recipe.image.open('rb') as f:
+                self.assertEqual(Image.open(f).size, (1000, 500))
+
+            upload((300, 200))
+            process_recipe_image(self.recipe.pk)
+            with self.recipe.image.open('rb') as f:
+                self.assertEqual(Image.open(f).size, (300, 200))
+
+    def test_warm_analytics_on_change(self):
+        """Test that changes queue one analytics warm-up per granularity when enabled"""
+        from jobs.models import Job
+        from .rollups import GRANULARITIES
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+        self.assertFalse(Job.objects.exists())
+
+        with override_settings(ANALYTICS_WARM_ON_CHANGE=True), self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=Ingredient.objects.create(name='Leek'), quantity=1,
+            )
+        self.assertEqual(
+            sorted(Job.objects.values_list('dedup_key', flat=True)),
+            sorted(f'warm-analytics:{granularity}' for granularity in GRANULARITIES),
+        )
+
+    def test_large_recompute_selection_is_queued(self):
+        """Test that the admin action hands big selections to the worker"""
+        from jobs.models import Job
+
+        admin_user = User.objects.create_superuser(username='admin-tasks', password='testpass123')
+        self.client.force_login(admin_user)
+        Recipe.objects.filter(pk=self.recipe.pk).update(difficulty='Easy')
+        with patch('recipes.admin.INLINE_RECOMPUTE_LIMIT', 0):
+            self.client.post(reverse('admin:recipes_recipe_changelist'), {
+                'action': 'recompute_difficulty_action', '_selected_action': [self.recipe.pk],
+            })
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args), ('recipes.tasks.recompute_recipe_difficulty', [[self.recipe.pk]]))
+        call_command('run_worker', burst=True, stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.difficulty, 'Medium')
+
+
+class RecipeTombstoneTest(TestCase):
+    """Test the bookkeeping behind the changes feed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tombstones', password='testpass123')
+        self.recipe = Recipe.objects.create(name='Short-Lived Soup', cooking_time=10, user=self.user)
+
+    def test_delete_leaves_tombstone(self):
+        """Test that deleting recipes, directly or by cascade, records tombstones"""
+        other = Recipe.objects.create(name='Orphaned Pie', cooking_time=10, user=self.user)
+        pk = self.recipe.pk
+        self.recipe.delete()
+        self.user.delete()
+        self.assertEqual(
+            sorted(RecipeTombstone.objects.values_list('recipe_id', flat=True)), [pk, other.pk],
+        )
+
+    def test_recompute_difficulty_updates_date(self):
+        """Test that difficulty recomputes move recipes up the changes feed"""
+        Recipe.objects.filter(pk=self.recipe.pk).update(difficulty='Hard')
+        before = Recipe.objects.get(pk=self.recipe.pk).updated_date
+        recompute_difficulty()
+        self.assertGreater(Recipe.objects.get(pk=self.recipe.pk).updated_date, before)
+
+    def test_prune_recipe_tombstones(self):
+        """Test that tombstones older than RECIPE_TOMBSTONE_DAYS are deleted"""
+        RecipeTombstone.objects.create(recipe_id=1, deleted_date=timezone.now() - timedelta(days=100))
+        RecipeTombstone.objects.create(recipe_id=2)
+        out = StringIO()
+        with override_settings(RECIPE_TOMBSTONE_DAYS=90):
+            call_command('prune_recipe_tombstones', stdout=out)
+        self.assertIn('Deleted 1 tombstones', out.getvalue())
+        self.assertEqual(list(RecipeTombstone.objects.values_list('recipe_id', flat=True)), [2])
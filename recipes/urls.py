@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'recipes'
 
+# The async versions only pay off when served by an ASGI server
+io_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     path('', views.home, name='home'),  # Welcome page at root
     path('login/', views.login_view, name='login'),  # Login page
     path('logout/', views.logout_view, name='logout'),  # Logout page
     path('list/', views.recipe_list, name='list'),  # Recipe list at /list/ (protected)
-    path('recipe/<int:pk>/', views.recipe_detail, name='detail'),  # Recipe detail at /recipe/id/ (protected)
-    path('search/', views.search_recipes, name='search'),  # Recipe search page (protected)
-    path('analytics/', views.analytics_view, name='analytics'),  # Analytics page (protected)
+    path('recipe/<int:pk>/', io_views.recipe_detail, name='detail'),  # Recipe detail at /recipe/id/ (protected)
+    path('search/', io_views.search_recipes, name='search'),  # Recipe search page (protected)
+    path('analytics/', io_views.analytics_view, name='analytics'),  # Analytics page (protected)
+    path('analytics/mine/', io_views.my_analytics_view, name='my_analytics'),  # Per-user analytics page (protected)
+    path('analytics/data/', views.analytics_data, name='analytics_data'),  # Analytics series as JSON (protected)
+    path('analytics/charts/<slug:chart>.png', views.analytics_chart_png, name='analytics_chart'),  # PNG chart export (protected)
 ]
\ No newline at end of file